@@ -12,8 +12,22 @@ from tkinter import messagebox, filedialog, simpledialog
 from tkinter import ttk
 from tkinter import font as tkfont
 import os
+import re
 import sys
 
+from text_search import text_search_for
+from line_gutter import LineGutter
+from edit_hooks import edit_bus_for
+from file_loader import ChunkedLoader
+from large_file import LargeFileView
+from file_saver import BackgroundSaver
+from edit_journal import EditJournal, pending_journals, recover_journal, discard_journal
+from documents import Document
+from tab_bar import TabBar
+
+# Files at least this big are offered the read-only large file viewer
+LARGE_FILE_BYTES = 64 * 1024 * 1024
+
 # Syntax highlighter
 try:
     from syntax_highlighter import SyntaxHighlighter
@@ -103,9 +117,17 @@ class BalrogNPC:
         self.root.title("BalrogNPC - Untitled")
         self.root.geometry("800x600")
         
-        # Current file path
-        self.current_file = None
-        self.modified = False
+        # Open documents, one per tab; the text widget shows `doc`, the
+        # others wait as Documents. current_file, modified and file_encoding
+        # are those of `doc`.
+        self.doc = Document()
+        self.docs = [self.doc]
+        # set while a document is swapped in or out of the text widget
+        self._switching = False
+        # ChunkedLoader of a file being opened, if any
+        self._loader = None
+        # LargeFileView while a file is browsed read-only through mmap
+        self.large_view = None
         
         # Create menu bar
         self.menuBar = Menu(self.root)
@@ -116,8 +138,10 @@ class BalrogNPC:
         self.menuBar.add_cascade(label="File", menu=fileMenu)
         fileMenu.add_command(label="New", command=self.new_file, accelerator="Ctrl+N")
         fileMenu.add_command(label="Open...", command=self.open_file, accelerator="Ctrl+O")
+        fileMenu.add_command(label="Open Large File (Read-Only)...", command=self.open_large_file)
         fileMenu.add_command(label="Save", command=self.save_file, accelerator="Ctrl+S")
         fileMenu.add_command(label="Save As...", command=self.save_as_file)
+        fileMenu.add_command(label="Close", command=self.close_tab, accelerator="Ctrl+W")
         fileMenu.add_separator()
         fileMenu.add_command(label="Exit", command=self.exit_app)
         
@@ -163,14 +187,31 @@ class BalrogNPC:
         helpMenu.add_separator()
         helpMenu.add_command(label="About BalrogNPC", command=self.show_about)
         
+        # Status bar (packed first so it keeps its row when the window shrinks).
+        # Highlight latency has a field of its own on the right, so a pass
+        # finishing does not wipe the message on the left.
+        self.statusFrame = Frame(self.root, bd=1, relief=SUNKEN)
+        self.statusFrame.pack(side=BOTTOM, fill=X)
+        self.highlight_status_var = StringVar(value='')
+        self.highlightStatus = Label(self.statusFrame, textvariable=self.highlight_status_var,
+                                     anchor=E, padx=4)
+        self.highlightStatus.pack(side=RIGHT)
+        # encoding of the current document, kept in view (see update_title)
+        self.encoding_var = StringVar(value='')
+        self.encodingStatus = Label(self.statusFrame, textvariable=self.encoding_var,
+                                    anchor=E, padx=4)
+        self.encodingStatus.pack(side=RIGHT)
+        self.status_var = StringVar(value='')
+        self.statusBar = Label(self.statusFrame, textvariable=self.status_var, anchor=W, padx=4)
+        self.statusBar.pack(side=LEFT, fill=X, expand=True)
+
+        # Tabs of the open documents
+        self.tab_bar = TabBar(self.root, on_select=self.select_tab, on_close=self.close_tab)
+        self.tab_bar.pack(side=TOP, fill=X)
+
         # Create text widget with scrollbar
         self.textFrame = Frame(self.root)
         self.textFrame.pack(fill=BOTH, expand=True)
-        # Line numbers gutter
-        self.line_numbers = Text(self.textFrame, width=6, padx=4, takefocus=0, bd=0,
-                                 bg='#f0f0f0', fg='#666666', state=DISABLED)
-        self.line_numbers.pack(side=LEFT, fill=Y)
-
         self.scrollbar = Scrollbar(self.textFrame)
         self.scrollbar.pack(side=RIGHT, fill=Y)
 
@@ -184,28 +225,30 @@ class BalrogNPC:
         )
         self.textArea.pack(side=RIGHT, fill=BOTH, expand=True)
 
-        # Scrollbar command should scroll both text and line numbers
-        def _on_scrollbar(*args):
-            try:
-                self.textArea.yview(*args)
-                self.line_numbers.yview(*args)
-            except Exception:
-                pass
+        # Line numbers gutter: draws only the visible lines, redrawn from
+        # _on_textscroll when the view moves
+        self.line_numbers = LineGutter(self.textFrame, self.textArea)
+        self.line_numbers.pack(side=LEFT, fill=Y, before=self.textArea)
 
-        self.scrollbar.config(command=_on_scrollbar)
+        self.scrollbar.config(command=self._on_scrollbar)
         
-        # Track modifications
-        self.textArea.bind('<<Modified>>', self.on_text_modified)
-        # Update line numbers on edits and keys, and schedule syntax highlight
-        self.textArea.bind('<KeyRelease>', lambda e: (self._update_line_numbers(), self._on_key(e)))
-        self.textArea.bind('<MouseWheel>', lambda e: (self._update_line_numbers(), self._on_key(e)))
-        self.line_numbers.bind('<Button-1>', lambda e: self._on_ln_click(e))
+        # Every insert/delete reaches _on_edits once per event-loop turn
+        self.edit_bus = edit_bus_for(self.textArea)
+        self.edit_bus.subscribe(self._on_edits)
+        # Saves run on a worker thread and write through a temporary file
+        self.saver = BackgroundSaver(self.root)
+        # Unsaved edits are journaled so they survive a crash
+        self.journal = EditJournal(self.edit_bus)
+        self.journal.start(None, content='')
         
         # Syntax highlighter
         self.highlighter = None
         if _SYNTAX_AVAILABLE and SyntaxHighlighter is not None:
             try:
                 self.highlighter = SyntaxHighlighter(self.textArea)
+                self.highlighter.status_callback = self._on_highlight_status
+                # pick up edits to syntax/*.ini (e.g. theme tweaks) while open
+                self.highlighter.watch_syntax_dir()
             except Exception:
                 self.highlighter = None
 
@@ -221,6 +264,17 @@ class BalrogNPC:
         self.root.bind('<Control-g>', lambda e: self.goto_line_dialog())
         self.root.bind('<Control-f>', lambda e: self.find_replace_dialog())
         self.root.bind('<F1>', lambda e: self.show_documentation())
+        self.root.bind('<Escape>', lambda e: self.cancel_loading())
+        self.root.bind('<Control-w>', lambda e: self.close_tab())
+        # the Text class binds Ctrl+Tab to focus traversal; take it first
+        for widget in (self.root, self.textArea):
+            widget.bind('<Control-Tab>', lambda e: self.cycle_tab(1))
+            widget.bind('<Control-Shift-Tab>', lambda e: self.cycle_tab(-1))
+            try:
+                # what Shift+Tab sends on X11
+                widget.bind('<Control-ISO_Left_Tab>', lambda e: self.cycle_tab(-1))
+            except Exception:
+                pass
         
         # Bind window close
         self.root.protocol("WM_DELETE_WINDOW", self.exit_app)
@@ -228,6 +282,233 @@ class BalrogNPC:
         # Word wrap state
         self.word_wrap_enabled = False
 
+        self.update_title()
+        # Journals left by a crash are offered once the window is up
+        self.root.after_idle(self._offer_recovery)
+
+    @property
+    def current_file(self):
+        return self.doc.path
+
+    @current_file.setter
+    def current_file(self, path):
+        self.doc.path = path
+
+    @property
+    def modified(self):
+        return self.doc.modified
+
+    @modified.setter
+    def modified(self, value):
+        self.doc.modified = value
+
+    @property
+    def file_encoding(self):
+        """Encoding the current file was read with; saving writes it back."""
+        return self.doc.encoding
+
+    @file_encoding.setter
+    def file_encoding(self, encoding):
+        self.doc.encoding = encoding
+
+    def _offer_recovery(self):
+        """Offer to restore unsaved edits journaled before a crash."""
+        for meta in pending_journals():
+            name = meta.get('path') or 'an untitled document'
+            if not messagebox.askyesno(
+                    "Recover",
+                    f"BalrogNPC did not close cleanly.\n"
+                    f"Recover unsaved changes to {name}?"):
+                discard_journal(meta)
+                continue
+            try:
+                content = recover_journal(meta)
+            except Exception as e:
+                messagebox.showerror("Recover", f"Could not recover {name}:\n{str(e)}")
+                discard_journal(meta)
+                continue
+            self._show_recovered(meta, content)
+            discard_journal(meta)
+
+    def _show_recovered(self, meta, content):
+        """Open recovered text in a tab as an unsaved buffer."""
+        if not self._use_blank_tab():
+            return
+        self.textArea.delete(1.0, END)
+        self.textArea.insert(1.0, content)
+        self.textArea.edit_reset()
+        self._reset_history()
+        self.current_file = meta.get('path')
+        self.file_encoding = meta.get('encoding') or 'utf-8'
+        self.modified = True
+        self.update_title()
+        self.journal.start(self.current_file, self.file_encoding, content=content)
+        self.status_var.set("Recovered unsaved changes")
+        try:
+            if self.highlighter and self.current_file:
+                name = self.highlighter.set_syntax_for_file(self.current_file)
+                try:
+                    self.syntax_mode.set(self._syntax_mode_for(name))
+                except Exception:
+                    pass
+                self.highlighter.highlight()
+        except Exception:
+            pass
+
+    # -- tabs ---------------------------------------------------------------------
+
+    def _reset_history(self):
+        """Start the current document's undo history over (after edit_reset)."""
+        self.edit_bus.flush()
+        self.doc.reset_history()
+
+    def _tab_busy(self):
+        """True (and say why) while the current tab cannot be left."""
+        if self._loader is not None:
+            self.status_var.set(f"Still opening {os.path.basename(self._loader.path)} (Esc to cancel)")
+            return True
+        return False
+
+    def _use_blank_tab(self):
+        """Make the current tab an empty one: keep it if it is, else open a new one."""
+        if self.doc.blank and not self.textArea.get('1.0', 'end-1c'):
+            return True
+        return self._new_tab()
+
+    def _new_tab(self):
+        """Open an empty Untitled tab next to the current one."""
+        if self._tab_busy():
+            return False
+        doc = Document()
+        self.docs.insert(self.docs.index(self.doc) + 1, doc)
+        self._stash()
+        self._activate(doc)
+        self.journal.start(None, content='')
+        return True
+
+    def _tab_for(self, filepath):
+        """Switch to the tab already showing `filepath`; False if there is none."""
+        for doc in self.docs:
+            if doc.path and os.path.normcase(os.path.abspath(doc.path)) == \
+                    os.path.normcase(os.path.abspath(filepath)):
+                self.select_tab(doc)
+                return True
+        return False
+
+    def select_tab(self, doc):
+        """Show document `doc` in the editor."""
+        if doc is self.doc or doc not in self.docs or self._tab_busy():
+            return
+        self._stash()
+        self._activate(doc)
+
+    def cycle_tab(self, step):
+        """Switch to the next (step 1) or previous (step -1) tab."""
+        i = self.docs.index(self.doc)
+        self.select_tab(self.docs[(i + step) % len(self.docs)])
+        return 'break'
+
+    def close_tab(self, doc=None):
+        """Close a tab (the current one by default), offering to save it."""
+        doc = doc or self.doc
+        if doc is not self.doc:
+            self.select_tab(doc)
+            if doc is not self.doc:
+                return
+        if not self.check_save():
+            return
+        self.cancel_loading()
+        # a save still queued for the tab reads its text
+        self.saver.wait()
+        i = self.docs.index(doc)
+        self._stash(keep=False)
+        self.docs.remove(doc)
+        if self.docs:
+            self._activate(self.docs[min(i, len(self.docs) - 1)])
+            return
+        # the last tab closed: leave a fresh Untitled one
+        self.docs.append(Document())
+        self._activate(self.docs[0])
+        self.journal.start(None, content='')
+
+    def _stash(self, keep=True):
+        """Take the current document out of the editor into its Document.
+
+        Without `keep` (the tab is closing) its journal is discarded and its
+        text is not kept.
+        """
+        doc = self.doc
+        # pending edits belong to the document leaving
+        self.edit_bus.flush()
+        if keep:
+            doc.journal = self.journal.suspend()
+        else:
+            self.journal.stop()
+        try:
+            if self.highlighter:
+                doc.syntax = getattr(self.highlighter, '_current', None)
+            doc.syntax_mode = self.syntax_mode.get()
+        except Exception:
+            pass
+        self._switching = True
+        try:
+            if self.large_view is not None:
+                view = self.large_view
+                self.large_view = None
+                doc.large_top = view.top_line()
+                view.close()
+                # the view is rebuilt from the file; nothing else to keep
+                doc.text = ''
+                doc.cursor = '1.0'
+                doc.yview = 0.0
+                self.textArea.config(state=NORMAL)
+            elif keep:
+                doc.stash(self.textArea)
+        finally:
+            self._switching = False
+
+    def _activate(self, doc):
+        """Put `doc` in the editor (the previous document must be stashed)."""
+        self.doc = doc
+        self._switching = True
+        try:
+            # (empty for a large file tab; the view fills the widget below)
+            doc.restore(self.textArea)
+            self.edit_bus.flush()
+        finally:
+            self._switching = False
+        self.journal.resume(doc.journal)
+        doc.journal = None
+        if doc.large_top is not None:
+            top, doc.large_top = doc.large_top, None
+            self._open_large(doc.path)
+            if self.large_view is not None:
+                self.large_view.goto(top)
+            else:
+                # the file is gone; the tab must not save an empty text over it
+                doc.path = None
+                self.journal.start(None, content='')
+        try:
+            if self.highlighter:
+                self.highlighter.set_syntax(None)
+                self.highlighter.set_syntax(doc.syntax)
+                self.highlighter.highlight()
+            self.syntax_mode.set(doc.syntax_mode)
+        except Exception:
+            pass
+        self.update_title()
+        self._update_line_numbers()
+        self.status_var.set('')
+        self.textArea.focus()
+
+    def _refresh_tabs(self):
+        try:
+            self.tab_bar.set_tabs(
+                [(doc, doc.name + (' *' if doc.modified else '')) for doc in self.docs],
+                self.doc)
+        except Exception:
+            pass
+
     def edit_syntax_colors_dialog(self):
         """Open a simple dialog to edit syntax tag fg/bg colors in syntax INI files."""
         try:
@@ -418,15 +699,11 @@ class BalrogNPC:
                     return
                 load_file(fn)
                 messagebox.showinfo('Saved', 'Colors saved', parent=dlg)
-                # reload highlighter if present
+                # reload highlighter if present; it keeps the buffer's syntax and
+                # re-highlights only if more than colors changed
                 try:
-                    if _SYNTAX_AVAILABLE and SyntaxHighlighter is not None:
-                        self.highlighter = SyntaxHighlighter(self.textArea)
-                        try:
-                            self._apply_syntax_mode(self.syntax_mode.get())
-                        except Exception:
-                            pass
-                        self.highlighter.schedule_highlight()
+                    if self.highlighter:
+                        self.highlighter.reload()
                 except Exception:
                     pass
 
@@ -476,26 +753,17 @@ class BalrogNPC:
             pass
 
 
-    def on_text_modified(self, event=None):
-        """Track when text is modified"""
+    def _on_edits(self, batch):
+        """Track modification and schedule highlighting after a turn of edits."""
+        if self._loader is not None or self.large_view is not None or self._switching:
+            # a file is streaming in, the large file view swapped its window,
+            # or a tab is being swapped in
+            return
+        self.doc.record(batch.changes)
         if self.textArea.edit_modified():
             self.modified = True
             self.update_title()
             self.textArea.edit_modified(False)
-            # Update line numbers when content changes
-            try:
-                self._update_line_numbers()
-            except Exception:
-                pass
-            # schedule highlight
-            try:
-                if self.highlighter:
-                    self.highlighter.schedule_highlight()
-            except Exception:
-                pass
-
-    def _on_key(self, event=None):
-        """Called on key/mouse events to schedule highlighting."""
         try:
             if self.highlighter:
                 self.highlighter.schedule_highlight()
@@ -566,18 +834,25 @@ class BalrogNPC:
         
         if self.modified:
             title += " *"
+        if self.large_view is not None:
+            title += " [read-only]"
         
         self.root.title(title)
+        self._refresh_tabs()
+        encoding = self.file_encoding or 'utf-8'
+        if self.doc.replaced:
+            encoding += f" ({self.doc.replaced:,} undecodable characters replaced)"
+        self.encoding_var.set(encoding)
 
     def check_save(self):
         """Check if user wants to save before proceeding"""
         if self.modified:
             response = messagebox.askyesnocancel(
                 "BalrogNPC",
-                "Do you want to save changes?"
+                f"Do you want to save changes to {self.doc.name}?"
             )
             if response is True:  # Yes
-                return self.save_file()
+                return self.save_file(wait=True)
             elif response is False:  # No
                 return True
         return True
@@ -622,173 +897,88 @@ class BalrogNPC:
         except Exception:
             pass
 
+        # matches come from a copy of the text kept until the next edit
+        search = text_search_for(self.textArea)
+
         def clear_highlights():
             try:
                 self.textArea.tag_remove('find_highlight', '1.0', 'end')
             except Exception:
                 pass
 
+        def pattern_source():
+            """Return (regex source, flags) for the dialog's settings."""
+            pat = find_var.get() if regex_var.get() else re.escape(find_var.get())
+            if wholeword_var.get():
+                # wrap with word boundaries if not already
+                if not pat.startswith(r'\b'):
+                    pat = r'\b' + pat
+                if not pat.endswith(r'\b'):
+                    pat = pat + r'\b'
+            return pat, 0 if case_var.get() else re.IGNORECASE
+
+        def compile_pattern():
+            pat, flags = pattern_source()
+            return re.compile(pat, flags)
+
         def highlight_all():
             clear_highlights()
             if not highlight_var.get():
                 return
-            pattern = find_var.get()
-            if not pattern:
+            if not find_var.get():
                 status_var.set('No search pattern')
                 return
-            content = self.textArea.get('1.0', 'end-1c')
             try:
-                import re
-                flags = 0
-                if not case_var.get():
-                    flags |= re.IGNORECASE
-
-                if not regex_var.get():
-                    pat = re.escape(pattern)
-                    if wholeword_var.get():
-                        pat = r'\b' + pat + r'\b'
-                else:
-                    pat = pattern
-                    if wholeword_var.get():
-                        # wrap with word boundaries if not already
-                        if not pat.startswith('\\b') and not pat.endswith('\\b'):
-                            pat = r'\\b' + pat + r'\\b'
-
-                regex = re.compile(pat, flags)
-                for m in regex.finditer(content):
+                regex = compile_pattern()
+                for start, end in search.find_all(regex):
                     # convert offsets to indices
-                    start_off, end_off = m.start(), m.end()
-                    sidx = self.textArea.index(f'1.0 + {start_off}c')
-                    eidx = self.textArea.index(f'1.0 + {end_off}c')
-                    self.textArea.tag_add('find_highlight', sidx, eidx)
-
+                    self.textArea.tag_add('find_highlight', search.index(start), search.index(end))
                 status_var.set('Highlights updated')
             except Exception as e:
                 status_var.set(f'Error: {e}')
 
         # Helper functions
-        def get_search_start_index():
+        def large_find(backwards):
+            # large file mode: search the mapped file, not the loaded window
+            view = self.large_view
             try:
-                if self.textArea.tag_ranges('sel'):
-                    # start after current selection
-                    idx = self.textArea.index('sel.last')
-                    # advance by one char to avoid re-finding same selection
-                    return self.textArea.index(f"{idx} + 1c")
+                pat, flags = pattern_source()
+                regex = re.compile(pat.encode(view.encoding), flags)
+                sel = self.textArea.tag_ranges('sel')
+                if sel:
+                    start = view.offset_at(sel[0] if backwards else sel[1])
                 else:
-                    return self.textArea.index('insert')
-            except Exception:
-                return '1.0'
-
-        def find_next(event=None):
-            pattern = find_var.get()
-            if not pattern:
-                status_var.set('No search pattern')
-                return False
-
-            start_index = get_search_start_index()
-            try:
-                if regex_var.get() or wholeword_var.get():
-                    import re
-                    flags = 0
-                    if not case_var.get():
-                        flags |= re.IGNORECASE
-
-                    pat = pattern if regex_var.get() else re.escape(pattern)
-                    if wholeword_var.get() and regex_var.get():
-                        # ensure boundaries
-                        if not pat.startswith('\\b'):
-                            pat = r'\\b' + pat
-                        if not pat.endswith('\\b'):
-                            pat = pat + r'\\b'
-                    elif wholeword_var.get() and not regex_var.get():
-                        pat = r'\\b' + pat + r'\\b'
-
-                    content = self.textArea.get('1.0', 'end-1c')
-                    line, col = map(int, start_index.split('.'))
-                    lines = content.splitlines(True)
-                    offset = sum(len(lines[i]) for i in range(max(0, line-1))) + col
-                    regex = re.compile(pat, flags)
-                    m = regex.search(content, pos=offset)
-                    if not m:
-                        status_var.set('No more matches')
-                        return False
-                    start_off, end_off = m.start(), m.end()
-                    sidx = self.textArea.index(f'1.0 + {start_off}c')
-                    eidx = self.textArea.index(f'1.0 + {end_off}c')
-                else:
-                    nocase = not case_var.get()
-                    sidx = self.textArea.search(pattern, start_index, nocase=nocase, stopindex='end')
-                    if not sidx:
-                        status_var.set('No more matches')
-                        return False
-                    eidx = f"{sidx} + {len(pattern)}c"
-
-                # Select match
-                self.textArea.tag_remove('sel', '1.0', 'end')
-                self.textArea.tag_add('sel', sidx, eidx)
-                self.textArea.mark_set('insert', eidx)
-                self.textArea.see(sidx)
-                status_var.set(f'Match at {sidx}')
-                if highlight_var.get():
-                    highlight_all()
+                    start = view.offset_at('insert')
+                found = view.find(regex, start, backwards)
+                if not found:
+                    status_var.set('No previous match' if backwards else 'No more matches')
+                    return False
+                status_var.set(f'Match at {view.select(*found)}')
                 return True
             except Exception as e:
                 status_var.set(f'Error: {e}')
                 return False
 
-        def find_prev(event=None):
-            pattern = find_var.get()
-            if not pattern:
+        def find(backwards):
+            if not find_var.get():
                 status_var.set('No search pattern')
                 return False
-
-            # Determine search offset (position before current selection/start)
+            if self.large_view is not None:
+                return large_find(backwards)
             try:
+                # search on from the selection, or from the cursor
                 if self.textArea.tag_ranges('sel'):
-                    idx = self.textArea.index('sel.first')
-                    start_index = self.textArea.index(f"{idx} - 1c")
+                    start = search.offset('sel.first' if backwards else 'sel.last')
                 else:
-                    start_index = self.textArea.index('insert')
-
-                if regex_var.get() or wholeword_var.get():
-                    import re
-                    flags = 0
-                    if not case_var.get():
-                        flags |= re.IGNORECASE
-
-                    pat = pattern if regex_var.get() else re.escape(pattern)
-                    if wholeword_var.get() and not regex_var.get():
-                        pat = r'\\b' + pat + r'\\b'
-                    elif wholeword_var.get() and regex_var.get():
-                        if not pat.startswith('\\b'):
-                            pat = r'\\b' + pat
-                        if not pat.endswith('\\b'):
-                            pat = pat + r'\\b'
-
-                    content = self.textArea.get('1.0', 'end-1c')
-                    line, col = map(int, start_index.split('.'))
-                    lines = content.splitlines(True)
-                    offset = sum(len(lines[i]) for i in range(max(0, line-1))) + col
-                    regex = re.compile(pat, flags)
-                    last_match = None
-                    for m in regex.finditer(content):
-                        if m.start() < offset:
-                            last_match = m
-                        else:
-                            break
-                    if not last_match:
-                        status_var.set('No previous match')
-                        return False
-                    sidx = self.textArea.index(f'1.0 + {last_match.start()}c')
-                    eidx = self.textArea.index(f'1.0 + {last_match.end()}c')
-                else:
-                    # use Text.search backwards
-                    sidx = self.textArea.search(pattern, start_index, backwards=True, nocase=not case_var.get(), stopindex='1.0')
-                    if not sidx:
-                        status_var.set('No previous match')
-                        return False
-                    eidx = f"{sidx} + {len(pattern)}c"
+                    start = search.offset('insert')
+                found = search.find(compile_pattern(), start, backwards)
+                if not found:
+                    status_var.set('No previous match' if backwards else 'No more matches')
+                    return False
+                sidx = search.index(found[0])
+                eidx = search.index(found[1])
 
+                # Select match
                 self.textArea.tag_remove('sel', '1.0', 'end')
                 self.textArea.tag_add('sel', sidx, eidx)
                 self.textArea.mark_set('insert', eidx)
@@ -801,8 +991,17 @@ class BalrogNPC:
                 status_var.set(f'Error: {e}')
                 return False
 
+        def find_next(event=None):
+            return find(False)
+
+        def find_prev(event=None):
+            return find(True)
+
         def replace_next():
             # If selection present and matches pattern, replace it; else find next then replace
+            if self.large_view is not None:
+                status_var.set('Large file mode is read-only')
+                return False
             repl = replace_var.get()
             if self.textArea.tag_ranges('sel'):
                 try:
@@ -813,9 +1012,6 @@ class BalrogNPC:
                     end_idx = self.textArea.index(f"{sel_start} + {len(repl)}c")
                     self.textArea.mark_set('insert', end_idx)
                     self.textArea.see(end_idx)
-                    self.modified = True
-                    self.update_title()
-                    self._update_line_numbers()
                     status_var.set(f'Replaced at {sel_start}')
                     if highlight_var.get():
                         highlight_all()
@@ -830,34 +1026,20 @@ class BalrogNPC:
                 return False
 
         def replace_all():
+            if self.large_view is not None:
+                status_var.set('Large file mode is read-only')
+                return
             pattern = find_var.get()
             if not pattern:
                 status_var.set('No search pattern')
                 return
             repl = replace_var.get()
             try:
-                content = self.textArea.get('1.0', 'end-1c')
-                count = 0
-                import re
-                flags = 0
-                if not case_var.get():
-                    flags |= re.IGNORECASE
-
-                if regex_var.get():
-                    pat = pattern
-                else:
-                    pat = re.escape(pattern)
-                if wholeword_var.get():
-                    pat = r'\\b' + pat + r'\\b'
-
-                new, count = re.subn(pat, repl, content, flags=flags)
+                new, count = compile_pattern().subn(repl, search.content)
 
                 # Replace entire content
                 self.textArea.delete('1.0', 'end')
                 self.textArea.insert('1.0', new)
-                self.modified = True
-                self.update_title()
-                self._update_line_numbers()
                 status_var.set(f'Replaced {count} occurrence(s)')
                 if highlight_var.get():
                     highlight_all()
@@ -873,6 +1055,7 @@ class BalrogNPC:
         ttk.Button(btn_frame, text="Replace Next", command=replace_next).pack(side=LEFT, padx=4)
         ttk.Button(btn_frame, text="Replace All", command=replace_all).pack(side=LEFT, padx=4)
         ttk.Button(btn_frame, text="Close", command=lambda: (clear_highlights(), dlg.destroy())).pack(side=LEFT, padx=4)
+        dlg.bind('<Destroy>', lambda e: search.release() if e.widget is dlg else None)
 
         # Bind Enter and Shift+Enter
         find_entry.bind('<Return>', lambda e: find_next())
@@ -950,53 +1133,82 @@ class BalrogNPC:
     def on_external_insert(self, syntax_hint=None):
         """Called when an external tool inserts text into the editor.
 
-        syntax_hint may be 'script' or 'database' to prefer a syntax.
+        The syntax is detected from the buffer content (memoized, so cheap on
+        repeated inserts); syntax_hint ('script' or 'database') is used when
+        nothing is detected.
         """
         try:
-            # if highlighter present, apply hinted syntax
-            if syntax_hint:
-                self.syntax_mode.set(syntax_hint)
-                self._apply_syntax_mode(syntax_hint)
+            name = self.highlighter.detect_syntax(self.current_file) if self.highlighter else None
+            if name:
+                self.syntax_mode.set(self._syntax_mode_for(name))
+                if getattr(self.highlighter, '_current', None) != name:
+                    self.highlighter.set_syntax(name)
+                self.highlighter.highlight()
             else:
-                # default to script
-                self.syntax_mode.set('script')
-                self._apply_syntax_mode('script')
+                mode = syntax_hint or 'script'
+                self.syntax_mode.set(mode)
+                self._apply_syntax_mode(mode)
+        except Exception:
+            pass
+
+    def _syntax_mode_for(self, name):
+        """Map a highlighter syntax name to the Syntax menu value."""
+        if not name:
+            return 'none'
+        ln = name.lower()
+        if 'yaml' in ln or 'yml' in ln or 'db' in ln:
+            return 'database'
+        # treat as script by default
+        return 'script'
+
+    def _on_highlight_status(self, status):
+        """Show highlight latency and background backlog in their status field."""
+        try:
+            latency = status.get('latency_ms')
+            if latency is None:
+                self.highlight_status_var.set('')
+                return
+            text = f"Highlight {latency:.1f} ms"
+            if status.get('backlog'):
+                text += f" | {status['backlog']:,} lines queued"
+            self.highlight_status_var.set(text)
         except Exception:
             pass
 
     def _update_line_numbers(self):
+        # cheap: the gutter only redraws if the visible numbers changed
+        try:
+            self.line_numbers.schedule()
+        except Exception:
+            pass
+
+    def _on_scrollbar(self, *args):
         try:
-            last_index = self.textArea.index('end-1c')
-            last_line = int(last_index.split('.')[0])
-            nums = '\n'.join(str(i) for i in range(1, last_line + 1))
-            self.line_numbers.config(state=NORMAL)
-            self.line_numbers.delete('1.0', 'end')
-            self.line_numbers.insert('1.0', nums)
-            self.line_numbers.config(state=DISABLED)
+            if self.large_view is not None:
+                self.large_view.yview(*args)
+            else:
+                self.textArea.yview(*args)
         except Exception:
             pass
 
     def _on_textscroll(self, first, last):
         # Called by text widget via its yscrollcommand; sync line numbers and scrollbar
         try:
-            # first/last are strings like '0.0'.. we move line numbers accordingly
-            self.line_numbers.yview_moveto(first)
+            self.line_numbers.schedule()
+            if self.large_view is not None:
+                # the scrollbar covers the whole file, not the loaded window
+                first, last = self.large_view.on_scroll(first, last)
             # update scrollbar
             try:
                 self.scrollbar.set(first, last)
             except Exception:
                 pass
-        except Exception:
-            pass
-
-    def _on_ln_click(self, event):
-        try:
-            # find line clicked and move cursor there
-            index = self.line_numbers.index(f"@0,{event.y}")
-            line = int(index.split('.')[0])
-            self.textArea.mark_set('insert', f"{line}.0")
-            self.textArea.see(f"{line}.0")
-            self.textArea.focus()
+            # let the highlighter color newly visible lines first
+            try:
+                if self.highlighter:
+                    self.highlighter.on_view_changed()
+            except Exception:
+                pass
         except Exception:
             pass
 
@@ -1005,6 +1217,10 @@ class BalrogNPC:
             line = simpledialog.askinteger("Go To Line", "Line number:", parent=self.root, minvalue=1)
             if line is None:
                 return
+            if self.large_view is not None:
+                self.large_view.goto(line)
+                self.textArea.focus()
+                return True
             self.textArea.mark_set('insert', f"{line}.0")
             self.textArea.see(f"{line}.0")
             self.textArea.focus()
@@ -1014,35 +1230,11 @@ class BalrogNPC:
         return True
     
     def new_file(self):
-        """Create a new file"""
-        if not self.check_save():
-            return
-        
-        self.textArea.delete(1.0, END)
-        self.current_file = None
-        self.modified = False
-        self.update_title()
-        try:
-            self._update_line_numbers()
-        except Exception:
-            pass
-        # clear syntax highlighting when new file
-        try:
-            if self.highlighter:
-                self.highlighter.set_syntax(None)
-                self.highlighter.highlight()
-                try:
-                    self.syntax_mode.set('none')
-                except Exception:
-                    pass
-        except Exception:
-            pass
+        """Create a new file in a new tab"""
+        self._new_tab()
 
     def open_file(self):
-        """Open an existing file"""
-        if not self.check_save():
-            return
-
+        """Open an existing file in a tab"""
         filepath = filedialog.askopenfilename(
             defaultextension=".txt",
             filetypes=[
@@ -1054,53 +1246,189 @@ class BalrogNPC:
         )
 
         if filepath:
+            if self._tab_for(filepath) or not self._use_blank_tab():
+                return
             try:
-                with open(filepath, 'r', encoding='utf-8') as f:
-                    content = f.read()
-
-                self.textArea.delete(1.0, END)
-                self.textArea.insert(1.0, content)
-                self.current_file = filepath
-                self.modified = False
-                self.update_title()
-                try:
-                    self._update_line_numbers()
-                except Exception:
-                    pass
-                # set syntax based on file
-                try:
-                    if self.highlighter:
-                        name = self.highlighter.set_syntax_for_file(self.current_file)
-                        # reflect detected syntax in menu
-                        try:
-                            if name:
-                                ln = name.lower()
-                                if 'yaml' in ln or 'yml' in ln or 'db' in ln:
-                                    self.syntax_mode.set('database')
-                                else:
-                                    # treat as script by default
-                                    self.syntax_mode.set('script')
-                            else:
-                                self.syntax_mode.set('none')
-                        except Exception:
-                            pass
-                        self.highlighter.highlight()
-                except Exception:
-                    pass
-            except Exception as e:
+                size = os.path.getsize(filepath)
+            except OSError:
+                size = 0
+            if size >= LARGE_FILE_BYTES and messagebox.askyesno(
+                    "Large File",
+                    f"{os.path.basename(filepath)} is {size / 1048576:.0f} MB.\n"
+                    "Open it read-only in large file mode?"):
+                self._open_large(filepath)
+            else:
+                self._load_file(filepath)
+
+    def open_large_file(self):
+        """Browse a file read-only without loading it all into the editor"""
+        filepath = filedialog.askopenfilename(
+            filetypes=[
+                ("All Files", "*.*"),
+                ("Log Files", "*.log"),
+                ("YAML Files", "*.yml;*.yaml"),
+                ("SQL Files", "*.sql")
+            ]
+        )
+        if filepath:
+            if self._tab_for(filepath) or not self._use_blank_tab():
+                return
+            self._open_large(filepath)
+
+    def _open_large(self, filepath):
+        self.cancel_loading()
+        self.close_large_view()
+        # nothing to journal: the view is read-only
+        self.journal.stop()
+        try:
+            if self.highlighter:
+                self.highlighter.set_syntax(None)
+                self.syntax_mode.set('none')
+        except Exception:
+            pass
+        try:
+            self.large_view = LargeFileView(
+                self.textArea, filepath,
+                gutter=self.line_numbers,
+                on_status=self.status_var.set,
+            )
+        except Exception as e:
+            self.large_view = None
+            self.textArea.config(state=NORMAL)
+            messagebox.showerror(
+                "Error",
+                f"Could not open file:\n{str(e)}"
+            )
+            return
+        self.current_file = filepath
+        self.file_encoding = self.large_view.encoding
+        self.doc.replaced = 0
+        self.modified = False
+        self.update_title()
+
+    def close_large_view(self):
+        """Leave large file mode; the editor becomes an empty, editable buffer."""
+        if self.large_view is None:
+            return
+        view = self.large_view
+        self.large_view = None
+        try:
+            view.close()
+        except Exception:
+            pass
+        self.textArea.config(state=NORMAL)
+        self.textArea.edit_modified(False)
+        self.textArea.edit_reset()
+        self._reset_history()
+        self.current_file = None
+        self.file_encoding = 'utf-8'
+        self.modified = False
+        self.update_title()
+        self.journal.start(None, content='')
+        self.status_var.set('')
+
+    def _load_file(self, filepath):
+        """Stream `filepath` into the editor; highlighting waits for the end."""
+        self.cancel_loading()
+        self.close_large_view()
+        self.journal.stop()
+        try:
+            if self.highlighter:
+                self.highlighter.set_syntax(None)
+        except Exception:
+            pass
+        try:
+            self._loader = ChunkedLoader(
+                self.textArea, filepath,
+                on_progress=self._on_load_progress,
+                on_done=self._on_file_loaded,
+            )
+            self._on_load_progress(0, self._loader.total)
+            self._loader.start()
+        except Exception as e:
+            self._loader = None
+            messagebox.showerror(
+                "Error",
+                f"Could not open file:\n{str(e)}"
+            )
+
+    def cancel_loading(self):
+        """Stop a file that is still being opened."""
+        if self._loader is not None:
+            self._loader.cancel()
+
+    def _on_load_progress(self, done, total):
+        try:
+            name = os.path.basename(self._loader.path)
+            pct = done * 100 // total if total else 100
+            self.status_var.set(f"Loading {name}: {pct}% of {total / 1048576:.1f} MB (Esc to cancel)")
+        except Exception:
+            pass
+
+    def _on_file_loaded(self, loader, error):
+        """Finish opening a file once its loader is done, failed or cancelled."""
+        self._loader = None
+        name = os.path.basename(loader.path)
+        if error is not None or loader.cancelled:
+            # the partial text is not the file; leave an empty, unnamed buffer
+            self.textArea.delete(1.0, END)
+            self.textArea.edit_modified(False)
+            self.textArea.edit_reset()
+            self._reset_history()
+            self.current_file = None
+            self.file_encoding = 'utf-8'
+            self.doc.replaced = 0
+            self.modified = False
+            self.update_title()
+            self.journal.start(None, content='')
+            self.status_var.set('' if error is not None else f"Cancelled opening {name}")
+            if error is not None:
                 messagebox.showerror(
                     "Error",
-                    f"Could not open file:\n{str(e)}"
+                    f"Could not open file:\n{str(error)}"
                 )
+            return
 
-    def save_file(self):
+        self.textArea.edit_modified(False)
+        self._reset_history()
+        self.textArea.mark_set('insert', '1.0')
+        self.textArea.see('1.0')
+        self.current_file = loader.path
+        self.file_encoding = loader.encoding
+        self.doc.replaced = loader.replaced
+        self.modified = False
+        self.update_title()
+        self.journal.start(self.current_file, self.file_encoding)
+        if loader.replaced:
+            self.status_var.set(f"Opened {name} ({loader.encoding}; "
+                                f"{loader.replaced:,} undecodable characters replaced)")
+        else:
+            self.status_var.set(f"Opened {name} ({loader.encoding})")
+        try:
+            self._update_line_numbers()
+        except Exception:
+            pass
+        # set syntax based on file
+        try:
+            if self.highlighter:
+                name = self.highlighter.set_syntax_for_file(self.current_file)
+                # reflect detected syntax in menu
+                try:
+                    self.syntax_mode.set(self._syntax_mode_for(name))
+                except Exception:
+                    pass
+                self.highlighter.highlight()
+        except Exception:
+            pass
+
+    def save_file(self, wait=False):
         """Save current file"""
         if self.current_file:
-            return self._save_to_file(self.current_file)
+            return self._save_to_file(self.current_file, wait)
         else:
-            return self.save_as_file()
+            return self.save_as_file(wait)
     
-    def save_as_file(self):
+    def save_as_file(self, wait=False):
         """Save file with new name"""
         filepath = filedialog.asksaveasfilename(
             defaultextension=".txt",
@@ -1113,47 +1441,109 @@ class BalrogNPC:
         )
         
         if filepath:
-            return self._save_to_file(filepath)
+            return self._save_to_file(filepath, wait)
         return False
     
-    def _save_to_file(self, filepath):
-        """Internal method to save to file"""
-        try:
-            content = self.textArea.get(1.0, END)
-            # Remove trailing newline that Text widget adds
-            if content.endswith('\n'):
-                content = content[:-1]
-            
-            with open(filepath, 'w', encoding='utf-8') as f:
-                f.write(content)
-            
-            self.current_file = filepath
-            self.modified = False
-            self.update_title()
+    def _save_to_file(self, filepath, wait=False, doc=None):
+        """Internal method to save to file.
+
+        The write happens on the saver's thread; with `wait` it is finished
+        (and its result returned) before this returns. `doc` is the document
+        to save, the current one by default.
+        """
+        doc = doc or self.doc
+        if doc is self.doc and self.large_view is not None:
+            messagebox.showinfo("BalrogNPC", "Large file mode is read-only.")
+            return False
+        if doc is self.doc and self._loader is not None:
+            messagebox.showinfo("BalrogNPC", "The file is still being opened.")
+            return False
+        self.status_var.set(f"Saving {os.path.basename(filepath)}...")
+        # the outcome of this save only: with `wait` the saver first finishes
+        # any save already running, whose callback runs before this one's
+        outcome = []
+
+        def on_done(path, version, error):
+            # the tab may be switched before the save starts or ends
+            outcome.append(self._on_saved(doc, path, version, error))
+
+        self.saver.save(filepath, lambda: self._save_snapshot(doc), doc.encoding, on_done,
+                        wait=wait)
+        return bool(outcome and outcome[0]) if wait else True
+
+    def _save_snapshot(self, doc):
+        """Return the text of `doc` to save and the edit version it corresponds to."""
+        if doc is self.doc:
+            # publish pending edits first so they cannot mark the saved text modified
+            self.edit_bus.flush()
+            content = self.textArea.get('1.0', 'end-1c')
+        else:
+            content = doc.text
+        # newlines as text mode would write them
+        return content.replace('\n', os.linesep), doc.version
+
+    def _on_saved(self, doc, filepath, version, error):
+        """Report a finished save of `doc` (called on the UI thread).
+
+        Returns True if the text ended up in the file.
+        """
+        if isinstance(error, UnicodeEncodeError):
+            # text typed since opening does not fit the file's encoding
+            self.status_var.set('')
+            if messagebox.askyesno(
+                    "Save",
+                    f"The text cannot be saved as {doc.encoding}.\n"
+                    "Save it as UTF-8 instead?"):
+                doc.encoding = 'utf-8'
+                return self._save_to_file(filepath, wait=True, doc=doc)
+            return False
+        if error is not None:
+            self.status_var.set('')
+            messagebox.showerror(
+                "Error",
+                f"Could not save file:\n{str(error)}"
+            )
+            return False
+
+        self.status_var.set(f"Saved {os.path.basename(filepath)}")
+        if doc not in self.docs:
+            # the tab was closed meanwhile
+            return True
+        renamed = filepath != doc.path
+        doc.path = filepath
+        # the file now holds the text as it reads in the editor
+        doc.replaced = 0
+        # edits made while the file was being written are still unsaved
+        if doc.version == version:
+            doc.modified = False
+            self._rejournal(doc)
+        else:
+            self._rejournal(doc, content=self.textArea.get('1.0', 'end-1c')
+                            if doc is self.doc else doc.text)
+        self.update_title()
+        if renamed and doc is self.doc:
             try:
                 if self.highlighter:
                     name = self.highlighter.set_syntax_for_file(self.current_file)
                     try:
-                        if name:
-                            ln = name.lower()
-                            if 'yaml' in ln or 'yml' in ln or 'db' in ln:
-                                self.syntax_mode.set('database')
-                            else:
-                                self.syntax_mode.set('script')
-                        else:
-                            self.syntax_mode.set('none')
+                        self.syntax_mode.set(self._syntax_mode_for(name))
                     except Exception:
                         pass
                     self.highlighter.highlight()
             except Exception:
                 pass
-            return True
-        except Exception as e:
-            messagebox.showerror(
-                "Error",
-                f"Could not save file:\n{str(e)}"
-            )
-            return False
+        return True
+
+    def _rejournal(self, doc, content=None):
+        """Journal `doc` from its saved file on, or from `content` when given."""
+        if doc is self.doc:
+            self.journal.start(doc.path, doc.encoding, content=content)
+            return
+        current = self.journal.suspend()
+        self.journal.resume(doc.journal)
+        self.journal.start(doc.path, doc.encoding, content=content)
+        doc.journal = self.journal.suspend()
+        self.journal.resume(current)
     
     def undo(self):
         """Undo last action"""
@@ -1182,6 +1572,12 @@ class BalrogNPC:
             self.textArea.event_generate("<<Paste>>")
         except:
             pass
+        # an untitled buffer has no syntax yet: detect it from what was pasted
+        try:
+            if self.syntax_mode.get() == 'none' and not self.current_file:
+                self.on_external_insert()
+        except Exception:
+            pass
     
     def delete(self):
         """Delete selected text"""
@@ -1205,6 +1601,7 @@ class BalrogNPC:
         else:
             self.textArea.config(wrap=WORD)
             self.word_wrap_enabled = True
+        self._update_line_numbers()
     
     def change_font(self):
         """Open font dialog"""
@@ -1236,6 +1633,7 @@ class BalrogNPC:
         def apply_font():
             new_size = size_var.get()
             self.textArea.config(font=("Courier New", new_size))
+            self._update_line_numbers()
             dialog.destroy()
         
         Button(frame, text="OK", command=apply_font, width=10).pack(side=RIGHT, padx=5)
@@ -1264,9 +1662,23 @@ Based on Windows XP Notepad with rAthena Tools menu.
     
     def exit_app(self):
         """Exit application"""
-        if not self.check_save():
-            return
-        
+        # a file still being opened has nothing to save
+        self.cancel_loading()
+        for doc in list(self.docs):
+            if doc.modified:
+                self.select_tab(doc)
+                if not self.check_save():
+                    return
+        self.close_large_view()
+        # let a save in progress reach the disk
+        self.saver.wait()
+        # a clean exit leaves no journal to recover
+        for doc in self.docs:
+            if doc.journal is not None:
+                self.journal.resume(doc.journal)
+                doc.journal = None
+        self.journal.close()
+
         self.root.destroy()
 
 
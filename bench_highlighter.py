@@ -0,0 +1,330 @@
+"""Benchmark the syntax highlighter on synthetic rAthena scripts and YAML DBs.
+
+    python bench_highlighter.py [--sizes 1000,10000,100000] [--repeat 3]
+                                [--out results.json] [--baseline old.json]
+
+For every corpus (an rAthena NPC script and an item_db style YAML file at
+each size) three phases are timed separately:
+
+- load: reading the syntax directory the way `_load_all_syntaxes` does,
+  cold (no parse cache), warm (from the cache) and as a reload where every
+  file is unchanged
+- tokenize: `syntax_tokenizer.tokenize` over the whole text
+- tag: applying those tokens to a Tk Text widget, a full highlight() pass
+  (lex + tag) and the pass after a one-character edit in the middle
+
+Tagging needs a display. On a headless machine run the script under Xvfb
+(`xvfb-run python bench_highlighter.py`); without a display the tag phase
+is reported as null. Each timing is the min and median of `--repeat` runs,
+in milliseconds. Results are printed and, with --out, written as JSON;
+--baseline prints each timing as a ratio to an earlier JSON run.
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import platform
+import argparse
+import contextlib
+import statistics
+import tempfile
+
+import syntax_highlighter
+from syntax_highlighter import SyntaxHighlighter, load_syntaxes
+from syntax_tokenizer import NORMAL, lex, tokenize
+
+
+SYNTAX_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'syntax')
+
+_MAPS = ['prontera', 'geffen', 'payon', 'morocc', 'alberta', 'izlude', 'aldebaran']
+_SPRITES = ['4_F_KAFRA1', '4_M_JOB_KNIGHT1', '1_F_PRIEST', '4_M_MERCHANT', '4_F_ALCHE']
+_ITEM_TYPES = ['Healing', 'Usable', 'Etc', 'Weapon', 'Armor', 'Card']
+
+
+def make_rathena_script(lines, seed=0):
+    """Return about `lines` lines of NPC script (exactly `lines` lines)."""
+    rnd = random.Random(seed)
+    out = []
+    n = 0
+    while len(out) < lines:
+        n += 1
+        town = rnd.choice(_MAPS)
+        out.append('//===== rAthena Script ===========================================')
+        out.append(f'//= Synthetic helper NPC #{n}')
+        out.append('//=================================================================')
+        out.append(f'{town},{rnd.randint(20, 300)},{rnd.randint(20, 300)},{rnd.randint(0, 7)}'
+                   f'\tscript\tHelper#{n}\t{rnd.choice(_SPRITES)},{{')
+        out.append('\tmes "[Helper]";')
+        out.append('\tmes "Hello, " + strcharinfo(0) + "! What can I do for you?";')
+        out.append('\tnext;')
+        out.append('\tswitch(select("Heal:Warp to town:Buy potions:Cancel")) {')
+        out.append('\tcase 1:')
+        out.append('\t\tpercentheal 100,100;')
+        out.append('\t\tmes "[Helper]";')
+        out.append('\t\tmes "There you go.";')
+        out.append('\t\tbreak;')
+        out.append('\tcase 2:')
+        out.append(f'\t\twarp "{town}",{rnd.randint(100, 200)},{rnd.randint(100, 200)};')
+        out.append('\t\tend;')
+        out.append('\tcase 3:')
+        out.append(f'\t\tif (Zeny < {rnd.randint(1, 20) * 100}) {{')
+        out.append('\t\t\tmes "You do not have enough Zeny.";')
+        out.append('\t\t\tclose;')
+        out.append('\t\t}')
+        out.append('\t\tset Zeny, Zeny - 500;')
+        out.append(f'\t\tgetitem {rnd.randint(501, 520)},{rnd.randint(1, 30)};')
+        out.append('\t\tbreak;')
+        out.append('\t}')
+        out.append('\tclose;')
+        out.append('')
+        out.append('/* The timer below refreshes the counter every few seconds;')
+        out.append('   it is restarted from OnInit when the server loads. */')
+        out.append('OnInit:')
+        out.append('\tset .@count, 0;')
+        out.append('\t$@helper_calls = 0;')
+        out.append('\tinitnpctimer;')
+        out.append('\tend;')
+        out.append(f'OnTimer{rnd.randint(1, 60) * 1000}:')
+        out.append('\t.@count += 1; // TODO: tune the interval')
+        out.append('\tstopnpctimer;')
+        out.append('\tend;')
+        out.append('}')
+        out.append('')
+        if n % 3 == 0:
+            out.append(f'function\tscript\tF_Helper{n}\t{{')
+            out.append('\tset .@amount, getarg(0);')
+            out.append('\tif (countitem(501) < .@amount) return 0;')
+            out.append('\tdelitem 501, .@amount;')
+            out.append('\treturn 1;')
+            out.append('}')
+            out.append('')
+    return '\n'.join(out[:lines]) + '\n'
+
+
+def make_yaml_db(lines, seed=0):
+    """Return `lines` lines of an item_db style YAML file."""
+    rnd = random.Random(seed)
+    out = ['# This file is a synthetic item database for benchmarks.',
+           'Header:', '  Type: ITEM_DB', '  Version: 3', '', 'Body:']
+    item = 500
+    while len(out) < lines:
+        item += 1
+        name = f'Item_{item}'
+        out.append(f'  - Id: {item}')
+        out.append(f'    AegisName: {name}')
+        out.append(f'    Name: "{name.replace("_", " ")}"')
+        out.append(f'    Type: {rnd.choice(_ITEM_TYPES)}')
+        out.append(f'    Buy: {rnd.randint(1, 500) * 10}')
+        out.append(f'    Weight: {rnd.randint(1, 100) * 10}')
+        if rnd.random() < 0.5:
+            out.append('    Flags:')
+            out.append('      BuyingStore: true')
+        if rnd.random() < 0.6:
+            out.append('    Script: |')
+            out.append(f'      itemheal rand({rnd.randint(10, 50)},{rnd.randint(51, 99)}),0;')
+            out.append('      specialeffect2 EF_POTION1;')
+        if rnd.random() < 0.1:
+            out.append('    # NOTE: price checked against the official table')
+    return '\n'.join(out[:lines]) + '\n'
+
+
+CORPORA = [
+    ('rathena', 'rathena.ini', make_rathena_script),
+    ('yaml', 'yaml.ini', make_yaml_db),
+]
+
+
+def _timed(fn, repeat):
+    """Run `fn` `repeat` times; return ({'min', 'median'} in ms, last result)."""
+    times = []
+    result = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn()
+        times.append((time.perf_counter() - t0) * 1000.0)
+    return {'min': round(min(times), 3), 'median': round(statistics.median(times), 3)}, result
+
+
+@contextlib.contextmanager
+def private_syntax_cache():
+    """Point the syntax parse cache at a temporary file while in the block.
+
+    The benchmark then never reads or overwrites the editor's own cache in
+    the home directory.
+    """
+    saved = syntax_highlighter._SYNTAX_CACHE_FILE
+    with tempfile.TemporaryDirectory() as tmp:
+        syntax_highlighter._SYNTAX_CACHE_FILE = os.path.join(tmp, 'syntax_cache.pickle')
+        try:
+            yield
+        finally:
+            syntax_highlighter._SYNTAX_CACHE_FILE = saved
+
+
+def bench_load(syntax_dir, repeat):
+    """Time loading the syntax directory cold, warm and as a no-op reload."""
+    out = {}
+    with private_syntax_cache():
+        out['cold'], loaded = _timed(lambda: load_syntaxes(syntax_dir, use_cache=False), repeat)
+        load_syntaxes(syntax_dir)  # make sure the parse cache is current
+        out['warm'], _ = _timed(lambda: load_syntaxes(syntax_dir), repeat)
+        out['reload'], _ = _timed(lambda: load_syntaxes(syntax_dir, previous=loaded[0]), repeat)
+    out['files'] = loaded[1]['files']
+    return out
+
+
+def _syntax_by_file(syntaxes, filename):
+    for name, syn in syntaxes.items():
+        if os.path.basename(syn['file']) == filename:
+            return name, syn
+    return None, None
+
+
+def _open_display():
+    try:
+        import tkinter
+        root = tkinter.Tk()
+        root.withdraw()
+        return tkinter, root
+    except Exception:
+        return None, None
+
+
+def bench_tagging(tk, root, syntax_dir, name, content, repeat):
+    """Time tag application and full/edit highlight passes on a Text widget."""
+    text = tk.Text(root)
+    hl = SyntaxHighlighter(text, syntax_dir, viewport_first=False, threaded=False)
+    hl.set_syntax(name)
+    syn = hl._syntaxes[name]
+    tagnames = hl._tagnames(syn)
+    nlines = content.count('\n') + 1
+    out = {}
+    try:
+        def reset():
+            # deleting the text drops its tags as well
+            text.delete('1.0', 'end')
+            text.insert('1.0', content)
+            hl._dirty = []
+
+        def apply_only():
+            reset()
+            spans, crossing, end_state, _ = lex(syn, text.get('1.0', 'end-1c'))
+            t0 = time.perf_counter()
+            hl._apply_spans(tagnames, 1, nlines, spans, crossing, NORMAL, end_state, nlines)
+            return (time.perf_counter() - t0) * 1000.0
+
+        applied = [apply_only() for _ in range(repeat)]
+        out['apply'] = {'min': round(min(applied), 3), 'median': round(statistics.median(applied), 3)}
+
+        full, edit = [], []
+        middle = f'{nlines // 2}.0'
+        for _ in range(repeat):
+            reset()
+            hl._full = True
+            t0 = time.perf_counter()
+            hl.highlight()
+            full.append((time.perf_counter() - t0) * 1000.0)
+            text.insert(middle, 'x')
+            t0 = time.perf_counter()
+            hl.highlight()
+            edit.append((time.perf_counter() - t0) * 1000.0)
+        out['full_pass'] = {'min': round(min(full), 3), 'median': round(statistics.median(full), 3)}
+        out['edit_pass'] = {'min': round(min(edit), 3), 'median': round(statistics.median(edit), 3)}
+        out['ranges'] = sum(len(text.tag_ranges(t)) // 2 for t in tagnames)
+    finally:
+        hl.close()
+        text.destroy()
+    return out
+
+
+def run(sizes, repeat, syntax_dir=SYNTAX_DIR):
+    with private_syntax_cache():
+        return _run(sizes, repeat, syntax_dir)
+
+
+def _run(sizes, repeat, syntax_dir):
+    syntaxes, _ = load_syntaxes(syntax_dir)
+    tk, root = _open_display()
+    report = {
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'tk': root.tk.call('info', 'patchlevel') if root is not None else None,
+        'repeat': repeat,
+        'load': bench_load(syntax_dir, repeat),
+        'corpora': [],
+    }
+    try:
+        for corpus, filename, make in CORPORA:
+            name, syn = _syntax_by_file(syntaxes, filename)
+            if syn is None:
+                print(f"[WARNING] {filename} not found in {syntax_dir}; skipping {corpus}")
+                continue
+            for size in sizes:
+                content = make(size)
+                entry = {'corpus': corpus, 'syntax': name, 'lines': size, 'chars': len(content)}
+                entry['tokenize'], tokens = _timed(lambda: tokenize(syn, content), repeat)
+                entry['tokens'] = len(tokens)
+                entry['tag'] = None
+                if root is not None:
+                    entry['tag'] = bench_tagging(tk, root, syntax_dir, name, content, repeat)
+                report['corpora'].append(entry)
+    finally:
+        if root is not None:
+            root.destroy()
+    return report
+
+
+def _flatten(report):
+    """Return {metric path: median ms} for comparing two reports."""
+    flat = {}
+    for phase, value in report.get('load', {}).items():
+        if isinstance(value, dict):
+            flat[f'load.{phase}'] = value['median']
+    for entry in report.get('corpora', []):
+        prefix = f"{entry['corpus']}.{entry['lines']}"
+        flat[f'{prefix}.tokenize'] = entry['tokenize']['median']
+        for phase, value in (entry.get('tag') or {}).items():
+            if isinstance(value, dict):
+                flat[f'{prefix}.tag.{phase}'] = value['median']
+    return flat
+
+
+def print_report(report, baseline=None):
+    old = _flatten(baseline) if baseline else {}
+    for key, ms in _flatten(report).items():
+        line = f'{key:32} {ms:10.2f} ms'
+        if old.get(key):
+            line += f'   x{ms / old[key]:.2f} vs baseline'
+        print(line)
+    if report['tk'] is None:
+        print('(no display: tag phase skipped; run under xvfb-run to include it)')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the syntax highlighter.')
+    parser.add_argument('--sizes', default='1000,10000,100000',
+                        help='comma separated corpus sizes in lines')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--out', help='write the results to this JSON file')
+    parser.add_argument('--baseline', help='earlier JSON results to compare with')
+    parser.add_argument('--syntax-dir', default=SYNTAX_DIR)
+    args = parser.parse_args(argv)
+
+    sizes = [int(s) for s in args.sizes.split(',') if s.strip()]
+    report = run(sizes, max(1, args.repeat), args.syntax_dir)
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+    print_report(report, baseline)
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
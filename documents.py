@@ -0,0 +1,132 @@
+"""Open documents kept outside the editor widget while their tab is inactive.
+
+A Tk Text widget per open file costs the file's text several times over
+plus the widget, its tags and its undo stack, so thirty open scripts would
+mean thirty of each. The editor instead has one Text widget that shows the
+active tab; every other tab is a `Document` holding its text as a plain
+string together with its cursor, scroll position and undo history.
+
+The undo history is the list of edits made since the document was opened
+(as reported by the EditBus), capped at `history_bytes`. Tk's undo stack
+cannot be read back, so when a document returns to the widget the text it
+had before those edits is worked out by undoing them on the string, put in
+the widget, and the edits are replayed with undo on. Ctrl+Z then steps
+back through them as before the switch.
+"""
+
+import os
+from tkinter import NORMAL, TclError
+
+from edit_hooks import apply_to_lines
+
+
+class Document:
+    """One open file: its text while inactive, plus what the editor restores.
+
+    `text` is None while the document is in the editor widget; the widget
+    holds its text then. `version` counts the edits recorded so far, so a
+    save can tell whether the text changed while it was being written.
+    """
+
+    history_bytes = 256 * 1024
+    # bookkeeping per recorded edit, on top of its text
+    change_overhead = 64
+
+    def __init__(self, path=None, encoding='utf-8'):
+        self.path = path
+        self.encoding = encoding
+        self.replaced = 0      # undecodable characters replaced when it was read
+        self.modified = False
+        self.text = ''
+        self.cursor = '1.0'
+        self.yview = 0.0
+        self.history = []      # lists of TextChanges, oldest first
+        self._history_size = 0
+        self.version = 0
+        self.syntax = None     # highlighter syntax name
+        self.syntax_mode = 'none'
+        self.journal = None    # EditJournal state while inactive
+        self.large_top = None  # top line when shown by the large file view
+
+    @property
+    def name(self):
+        return os.path.basename(self.path) if self.path else 'Untitled'
+
+    @property
+    def blank(self):
+        """An untitled, unmodified and empty document (a new tab can replace it)."""
+        return (self.path is None and not self.modified and self.large_top is None
+                and not self.history and not self.text)
+
+    def record(self, changes):
+        """Add the edits of one EditBus batch to the undo history."""
+        changes = list(changes)
+        self.version += len(changes)
+        self.history.append(changes)
+        self._history_size += self._cost(changes)
+        while self._history_size > self.history_bytes and self.history:
+            self._history_size -= self._cost(self.history.pop(0))
+
+    def reset_history(self):
+        """Forget the undo history (the widget's undo stack was reset)."""
+        self.history = []
+        self._history_size = 0
+
+    def _cost(self, changes):
+        return sum(len(c.removed) + len(c.inserted) + self.change_overhead for c in changes)
+
+    def stash(self, text):
+        """Take the document out of the widget `text` (the widget is left as is)."""
+        self.text = text.get('1.0', 'end-1c')
+        self.cursor = str(text.index('insert'))
+        try:
+            self.yview = text.yview()[0]
+        except Exception:
+            self.yview = 0.0
+
+    def restore(self, text):
+        """Put the document in the widget `text`, rebuilding its undo stack."""
+        content = self.text
+        text.config(state=NORMAL, undo=False)
+        text.delete('1.0', 'end')
+        text.insert('1.0', self._base_text())
+        text.config(undo=True)
+        text.edit_reset()
+        replayed = False
+        try:
+            for changes in self.history:
+                for c in changes:
+                    _replay(text, c)
+            replayed = text.get('1.0', 'end-1c') == content
+        except TclError:
+            pass
+        if not replayed:
+            # the history did not fit the text; keep the text, lose the undo
+            text.config(undo=False)
+            text.delete('1.0', 'end')
+            text.insert('1.0', content)
+            text.config(undo=True)
+            text.edit_reset()
+            self.reset_history()
+        text.edit_modified(False)
+        text.mark_set('insert', self.cursor)
+        text.yview_moveto(self.yview)
+        self.text = None
+
+    def _base_text(self):
+        """The text before the edits in the history."""
+        if not self.history:
+            return self.text
+        lines = self.text.split('\n')
+        for changes in reversed(self.history):
+            for c in reversed(changes):
+                apply_to_lines(lines, c.line, c.col, c.inserted, c.removed)
+        return '\n'.join(lines)
+
+
+def _replay(text, change):
+    index = f'{change.line}.{change.col}'
+    if change.removed:
+        text.delete(index, f'{index} + {len(change.removed)} chars')
+    if change.inserted:
+        text.insert(index, change.inserted)
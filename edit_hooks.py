@@ -0,0 +1,256 @@
+"""Observe insert/delete operations on a Tk Text widget.
+
+The widget's Tcl command is renamed and replaced by a small proxy, so every
+insert, delete and replace (typing, paste, undo/redo, programmatic edits)
+is reported to Python listeners right after Tk has applied it. This gives
+listeners the exact position and text of each change instead of only the
+coarse `<<Modified>>` flag.
+
+`edit_bus_for(text)` batches those notifications: subscribers are called once
+per event-loop turn, from an idle callback, with the range of lines the
+turn's edits touched. Work that only needs to know that something changed
+(title, line numbers, scheduling a highlight) goes there instead of onto
+`<KeyRelease>` and `<<Modified>>`, so one keystroke does it once.
+"""
+
+from collections import namedtuple
+
+from tkinter import TclError
+
+
+# line is 1-based and col 0-based, both in the coordinates the change
+# started at (the same before and after the edit). `removed` is the text that
+# was deleted and `inserted` the text that took its place.
+TextChange = namedtuple('TextChange', 'line col removed inserted')
+
+# The edits of one event-loop turn: lines first..last (after the edits) hold
+# everything they touched, `changes` are the TextChanges in order.
+EditBatch = namedtuple('EditBatch', 'first last changes')
+
+
+def add_edit_listener(text, callback):
+    """Call `callback(change)` after every insert/delete on `text`."""
+    listeners = _ensure_proxy(text)
+    if callback not in listeners:
+        listeners.append(callback)
+
+
+def remove_edit_listener(text, callback):
+    listeners = getattr(text, '_edit_listeners', None)
+    if listeners and callback in listeners:
+        listeners.remove(callback)
+
+
+def change_lines(change):
+    """Return (first, last) lines covered by `change` after it was applied."""
+    return change.line, change.line + change.inserted.count('\n')
+
+
+def apply_to_lines(lines, line, col, removed, inserted):
+    """Apply a change to `lines` (a text split on newlines) in place.
+
+    Swapping `removed` and `inserted` undoes it.
+    """
+    i = min(max(line, 1), len(lines)) - 1
+    k = removed.count('\n')
+    end = min(i + k, len(lines) - 1)
+    if k:
+        end_col = len(removed) - removed.rfind('\n') - 1
+    else:
+        end_col = col + len(removed)
+    head = lines[i][:col]
+    tail = lines[end][end_col:]
+    lines[i:end + 1] = (head + inserted + tail).split('\n')
+
+
+class EditBus:
+    """Collect the edits of a Text widget and publish them once per idle."""
+
+    def __init__(self, text):
+        self.text = text
+        self.serial = 0  # edits seen so far; equal serials mean the same text
+        self._subscribers = []
+        self._changes = []
+        self._range = None
+        self._after_id = None
+        add_edit_listener(text, self._on_change)
+
+    def subscribe(self, callback):
+        """Call `callback(batch)` with an `EditBatch` after each turn of edits."""
+        if callback not in self._subscribers:
+            self._subscribers.append(callback)
+
+    def unsubscribe(self, callback):
+        if callback in self._subscribers:
+            self._subscribers.remove(callback)
+
+    def _on_change(self, change):
+        self.serial += 1
+        self._changes.append(change)
+        self._range = _grow_range(self._range, change)
+        if self._after_id is None:
+            try:
+                self._after_id = self.text.after_idle(self.flush)
+            except Exception:
+                self.flush()
+
+    def flush(self):
+        """Publish the pending edits now (normally done from the idle callback)."""
+        if self._after_id is not None:
+            try:
+                self.text.after_cancel(self._after_id)
+            except Exception:
+                pass
+            self._after_id = None
+        if not self._changes:
+            return
+        batch = EditBatch(self._range[0], self._range[1], self._changes)
+        self._changes = []
+        self._range = None
+        for cb in list(self._subscribers):
+            try:
+                cb(batch)
+            except Exception:
+                pass
+
+
+def edit_bus_for(text):
+    """Return the `EditBus` shared by everything watching `text`."""
+    bus = getattr(text, '_edit_bus', None)
+    if bus is None:
+        bus = EditBus(text)
+        text._edit_bus = bus
+    return bus
+
+
+def _grow_range(span, change):
+    """Return `span` (first, last) moved past `change` and widened to cover it."""
+    first, last = change_lines(change)
+    if span is None:
+        return first, last
+    a, b = span
+    end = change.line + change.removed.count('\n')
+    delta = (last - first) - (end - change.line)
+    # lines after the removed text move; lines inside it collapse onto the change
+    a = a + delta if a > end else min(a, change.line)
+    b = b + delta if b > end else max(min(b, last), change.line)
+    return min(a, first), max(b, last)
+
+
+def _ensure_proxy(text):
+    listeners = getattr(text, '_edit_listeners', None)
+    if listeners is not None:
+        return listeners
+
+    listeners = []
+    orig = text._w + '_edit_orig'
+    text.tk.call('rename', text._w, orig)
+
+    def call(*args):
+        return text.tk.call((orig,) + args)
+
+    def proxy(*args):
+        changes = ()
+        if listeners and args and args[0] in ('insert', 'delete', 'replace'):
+            try:
+                changes = _describe(call, args)
+            except TclError:
+                changes = ()
+        result = call(*args)
+        for change in changes:
+            for cb in list(listeners):
+                try:
+                    cb(change)
+                except Exception:
+                    pass
+        return result
+
+    text.tk.createcommand(text._w, proxy)
+    # let tkinter delete the proxy command together with the widget
+    try:
+        if text._tclCommands is None:
+            text._tclCommands = []
+        text._tclCommands.append(text._w)
+    except Exception:
+        pass
+    text._edit_listeners = listeners
+    return listeners
+
+
+def _describe(call, args):
+    """Work out what an insert/delete/replace call is about to change.
+
+    Returns the TextChanges in the order Tk makes them.
+    """
+    op = args[0]
+    if op == 'insert':
+        if len(args) < 3:
+            return []
+        index = str(call('index', args[1]))
+        # Tk inserts text aimed at `end` before the final newline
+        if call('compare', index, '==', 'end'):
+            index = str(call('index', 'end-1c'))
+        inserted = ''.join(str(a) for a in args[2::2])
+        if not inserted:
+            return []
+        line, col = map(int, index.split('.'))
+        return [TextChange(line, col, '', inserted)]
+
+    if len(args) < 2:
+        return []
+    ranges = []
+    for i in range(1, 3 if op == 'replace' else len(args), 2):
+        start = str(call('index', args[i]))
+        if i + 1 < len(args):
+            end = str(call('index', args[i + 1]))
+        else:
+            end = str(call('index', start + '+1c'))
+        ranges.append((start, end))
+    if len(ranges) > 1:
+        # several ranges at once: Tk sorts them, merges the overlapping
+        # ones and deletes from the last to the first, so that every range
+        # is still where it was when the call was made
+        ranges = _merge_ranges(ranges)[::-1]
+    changes = []
+    for start, end in ranges:
+        start, removed = _removed(call, start, end)
+        inserted = ''
+        if op == 'replace':
+            inserted = ''.join(str(a) for a in args[3::2])
+        if removed or inserted:
+            line, col = map(int, start.split('.'))
+            changes.append(TextChange(line, col, removed, inserted))
+    return changes
+
+
+def _removed(call, start, end):
+    """Return (start, text) Tk deletes for the range start..end."""
+    if not call('compare', start, '<', end):
+        return start, ''
+    # Tk never deletes the final newline; a range running into it takes
+    # the newline before a line-start range instead (see tkText.c).
+    if call('compare', end, '==', 'end'):
+        end = str(call('index', 'end-1c'))
+        if start.endswith('.0') and start != '1.0':
+            start = str(call('index', start + '-1c'))
+    if not call('compare', start, '<', end):
+        return start, ''
+    return start, str(call('get', start, end))
+
+
+def _merge_ranges(ranges):
+    """Sort (start, end) index ranges and merge the ones that overlap."""
+    merged = []
+    for start, end in sorted((r for r in ranges if _index_key(r[0]) < _index_key(r[1])),
+                             key=lambda r: _index_key(r[0])):
+        if merged and _index_key(start) <= _index_key(merged[-1][1]):
+            if _index_key(end) > _index_key(merged[-1][1]):
+                merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def _index_key(index):
+    line, col = index.split('.')
+    return int(line), int(col)
@@ -0,0 +1,348 @@
+"""Crash-recovery journal of the edits made to a document.
+
+Instead of writing the whole buffer every few seconds, `EditJournal`
+appends each insert/delete (position, removed text, inserted text) to a
+small per-document log, so the cost of journaling follows the size of the
+edit and not of the file. Edits arrive in batches from the editor's
+`EditBus` and are written and fsynced by a worker thread.
+
+The log is replayed over a base text: the file on disk as it was opened
+or last saved, or a snapshot of the buffer. Once the log grows past
+`compact_bytes` the buffer is snapshotted and the log starts over, which
+bounds both the log size and the replay time.
+
+Every document has up to three files in JOURNAL_DIR, named after a hash
+of its path: `<key>.json` (path, encoding, what the base is and its
+generation), `<key>.<gen>.snap` (the snapshot, when the base is one) and
+`<key>.log` (a {"gen": n} header, then one JSON array [line, col,
+removed, inserted] per edit). Each new base gets the next generation, so
+a log whose header does not match the .json was cut off by a crash while
+the base was being replaced and is ignored: its edits are in the new base
+already. After a clean close the files are deleted, so whatever
+`pending_journals` finds at startup was left by a crash.
+"""
+
+import os
+import glob
+import json
+import time
+import queue
+import hashlib
+import threading
+
+from file_saver import write_atomic
+from edit_hooks import apply_to_lines
+
+
+JOURNAL_DIR = os.path.join(os.path.expanduser('~'), '.balrognpc', 'journal')
+
+
+class EditJournal:
+    """Journal the edits published by `bus` for one document at a time.
+
+    The documents of other tabs keep their journals on disk; `suspend` and
+    `resume` switch between them.
+    """
+
+    compact_bytes = 1 << 20
+
+    def __init__(self, bus, journal_dir=JOURNAL_DIR):
+        self.bus = bus
+        self.journal_dir = journal_dir
+        self.key = None
+        self.meta = None
+        self.logged = 0  # bytes in the log since the base
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._writer, name='edit-journal', daemon=True)
+        self._thread.start()
+        bus.subscribe(self._on_edits)
+
+    @property
+    def active(self):
+        return self.key is not None
+
+    def start(self, path, encoding='utf-8', content=None):
+        """Journal a new document.
+
+        The base is the file `path` as it is on disk now, or `content` when
+        given (an unsaved or recovered buffer), which is snapshotted.
+        """
+        # edits still queued on the bus belong to whatever came before
+        self.bus.flush()
+        self.stop(discard=True)
+        ident = os.path.abspath(path) if path else f'untitled-{os.getpid()}-{time.time()}'
+        self.key = hashlib.sha1(ident.encode('utf-8')).hexdigest()[:16]
+        meta = {'path': path, 'encoding': encoding, 'base': 'file', 'gen': 1,
+                'pid': os.getpid()}
+        if content is None and path:
+            try:
+                st = os.stat(path)
+                meta['size'], meta['mtime'] = st.st_size, st.st_mtime
+            except OSError:
+                content = ''
+        self.meta = meta
+        self.logged = 0
+        if content == '':
+            meta['base'] = 'empty'
+            self._queue.put(('meta', self.key, dict(meta)))
+        elif content is not None:
+            meta['base'] = 'snapshot'
+            self._queue.put(('snapshot', self.key, dict(meta), content))
+        else:
+            self._queue.put(('meta', self.key, dict(meta)))
+
+    def suspend(self):
+        """Stop journaling the current document but keep its journal.
+
+        Returns a state to `resume` it with once the document is back in
+        the editor (None when nothing was journaled).
+        """
+        self.bus.flush()
+        state = (self.key, self.meta, self.logged) if self.key is not None else None
+        self.key = None
+        self.meta = None
+        self.logged = 0
+        return state
+
+    def resume(self, state):
+        """Journal again the document `suspend` returned `state` for."""
+        self.stop(discard=True)
+        if state is not None:
+            self.key, self.meta, self.logged = state
+
+    def stop(self, discard=True):
+        """Stop journaling; `discard` deletes the journal (clean close)."""
+        if self.key is None:
+            return
+        if discard:
+            self._queue.put(('discard', self.key))
+        self.key = None
+        self.meta = None
+
+    def close(self):
+        """Discard the journal and let the writer finish (application exit)."""
+        self.stop(discard=True)
+        self._queue.put(None)
+        self._thread.join(2.0)
+
+    def _on_edits(self, batch):
+        if self.key is None:
+            return
+        lines = ''.join(json.dumps([c.line, c.col, c.removed, c.inserted], ensure_ascii=False) + '\n'
+                        for c in batch.changes)
+        self.logged += len(lines)
+        self._queue.put(('append', self.key, lines))
+        if self.logged > self.compact_bytes:
+            self.compact()
+
+    def compact(self):
+        """Snapshot the buffer and start an empty log over it."""
+        if self.key is None:
+            return
+        self.meta['base'] = 'snapshot'
+        self.meta['gen'] += 1
+        self.logged = 0
+        self._queue.put(('snapshot', self.key, dict(self.meta), self.bus.text.get('1.0', 'end-1c')))
+
+    def _path(self, key, ext):
+        return os.path.join(self.journal_dir, key + ext)
+
+    # -- writer thread ------------------------------------------------------------
+
+    def _writer(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            # write everything queued so far with one sync per log
+            items = [item]
+            while True:
+                try:
+                    nxt = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                items.append(nxt)
+                if nxt is None:
+                    break
+            try:
+                self._write(items)
+            except Exception as e:
+                print(f"[WARNING] edit journal: {e}")
+            if items[-1] is None:
+                return
+
+    def _write(self, items):
+        os.makedirs(self.journal_dir, exist_ok=True)
+        appends = {}
+        for item in items:
+            if item is None:
+                break
+            kind, key = item[0], item[1]
+            if kind == 'append':
+                appends.setdefault(key, []).append(item[2])
+                continue
+            # anything else orders after the appends before it
+            self._flush_appends(appends)
+            if kind == 'meta':
+                self._reset(key, item[2])
+            elif kind == 'snapshot':
+                meta = item[2]
+                write_atomic(_snap_path(self.journal_dir, key, meta['gen']), item[3].encode('utf-8'))
+                self._reset(key, meta)
+            elif kind == 'discard':
+                _remove(self.journal_dir, key)
+        self._flush_appends(appends)
+
+    def _reset(self, key, meta):
+        # the .json names the new base first; until the log is replaced its
+        # old header marks it stale
+        write_atomic(self._path(key, '.json'), json.dumps(meta).encode('utf-8'))
+        write_atomic(self._path(key, '.log'), (json.dumps({'gen': meta['gen']}) + '\n').encode('utf-8'))
+        keep = _snap_path(self.journal_dir, key, meta['gen']) if meta['base'] == 'snapshot' else None
+        for snap in glob.glob(_snap_path(self.journal_dir, key, '*')):
+            if snap != keep:
+                try:
+                    os.unlink(snap)
+                except OSError:
+                    pass
+
+    def _flush_appends(self, appends):
+        for key, chunks in appends.items():
+            with open(self._path(key, '.log'), 'ab') as f:
+                f.write(''.join(chunks).encode('utf-8'))
+                f.flush()
+                os.fsync(f.fileno())
+        appends.clear()
+
+
+def _snap_path(journal_dir, key, gen):
+    return os.path.join(journal_dir, f'{key}.{gen}.snap')
+
+
+def _remove(journal_dir, key):
+    paths = [os.path.join(journal_dir, key + ext) for ext in ('.json', '.log')]
+    for path in paths + glob.glob(_snap_path(journal_dir, key, '*')):
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+
+
+def pending_journals(journal_dir=JOURNAL_DIR):
+    """Return the metadata of journals left behind that hold unsaved edits."""
+    found = []
+    try:
+        names = os.listdir(journal_dir)
+    except OSError:
+        return found
+    for name in names:
+        if not name.endswith('.json'):
+            continue
+        key = name[:-5]
+        try:
+            with open(os.path.join(journal_dir, name), encoding='utf-8') as f:
+                meta = json.load(f)
+        except Exception:
+            continue
+        if _alive(meta.get('pid')):
+            # another running editor is journaling this one
+            continue
+        meta['key'] = key
+        if meta.get('base') == 'snapshot' or _records(meta, journal_dir):
+            found.append(meta)
+    return found
+
+
+def _records(meta, journal_dir):
+    """Return the edits logged over the current base of `meta`."""
+    records = []
+    try:
+        with open(os.path.join(journal_dir, meta['key'] + '.log'), encoding='utf-8') as f:
+            header = json.loads(f.readline() or '{}')
+            if header.get('gen') != meta.get('gen'):
+                return records
+            for record in f:
+                try:
+                    records.append(json.loads(record))
+                except ValueError:
+                    # a record cut short by the crash ends the log
+                    break
+    except (OSError, ValueError):
+        pass
+    return records
+
+
+# OpenProcess access right and GetExitCodeProcess results (see _alive_windows)
+_PROCESS_QUERY_LIMITED_INFORMATION = 0x1000
+_ERROR_ACCESS_DENIED = 5
+_STILL_ACTIVE = 259
+
+
+def _alive(pid):
+    """True if process `pid` (another editor, say) is still running."""
+    # 0 and negative pids name process groups
+    if not isinstance(pid, int) or pid <= 0 or pid == os.getpid():
+        return False
+    if os.name == 'nt':
+        return _alive_windows(pid)
+    if os.name != 'posix':
+        return False
+    try:
+        os.kill(pid, 0)
+    except PermissionError:
+        # it exists, but belongs to another user
+        return True
+    except OSError:
+        return False
+    return True
+
+
+def _alive_windows(pid):
+    import ctypes
+    from ctypes import wintypes
+    kernel32 = ctypes.WinDLL('kernel32', use_last_error=True)
+    kernel32.OpenProcess.restype = wintypes.HANDLE
+    kernel32.OpenProcess.argtypes = (wintypes.DWORD, wintypes.BOOL, wintypes.DWORD)
+    kernel32.GetExitCodeProcess.argtypes = (wintypes.HANDLE, ctypes.POINTER(wintypes.DWORD))
+    kernel32.CloseHandle.argtypes = (wintypes.HANDLE,)
+    handle = kernel32.OpenProcess(_PROCESS_QUERY_LIMITED_INFORMATION, False, pid)
+    if not handle:
+        # no such process, unless we may merely not look at it
+        return ctypes.get_last_error() == _ERROR_ACCESS_DENIED
+    try:
+        code = wintypes.DWORD()
+        if not kernel32.GetExitCodeProcess(handle, ctypes.byref(code)):
+            return True
+        return code.value == _STILL_ACTIVE
+    finally:
+        kernel32.CloseHandle(handle)
+
+
+
+def recover_journal(meta, journal_dir=JOURNAL_DIR):
+    """Rebuild the text of a journaled document from its base and log.
+
+    Raises ValueError when the base file changed since it was journaled
+    (the edits would land in the wrong places).
+    """
+    if meta.get('base') == 'empty':
+        content = ''
+    elif meta.get('base') == 'snapshot':
+        with open(_snap_path(journal_dir, meta['key'], meta['gen']), encoding='utf-8') as f:
+            content = f.read()
+    else:
+        path = meta['path']
+        st = os.stat(path)
+        if st.st_size != meta.get('size') or st.st_mtime != meta.get('mtime'):
+            raise ValueError(f"{path} changed after the journal was started")
+        with open(path, encoding=meta.get('encoding') or 'utf-8', errors='replace') as f:
+            content = f.read()
+    lines = content.split('\n')
+    for line, col, removed, inserted in _records(meta, journal_dir):
+        apply_to_lines(lines, line, col, removed, inserted)
+    return '\n'.join(lines)
+
+
+def discard_journal(meta, journal_dir=JOURNAL_DIR):
+    """Delete a journal found by `pending_journals`."""
+    _remove(journal_dir, meta['key'])
@@ -0,0 +1,164 @@
+"""Read a file into a Tk Text widget in chunks without blocking the UI.
+
+A worker thread reads and decodes the file a chunk at a time and hands the
+pieces over a bounded queue; the UI side inserts them from `after`
+callbacks, a few per tick, so the window keeps repainting and a Cancel
+button or key still works while a large file comes in. The widget is
+read-only for the user and records no undo while loading (the undo stack
+would just hold a copy of the file). Unless an encoding is given, it is
+picked from the bytes while decoding (see text_encoding).
+"""
+
+import io
+import os
+import time
+import queue
+import threading
+from tkinter import NORMAL, DISABLED
+
+from text_encoding import SniffingDecoder
+
+
+class ChunkedLoader:
+    """Load `path` into `text`, reporting progress and allowing cancel.
+
+    `on_progress(done, total)` gets bytes read so far and the file size;
+    `on_done(loader, error)` is called once, with error None on success,
+    the exception when reading failed, and `loader.cancelled` set when the
+    load was cancelled. The text widget is cleared first. Afterwards
+    `encoding` is the encoding the file was decoded with and `replaced`
+    the number of characters that could not be decoded.
+    """
+
+    chunk_bytes = 256 * 1024
+    queue_chunks = 8       # chunks read ahead of the UI at most
+    poll_ms = 10
+    slice_ms = 30          # time spent inserting per tick
+
+    def __init__(self, text, path, encoding=None, on_progress=None, on_done=None):
+        self.text = text
+        self.path = path
+        self.encoding = encoding
+        self.on_progress = on_progress
+        self.on_done = on_done
+        try:
+            self.total = os.path.getsize(path)
+        except OSError:
+            self.total = 0
+        self.done = 0
+        self.replaced = 0
+        self.cancelled = False
+        self.finished = False
+        self._queue = queue.Queue(self.queue_chunks)
+        self._stop = threading.Event()
+        self._thread = None
+        self._after_id = None
+        self._undo = None
+        self._state = None
+
+    def start(self):
+        text = self.text
+        self._undo = text.cget('undo')
+        self._state = text.cget('state')
+        text.config(undo=False, state=NORMAL)
+        text.delete('1.0', 'end')
+        text.config(state=DISABLED)
+        self._thread = threading.Thread(target=self._read, name='file-loader', daemon=True)
+        self._thread.start()
+        self._after_id = text.after(self.poll_ms, self._poll)
+        return self
+
+    def cancel(self):
+        """Stop loading; what was inserted so far is removed."""
+        if self.finished:
+            return
+        self.cancelled = True
+        self._stop.set()
+        try:
+            self.text.config(state=NORMAL)
+            self.text.delete('1.0', 'end')
+        except Exception:
+            pass
+        self._finish(None)
+
+    def _read(self):
+        sniffer = SniffingDecoder(self.encoding)
+        # newlines are translated the way text mode open() does
+        decoder = io.IncrementalNewlineDecoder(sniffer, translate=True)
+        try:
+            with open(self.path, 'rb') as f:
+                pos = 0
+                while not self._stop.is_set():
+                    data = f.read(self.chunk_bytes)
+                    pos += len(data)
+                    chunk = decoder.decode(data, final=not data)
+                    if chunk:
+                        self._put(('chunk', chunk, pos))
+                    if not data:
+                        break
+            self.encoding = sniffer.encoding or 'utf-8'
+            self.replaced = sniffer.replaced
+            self._put(('done', None, None))
+        except Exception as e:
+            self._put(('error', e, None))
+
+    def _put(self, item):
+        # the queue is bounded; keep checking for cancel while it is full
+        while not self._stop.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+
+    def _poll(self):
+        self._after_id = None
+        if self.finished:
+            return
+        text = self.text
+        deadline = time.perf_counter() + self.slice_ms / 1000.0
+        inserted = False
+        text.config(state=NORMAL)
+        try:
+            while time.perf_counter() < deadline:
+                try:
+                    kind, value, pos = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if kind == 'chunk':
+                    text.insert('end-1c', value)
+                    self.done = min(pos, self.total) if self.total else pos
+                    inserted = True
+                elif kind == 'done':
+                    self.done = self.total
+                    self._finish(None)
+                    return
+                else:
+                    self._finish(value)
+                    return
+        finally:
+            if not self.finished:
+                text.config(state=DISABLED)
+        if inserted and self.on_progress:
+            try:
+                self.on_progress(self.done, self.total)
+            except Exception:
+                pass
+        self._after_id = text.after(self.poll_ms, self._poll)
+
+    def _finish(self, error):
+        self.finished = True
+        self._stop.set()
+        if self._after_id is not None:
+            try:
+                self.text.after_cancel(self._after_id)
+            except Exception:
+                pass
+            self._after_id = None
+        try:
+            self.text.config(state=self._state or NORMAL, undo=self._undo)
+            self.text.edit_reset()
+        except Exception:
+            pass
+        if self.on_done:
+            self.on_done(self, error)
@@ -0,0 +1,161 @@
+"""Save files atomically on a worker thread.
+
+`write_atomic` writes to a temporary file next to the target, fsyncs it
+and renames it over the target, so a crash or a full disk mid-write
+leaves the old file intact instead of a truncated server script.
+
+`BackgroundSaver` runs those writes off the UI thread and reports back
+through `after`. While a save is running, further requests for the same
+file collapse into one: the buffer is snapshotted again when the running
+save ends and written once, however many times Ctrl+S was pressed
+meanwhile. Requests for other files wait their turn.
+"""
+
+import os
+import queue
+import tempfile
+import threading
+
+
+def write_atomic(path, data):
+    """Replace the file `path` with the bytes `data` in one rename.
+
+    A symlink is followed: the file it points to is replaced, not the link.
+    """
+    path = os.path.realpath(path)
+    folder = os.path.dirname(path)
+    fd, tmp = tempfile.mkstemp(dir=folder, prefix='.' + os.path.basename(path) + '.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        try:
+            # keep the permissions of the file being replaced; a new file
+            # gets what open() would give it (mkstemp makes it 0600)
+            try:
+                mode = os.stat(path).st_mode & 0o7777
+            except FileNotFoundError:
+                mode = 0o666 & ~_UMASK
+            os.chmod(tmp, mode)
+        except OSError:
+            pass
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+    # make the rename itself durable where directories can be synced
+    if hasattr(os, 'O_DIRECTORY'):
+        try:
+            dfd = os.open(folder, os.O_RDONLY | os.O_DIRECTORY)
+            try:
+                os.fsync(dfd)
+            finally:
+                os.close(dfd)
+        except OSError:
+            pass
+
+
+def _read_umask():
+    # there is no way to read the umask without setting it, so this is done
+    # once at import, before any saver or journal thread creates files
+    mask = os.umask(0o022)
+    os.umask(mask)
+    return mask
+
+
+_UMASK = _read_umask()
+
+
+class BackgroundSaver:
+    """Write snapshots of a buffer with `write_atomic` on a worker thread.
+
+    `save(path, snapshot, encoding, on_done)` calls `snapshot()` for
+    (text, tag) when the write starts, encodes the text and writes it.
+    `on_done(path, tag, error)` is then called on the UI thread, with error
+    None on success (a UnicodeEncodeError when the text does not fit
+    `encoding`). `widget` is any Tk widget, used for `after`.
+    """
+
+    poll_ms = 20
+
+    def __init__(self, widget):
+        self.widget = widget
+        self._thread = None
+        self._job = None
+        self._pending = {}  # path -> job waiting for the running save
+        self._results = queue.Queue()
+        self._after_id = None
+
+    @property
+    def busy(self):
+        return self._job is not None
+
+    def save(self, path, snapshot, encoding, on_done, wait=False):
+        """Save now, or once the running save ends; with `wait`, synchronously."""
+        job = (path, snapshot, encoding, on_done)
+        if wait:
+            self._pending.pop(path, None)
+            self.wait()
+            self._run(job, threaded=False)
+            return
+        if self.busy:
+            # a newer request replaces one queued for the same file; it
+            # snapshots later
+            self._pending.pop(path, None)
+            self._pending[path] = job
+            return
+        self._run(job, threaded=True)
+
+    def wait(self):
+        """Finish the running save (and any queued ones) before returning."""
+        if self._after_id is not None:
+            self.widget.after_cancel(self._after_id)
+            self._after_id = None
+        while self._job is not None:
+            self._thread.join()
+            self._poll(reschedule=False)
+
+    def _run(self, job, threaded):
+        path, snapshot, encoding, on_done = job
+        text, tag = snapshot()
+        self._job = (path, tag, on_done)
+        if threaded:
+            self._thread = threading.Thread(target=self._write, args=(path, text, encoding),
+                                            name='file-saver', daemon=True)
+            self._thread.start()
+            self._after_id = self.widget.after(self.poll_ms, self._poll)
+        else:
+            self._write(path, text, encoding)
+            self._poll(reschedule=False)
+
+    def _write(self, path, text, encoding):
+        try:
+            write_atomic(path, text.encode(encoding))
+            self._results.put(None)
+        except Exception as e:
+            self._results.put(e)
+
+    def _poll(self, reschedule=True):
+        self._after_id = None
+        if self._job is None:
+            return
+        try:
+            error = self._results.get_nowait()
+        except queue.Empty:
+            if reschedule:
+                self._after_id = self.widget.after(self.poll_ms, self._poll)
+            return
+        path, tag, on_done = self._job
+        self._job = None
+        self._thread = None
+        try:
+            on_done(path, tag, error)
+        except Exception as e:
+            print(f"[WARNING] save callback failed: {e}")
+        if self._pending:
+            job = self._pending.pop(next(iter(self._pending)))
+            self._run(job, threaded=reschedule)
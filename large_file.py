@@ -0,0 +1,315 @@
+"""Read-only viewer for files too large to load into a Tk Text widget.
+
+A Text widget holding a few hundred megabytes of logs or an exported
+item_db costs several times the file size in memory. `LargeFileView`
+memory-maps the file instead and keeps only a window of a few thousand
+lines in the widget, moving the window as the view nears one of its ends.
+
+`LineOffsets` finds the line starts on a background thread, keeping the
+byte offset of every `step`-th line only; any other line is reached by
+scanning forward at most `step - 1` newlines from the mark before it.
+Go To Line and Find work on the mapped bytes, so they do not depend on
+what is in the widget.
+"""
+
+import re
+import mmap
+import threading
+from array import array
+from bisect import bisect_right
+from itertools import islice
+from tkinter import NORMAL, DISABLED
+
+from text_encoding import sniff_buffer
+from text_search import find_backwards
+
+
+_NEWLINE = re.compile(b'\n')
+
+
+class LineOffsets:
+    """Byte offsets of every `step`-th line start of `data` (bytes or mmap)."""
+
+    step = 64
+    slice_bytes = 8 << 20
+
+    def __init__(self, data, step=None):
+        if step is not None:
+            self.step = step
+        self.data = data
+        self.size = len(data)
+        self.marks = array('q', [0])  # marks[k]: offset of line k * step + 1
+        self.newlines = 0             # newlines in data[:scanned]
+        self.scanned = 0
+        self.complete = self.size == 0
+
+    def build(self, stop=None):
+        """Scan the whole buffer (call from a worker thread)."""
+        data = self.data
+        step = self.step
+        pos = self.scanned
+        while pos < self.size:
+            if stop is not None and stop.is_set():
+                return
+            end = min(self.size, pos + self.slice_bytes)
+            # the next mark is the start of the line after newline number len * step
+            need = len(self.marks) * step - self.newlines
+            for m in islice(_NEWLINE.finditer(data, pos, end), need - 1, None, step):
+                self.marks.append(m.end())
+            self.newlines += data[pos:end].count(b'\n')
+            self.scanned = pos = end
+        self.complete = True
+
+    @property
+    def lines(self):
+        """Lines known so far (all of them once `complete`)."""
+        return self.newlines + 1 if self.complete else max(1, self.newlines)
+
+    def estimated_lines(self):
+        """Total line count, extrapolated from the part scanned so far."""
+        if self.complete or not self.scanned:
+            return self.lines
+        return max(self.lines, int(self.newlines * self.size / self.scanned))
+
+    def offset(self, line):
+        """Byte offset of the start of 1-based `line` (clamped to the known lines)."""
+        line = max(1, min(line, self.lines))
+        k = min((line - 1) // self.step, len(self.marks) - 1)
+        off = self.marks[k]
+        for _ in range(line - 1 - k * self.step):
+            nl = self.data.find(b'\n', off)
+            if nl < 0:
+                return self.size
+            off = nl + 1
+        return off
+
+    def line_of(self, offset):
+        """1-based line holding byte `offset`."""
+        k = bisect_right(self.marks, offset) - 1
+        return k * self.step + 1 + self.data[self.marks[k]:offset].count(b'\n')
+
+
+class LargeFileView:
+    """Show a memory-mapped file in `text` through a sliding window of lines.
+
+    The widget is read-only while the view is open. `gutter` (a
+    `LineGutter`) is told which file line the window starts at so it
+    numbers lines as in the file. `on_status(text)` receives indexing
+    progress. Without `encoding` it is guessed from a sample of the file.
+    """
+
+    window_lines = 4000
+    margin_lines = 500  # move the window when the view gets this close to an edge
+    poll_ms = 200
+    # how far past the cursor a backward search reads (see text_search)
+    search_overlap = 4096
+
+    def __init__(self, text, path, encoding=None, gutter=None, on_status=None):
+        self.text = text
+        self.path = path
+        self.encoding = encoding
+        self.gutter = gutter
+        self.on_status = on_status
+        self._file = open(path, 'rb')
+        try:
+            self.data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except Exception:
+            self._file.close()
+            raise
+        self.index = LineOffsets(self.data)
+        if encoding is None:
+            # offsets are counted from the start of the file, BOM included
+            self.encoding = sniff_buffer(self.data).replace('utf-8-sig', 'utf-8')
+        # window swaps are not edits: keep them off the undo stack
+        self._undo = text.cget('undo')
+        text.config(undo=False)
+        self.first = 1   # file line shown on widget line 1
+        self.count = 0   # lines in the window
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self.index.build, args=(self._stop,),
+                                        name='line-index', daemon=True)
+        self._thread.start()
+        self._after_id = text.after(self.poll_ms, self._poll)
+        self._recenter_id = None
+        self.show(1)
+
+    def close(self):
+        self._stop.set()
+        for attr in ('_after_id', '_recenter_id'):
+            after_id = getattr(self, attr)
+            if after_id is not None:
+                try:
+                    self.text.after_cancel(after_id)
+                except Exception:
+                    pass
+                setattr(self, attr, None)
+        self._thread.join(1.0)
+        try:
+            self.text.config(state=NORMAL, undo=self._undo)
+            self.text.delete('1.0', 'end')
+            self.text.edit_reset()
+        except Exception:
+            pass
+        if self.gutter is not None:
+            self.gutter.line_base = 0
+        try:
+            self.data.close()
+        except Exception:
+            pass
+        self._file.close()
+
+    def _poll(self):
+        self._after_id = None
+        index = self.index
+        if index.complete:
+            self._status(f"{index.lines:,} lines (read-only)")
+            if self.count < self.window_lines:
+                # the first window may have been cut short by the scan
+                self._load_window(self.first)
+            return
+        pct = index.scanned * 100 // max(1, index.size)
+        self._status(f"Indexing lines: {pct}% ({index.newlines:,} so far)")
+        self._after_id = self.text.after(self.poll_ms, self._poll)
+
+    def _status(self, message):
+        if self.on_status:
+            try:
+                self.on_status(message)
+            except Exception:
+                pass
+
+    def _decode(self, raw):
+        return raw.decode(self.encoding, 'replace').replace('\r\n', '\n')
+
+    # -- window ---------------------------------------------------------------
+
+    def show(self, line):
+        """Fill the window with the lines around file `line`."""
+        self._load_window(line - self.window_lines // 2)
+
+    def _load_window(self, first):
+        """Put lines first.. in the widget, keeping the file line at the top in view."""
+        index = self.index
+        known = index.lines
+        last = min(known, max(1, first) + self.window_lines - 1)
+        first = max(1, min(first, last - self.window_lines + 1))
+        start = index.offset(first)
+        nl = self.data.find(b'\n', index.offset(last))
+        end = index.size if nl < 0 else nl + 1
+        content = self._decode(self.data[start:end])
+        if content.endswith('\n') and (last < known or not index.complete):
+            # the newline ending the window's last line (not the file's)
+            content = content[:-1]
+        text = self.text
+        top = self.top_line() if self.count else first
+        text.config(state=NORMAL)
+        try:
+            text.delete('1.0', 'end')
+            text.insert('1.0', content)
+            text.edit_modified(False)
+        finally:
+            text.config(state=DISABLED)
+        self.first = first
+        self.count = last - first + 1
+        if self.gutter is not None:
+            self.gutter.line_base = first - 1
+            self.gutter.schedule()
+        if self._in_window(top):
+            self._scroll_to(top)
+
+    def top_line(self):
+        """File line at the top of the widget."""
+        try:
+            return self.first + int(str(self.text.index('@0,0')).split('.')[0]) - 1
+        except Exception:
+            return self.first
+
+    def _scroll_to(self, line):
+        self.text.yview_moveto((line - self.first) / max(1, self.count))
+
+    def _in_window(self, line):
+        return self.first <= line < self.first + self.count
+
+    def goto(self, line, col=0):
+        """Put the cursor on file `line` (widget index of it is returned)."""
+        line = max(1, min(line, self.index.lines))
+        if not self._in_window(line):
+            self.show(line)
+        index = f"{line - self.first + 1}.{col}"
+        self.text.mark_set('insert', index)
+        self.text.see(index)
+        return index
+
+    def on_scroll(self, first, last):
+        """Handle the widget's yscrollcommand; return scrollbar fractions for the file."""
+        top = self.top_line()
+        try:
+            bottom = self.first + int(str(self.text.index(f'@0,{self.text.winfo_height()}')).split('.')[0]) - 1
+        except Exception:
+            bottom = top
+        near_top = self.first > 1 and top - self.first < self.margin_lines
+        near_end = (self.first + self.count - 1 < self.index.lines
+                    and self.first + self.count - 1 - bottom < self.margin_lines)
+        if (near_top or near_end) and self._recenter_id is None:
+            self._recenter_id = self.text.after_idle(self._recenter)
+        total = max(1, self.index.estimated_lines())
+        return (top - 1) / total, min(1.0, bottom / total)
+
+    def _recenter(self):
+        self._recenter_id = None
+        line, col = map(int, str(self.text.index('insert')).split('.'))
+        line += self.first - 1
+        self.show(self.top_line())
+        if self._in_window(line):
+            self.text.mark_set('insert', f"{line - self.first + 1}.{col}")
+
+    def yview(self, *args):
+        """Scrollbar command: move over the whole file, not just the window."""
+        if args and args[0] == 'moveto':
+            total = max(1, self.index.estimated_lines())
+            line = max(1, min(self.index.lines, int(float(args[1]) * total) + 1))
+            if not self._in_window(line) or not self._in_window(line + self.margin_lines):
+                self.show(line)
+            self._scroll_to(line)
+        else:
+            self.text.yview(*args)
+
+    # -- search -----------------------------------------------------------------
+
+    def offset_at(self, index):
+        """Byte offset in the file of widget `index`."""
+        line, col = map(int, str(self.text.index(index)).split('.'))
+        prefix = self.text.get(f'{line}.0', f'{line}.{col}')
+        return self.index.offset(self.first + line - 1) + len(prefix.encode(self.encoding, 'replace'))
+
+    def find(self, regex, start, backwards=False, chunk=4 << 20):
+        """Return (start, end) byte offsets of the next match of bytes `regex`.
+
+        Backwards, the last match starting before `start`, found by scans
+        starting `chunk` bytes back and twice as far each time.
+        """
+        data = self.data
+        limit = self._indexed_end()
+        if not backwards:
+            m = regex.search(data, start, limit)
+            return (m.start(), m.end()) if m else None
+        return find_backwards(regex, data, start, chunk, self.search_overlap, limit)
+
+    def _indexed_end(self):
+        """End of the lines the index knows about (matches past it have no line yet)."""
+        index = self.index
+        if index.complete:
+            return index.size
+        nl = self.data.find(b'\n', index.offset(index.lines))
+        return index.size if nl < 0 else nl + 1
+
+    def select(self, start, end):
+        """Select file bytes start..end in the widget and show them."""
+        line = self.index.line_of(start)
+        line_start = self.index.offset(line)
+        col = len(self._decode(self.data[line_start:start]))
+        index = self.goto(line, col)
+        length = len(self._decode(self.data[start:end]))
+        self.text.tag_remove('sel', '1.0', 'end')
+        self.text.tag_add('sel', index, f"{index} + {length}c")
+        return f"{line}.{col}"
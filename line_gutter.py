@@ -0,0 +1,145 @@
+"""Line-number gutter for a Tk Text widget that draws only the visible lines.
+
+The old gutter was a second Text widget holding every number from 1 to the
+last line, rebuilt on each key press and scrolled in step with the editor,
+which costs O(file lines) per keystroke. `LineGutter` is a Canvas that asks
+the text widget (`dlineinfo`) where each visible line sits and draws just
+those numbers. It redraws only when what it would draw changes: the first
+visible line or its offset, the line count, the font or the widget height.
+"""
+
+from tkinter import Canvas, TclError
+from tkinter import font as tkfont
+
+from edit_hooks import edit_bus_for
+
+
+class LineGutter(Canvas):
+    """Canvas showing the line numbers of the visible part of `text`.
+
+    Call `schedule()` (or `redraw()`) from the text widget's yscrollcommand;
+    edits, resizes and clicks are hooked up by the gutter itself. Clicking a
+    number moves the insert cursor to that line.
+    """
+
+    min_digits = 3
+    # added to every number: a view showing the file from line N + 1 sets it to N
+    line_base = 0
+
+    def __init__(self, master, text, padx=4, bg='#f0f0f0', fg='#666666', **kw):
+        kw.setdefault('highlightthickness', 0)
+        kw.setdefault('bd', 0)
+        kw.setdefault('takefocus', 0)
+        super().__init__(master, bg=bg, **kw)
+        self.text = text
+        self.padx = padx
+        self.fg = fg
+        self._key = None      # what the current drawing was made from
+        self._sized = None    # (font, digits) the width was set for
+        self._after_id = None
+        self._fonts = {}
+        self.bind('<Button-1>', self._on_click)
+        text.bind('<Configure>', lambda e: self.schedule(), add='+')
+        try:
+            edit_bus_for(text).subscribe(self._on_edits)
+        except Exception:
+            pass
+        self._set_width(self._font(), self.min_digits)
+
+    def destroy(self):
+        try:
+            edit_bus_for(self.text).unsubscribe(self._on_edits)
+        except Exception:
+            pass
+        if self._after_id is not None:
+            try:
+                self.after_cancel(self._after_id)
+            except Exception:
+                pass
+            self._after_id = None
+        super().destroy()
+
+    def schedule(self):
+        """Redraw once the current event has been handled."""
+        if self._after_id is None:
+            try:
+                self._after_id = self.after_idle(self._run)
+            except Exception:
+                self._after_id = None
+
+    def _run(self):
+        self._after_id = None
+        self.redraw()
+
+    def _on_edits(self, batch):
+        # without wrapping, only a change in the line count moves the numbers
+        if self._wraps() or any('\n' in c.removed or '\n' in c.inserted
+                                for c in batch.changes):
+            self.redraw()
+
+    def _wraps(self):
+        try:
+            return str(self.text.cget('wrap')) != 'none'
+        except Exception:
+            return False
+
+    def _font(self):
+        try:
+            return str(self.text.cget('font'))
+        except Exception:
+            return 'TkFixedFont'
+
+    def _set_width(self, font, digits):
+        width = self._fonts.get(font)
+        if width is None:
+            try:
+                width = tkfont.Font(root=self, font=font).measure('9')
+            except Exception:
+                width = 8
+            self._fonts[font] = width
+        self.configure(width=width * digits + 2 * self.padx)
+        self._sized = (font, digits)
+
+    def visible_lines(self):
+        """Return ([(line, y)] of the lines shown in the text widget, line count)."""
+        text = self.text
+        line = int(str(text.index('@0,0')).split('.')[0])
+        last = int(str(text.index('end-1c')).split('.')[0])
+        rows = []
+        while line <= last:
+            info = text.dlineinfo(f'{line}.0')
+            if info is None:
+                break
+            rows.append((line, info[1]))
+            line += 1
+        return rows, last
+
+    def redraw(self):
+        """Draw the numbers of the visible lines if they changed."""
+        try:
+            rows, last = self.visible_lines()
+        except TclError:
+            return
+        font = self._font()
+        base = self.line_base
+        key = (tuple(rows), last, base, font, self.winfo_height())
+        if key == self._key:
+            return
+        self._key = key
+        digits = max(self.min_digits, len(str(last + base)))
+        if (font, digits) != self._sized:
+            self._set_width(font, digits)
+        self.delete('all')
+        x = int(self.cget('width')) - self.padx
+        for line, y in rows:
+            self.create_text(x, y, anchor='ne', text=str(line + base), font=font, fill=self.fg)
+
+    def _on_click(self, event):
+        try:
+            index = self.text.index(f'@0,{event.y}')
+            line = int(str(index).split('.')[0])
+            self.text.mark_set('insert', f'{line}.0')
+            self.text.see(f'{line}.0')
+            self.text.focus()
+        except Exception:
+            pass
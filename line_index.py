@@ -0,0 +1,138 @@
+"""Map character offsets in a Tk Text buffer to `line.col` indices.
+
+Tk resolves an index like `1.0 + 12345c` by walking the buffer from the top,
+so converting many match offsets that way costs O(matches * file size).
+`LineIndex` keeps the length of every line and a prefix table of line start
+offsets, so an offset is turned into `line.col` with one bisect. The table is
+kept in step with the widget through `edit_hooks`: an edit only rewrites the
+lengths of the lines it touched, and the prefix is rebuilt lazily from the
+first changed line on the next lookup.
+
+Use `line_index_for(text)` to get the index shared by everything that tags a
+given widget.
+"""
+
+from bisect import bisect_right
+from itertools import accumulate
+
+from edit_hooks import add_edit_listener
+
+
+class LineIndex:
+    """Line start offsets for a block of text.
+
+    Lines are numbered from `first_line` (1 for a whole buffer). Offsets are
+    counted from the start of `first_line`, the way `str` offsets into the
+    text passed to `reset` are.
+    """
+
+    def __init__(self, content='', first_line=1):
+        self.first_line = first_line
+        self._lens = []
+        self._starts = []
+        self._valid = 0  # entries of _starts that are up to date
+        self.reset(content)
+
+    def reset(self, content, first_line=None):
+        """Rebuild the table for `content`."""
+        if first_line is not None:
+            self.first_line = first_line
+        lens = [len(ln) for ln in content.split('\n')]
+        # every line but the last one carries its newline
+        for i in range(len(lens) - 1):
+            lens[i] += 1
+        self._lens = lens
+        self._valid = 0
+
+    def __len__(self):
+        return len(self._lens)
+
+    @property
+    def total(self):
+        """Length in characters of the indexed text."""
+        return self._prefix()[-1] + self._lens[-1]
+
+    def _prefix(self):
+        if self._valid < len(self._lens):
+            start = self._valid
+            base = self._starts[start - 1] + self._lens[start - 1] if start else 0
+            tail = list(accumulate(self._lens[start:-1], initial=base))
+            self._starts[start:] = tail
+            self._valid = len(self._lens)
+        return self._starts
+
+    def offset(self, line, col=0):
+        """Return the offset of `line`.`col`, clamped to the text."""
+        i = line - self.first_line
+        if i < 0:
+            return 0
+        if i >= len(self._lens):
+            i = len(self._lens) - 1
+            col = self._lens[i]
+        starts = self._prefix()
+        return starts[i] + max(0, min(col, self._lens[i]))
+
+    def line_col(self, offset):
+        """Return (line, col) for `offset`."""
+        starts = self._prefix()
+        i = bisect_right(starts, offset) - 1
+        if i < 0:
+            return self.first_line, 0
+        return self.first_line + i, offset - starts[i]
+
+    def index(self, offset):
+        """Return the Tk index string (`line.col`) for `offset`."""
+        line, col = self.line_col(offset)
+        return f'{line}.{col}'
+
+    def apply_change(self, change):
+        """Update the table for an `edit_hooks.TextChange`."""
+        i = change.line - self.first_line
+        if i < 0 or i >= len(self._lens):
+            return
+        removed = change.removed
+        k = removed.count('\n')
+        if i + k >= len(self._lens):
+            return
+        if k:
+            end_col = len(removed) - removed.rfind('\n') - 1
+        else:
+            end_col = change.col + len(removed)
+        # what is left of the last touched line after the removed text
+        tail = self._lens[i + k] - end_col
+        parts = change.inserted.split('\n')
+        if len(parts) == 1:
+            new = [change.col + len(parts[0]) + tail]
+        else:
+            new = [change.col + len(parts[0]) + 1]
+            new.extend(len(p) + 1 for p in parts[1:-1])
+            new.append(len(parts[-1]) + tail)
+        self._lens[i:i + k + 1] = new
+        # starts up to line i are unaffected; later ones are rebuilt lazily
+        del self._starts[len(self._lens):]
+        self._valid = min(self._valid, i + 1)
+
+
+def line_index_for(text):
+    """Return the `LineIndex` kept in sync with the Text widget `text`.
+
+    The index is built on first use and then updated from edit notifications.
+    If its line count ever disagrees with the widget it is rebuilt.
+    """
+    idx = getattr(text, '_line_index', None)
+    if idx is None:
+        idx = LineIndex(text.get('1.0', 'end-1c'))
+        try:
+            add_edit_listener(text, idx.apply_change)
+        except Exception:
+            # no edit notifications: rebuild on every request instead
+            return idx
+        text._line_index = idx
+        return idx
+    try:
+        nlines = int(str(text.index('end-1c')).split('.')[0])
+    except Exception:
+        nlines = len(idx)
+    if nlines != len(idx):
+        idx.reset(text.get('1.0', 'end-1c'))
+    return idx
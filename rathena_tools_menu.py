@@ -13,6 +13,8 @@ from tkinter import ttk
 import os
 import sys
 
+from line_gutter import LineGutter
+
 # Ensure rathena-tools package is in path
 _current_dir = os.path.dirname(os.path.abspath(__file__))
 _rathena_path = os.path.join(_current_dir, 'rathena-tools')
@@ -707,7 +709,7 @@ def create_rathena_menu(root, menuBar, textArea):
         """Attach a left-side line number gutter to a tkinter.Text widget.
 
         This will try to re-parent the text widget into a new frame that contains
-        a narrow disabled Text widget showing line numbers. The function is
+        a `LineGutter` showing the numbers of the visible lines. The function is
         tolerant if it fails (will not raise).
         """
         try:
@@ -749,10 +751,6 @@ def create_rathena_menu(root, menuBar, textArea):
                 # fallback: continue without reparenting
                 return
 
-            # Create line numbers text widget
-            ln = Text(wrapper, width=6, padx=4, takefocus=0, bd=0, bg='#f0f0f0', fg='#666666', state=DISABLED)
-            ln.pack(side=LEFT, fill=Y)
-
             # Reparent original text into wrapper
             try:
                 text_widget.pack(in_=wrapper, side=RIGHT, fill=BOTH, expand=True)
@@ -760,50 +758,25 @@ def create_rathena_menu(root, menuBar, textArea):
                 # As last resort, just pack normally
                 text_widget.pack(side=RIGHT, fill=BOTH, expand=True)
 
-            def update_line_numbers(event=None):
-                try:
-                    # Get total lines
-                    last_index = text_widget.index('end-1c')
-                    last_line = int(last_index.split('.')[0])
-                    nums = "\n".join(str(i) for i in range(1, last_line + 1))
-                    ln.config(state=NORMAL)
-                    ln.delete('1.0', 'end')
-                    ln.insert('1.0', nums)
-                    ln.config(state=DISABLED)
-                except Exception:
-                    pass
+            # Gutter drawing only the visible line numbers
+            ln = LineGutter(wrapper, text_widget)
+            ln.pack(side=LEFT, fill=Y, before=text_widget)
 
-            def on_text_click(event):
-                # Calculate clicked line in ln and move cursor
-                try:
-                    y = event.y
-                    index = ln.index(f"@0,{y}")
-                    line = int(index.split('.')[0])
-                    text_widget.mark_set('insert', f"{line}.0")
-                    text_widget.see(f"{line}.0")
-                    text_widget.focus()
-                except Exception:
-                    pass
+            # Redraw when the view scrolls, keeping any scrollbar in sync
+            previous = text_widget.cget('yscrollcommand')
 
-            # Sync scrolling
-            def sync_scroll(*args):
+            def sync_scroll(first, last):
                 try:
-                    ln.yview_moveto(text_widget.yview()[0])
+                    if previous:
+                        text_widget.tk.call(*text_widget.tk.splitlist(previous), first, last)
                 except Exception:
                     pass
+                ln.schedule()
 
-            # Bind events
-            text_widget.bind('<KeyRelease>', update_line_numbers)
-            text_widget.bind('<MouseWheel>', update_line_numbers)
-            text_widget.bind('<Button-1>', update_line_numbers)
-            text_widget.bind('<ButtonRelease-1>', update_line_numbers)
-            text_widget.bind('<<Change>>', update_line_numbers)
-            text_widget.bind('<Configure>', update_line_numbers)
-            text_widget.config(yscrollcommand=lambda f, l: (sync_scroll(), None))
-            ln.bind('<Button-1>', on_text_click)
+            text_widget.config(yscrollcommand=sync_scroll)
 
             # Initial fill
-            update_line_numbers()
+            ln.redraw()
             text_widget._line_numbers_attached = True
         except Exception:
             # Do not crash the host app
@@ -1835,6 +1808,30 @@ def launch_dialog_builder(root, get_textarea, app_ref=None):
         messagebox.showerror("Error", f"Dialog Builder error: {e}")
 
 
+def _script_token_stream(app_ref, script_text):
+    """Return the rAthena token stream of `script_text`, or None.
+
+    Uses the editor's highlighter when there is one, so the buffer is lexed
+    once per edit for highlighting and validation alike; otherwise the
+    text is tokenized on its own with syntax/rathena.ini.
+    """
+    highlighter = getattr(app_ref, 'highlighter', None)
+    if highlighter is not None:
+        try:
+            name = highlighter.find_syntax('rathena.ini')
+            stream = highlighter.token_stream(name) if name else None
+            if stream is not None and stream.content == script_text:
+                return stream
+        except Exception:
+            pass
+    try:
+        from syntax_tokenizer import tokenize_text
+        return tokenize_text(script_text, os.path.join(_current_dir, 'syntax', 'rathena.ini'))
+    except Exception as e:
+        print(f"[WARNING] Could not tokenize script: {e}")
+        return None
+
+
 def validate_current_script(root, get_textarea, app_ref=None):
     """Validate the current script with line-by-line error highlighting."""
     if not _RATHENA_TOOLS_AVAILABLE:
@@ -2165,31 +2162,36 @@ def validate_current_script(root, get_textarea, app_ref=None):
                 warnings = []
                 suggestions = []
                 
-                # Load rAthena commands from syntax file
+                import re
+
+                # Tokens of the script, shared with the syntax highlighter
+                stream = _script_token_stream(app_ref, script_text)
+
+                # Load rAthena commands (builtins + keywords) from the same word
+                # lists the syntax highlighter classifies identifiers with
                 rathena_commands = set()
-                try:
-                    syntax_file = os.path.join(_current_dir, 'syntax', 'rathena.ini')
-                    if os.path.exists(syntax_file):
-                        with open(syntax_file, 'r', encoding='utf-8') as f:
-                            for line in f:
-                                if line.startswith('builtins.csv'):
-                                    # Extract commands from builtins.csv line
-                                    builtins_line = line.split('=', 1)[1].strip()
-                                    commands = [cmd.strip() for cmd in builtins_line.split(',') if cmd.strip()]
-                                    rathena_commands.update(commands)
-                                    break
-                        # Add keywords too
-                        with open(syntax_file, 'r', encoding='utf-8') as f:
-                            for line in f:
-                                if line.startswith('keywords.csv'):
-                                    keywords_line = line.split('=', 1)[1].strip()
-                                    keywords = [kw.strip() for kw in keywords_line.split(',') if kw.strip()]
-                                    rathena_commands.update(keywords)
-                                    break
-                except Exception as e:
+                comment_lines = set()
+                if stream is not None:
+                    classes = stream.word_classes()
+                    rathena_commands = classes.get('BUILTIN', frozenset()) | classes.get('KEYWORD', frozenset())
+                    # lines holding nothing but comments (block comments included)
+                    comment_lines = stream.covered_lines('COMMENT', 'TODO')
+                else:
+                    # no syntax file: treat every line from /* to */ as comment
+                    inside = False
+                    for num, text_line in enumerate(lines, 1):
+                        if '/*' in text_line:
+                            inside = True
+                        if inside:
+                            comment_lines.add(num)
+                        if '*/' in text_line:
+                            inside = False
+                if not rathena_commands:
                     # Fallback to basic commands if syntax file fails
                     rathena_commands = {'mes', 'close', 'next', 'end', 'set', 'getitem', 'delitem', 'warp', 
                                        'menu', 'select', 'if', 'else', 'switch', 'case', 'break', 'goto'}
+                # lowercase lookup, matched against the words of each line
+                rathena_commands = frozenset(cmd.lower() for cmd in rathena_commands if cmd)
                     
                 # Clear previous highlights
                 clear_highlights()
@@ -2205,7 +2207,6 @@ def validate_current_script(root, get_textarea, app_ref=None):
                 in_npc = False
                 in_function = False
                 in_block = False
-                in_multiline_comment = False
                 bracket_count = 0
                 npc_name = None
                 function_name = None
@@ -2215,15 +2216,8 @@ def validate_current_script(root, get_textarea, app_ref=None):
                 for line_num, line in enumerate(lines, 1):
                     stripped = line.strip()
                     
-                    # Simple multi-line comment handling - just like bracket tracking
-                    if '/*' in stripped:
-                        in_multiline_comment = True
-                    if '*/' in stripped:
-                        in_multiline_comment = False
-                        continue  # Skip the line with */
-                    
-                    # Skip everything inside multi-line comments
-                    if in_multiline_comment:
+                    # Skip lines that are only comment (per the token stream)
+                    if line_num in comment_lines:
                         continue
                         
                     # Skip empty lines and single-line comments
@@ -2434,7 +2428,8 @@ def validate_current_script(root, get_textarea, app_ref=None):
                             # Regular statements need semicolons
                             # Check if line contains any rAthena command
                             line_lower = stripped.lower()
-                            has_command = any(cmd in line_lower for cmd in rathena_commands if cmd)
+                            has_command = any(word in rathena_commands
+                                              for word in re.findall(r'[a-z_]\w*', line_lower))
                             
                             # Also check for common patterns that need semicolons
                             needs_semicolon = (
@@ -0,0 +1,460 @@
+"""Read syntax/*.ini definitions and compile their token patterns.
+
+`parse_syntax_file` line-parses the [Syntax] section of one file into
+plain data (what the highlighter's on-disk cache stores), and
+`build_syntax` turns that into the record lexing works from: the token
+patterns compiled once and combined into one scanner, the CSV word lists
+as dicts, the block delimiters and the content detector.
+
+Nothing here touches Tk, so the tokenizer and other consumers can load a
+syntax without the highlighter.
+"""
+
+import os
+import re
+import time
+
+
+def parse_syntax_file(path):
+    """Line-parse the [Syntax] section of one .ini file.
+
+    Returns {name, exts, regexes, words, tags, detect}, where `words` holds
+    the CSV word lists as (token, [word, ...]), or None if the file cannot be
+    read. The result holds only plain data so it can be stored in the syntax
+    cache.
+    """
+    # Prefer a line-based parser for the [Syntax] section to preserve
+    # complex regex RHS exactly as written in the INI file.
+    regexes = []
+    tags = {}
+    csv_lists = {}
+    name = None
+    exts = []
+    detect = {}
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            in_syntax = False
+            for raw in f:
+                line = raw.rstrip('\n')
+                s = line.strip()
+                if not in_syntax:
+                    if s.startswith('[') and s.lower().startswith('[syntax'):
+                        in_syntax = True
+                    continue
+                # end of syntax section
+                if s.startswith('[') and in_syntax:
+                    break
+                if not s or s.startswith(';') or s.startswith('#'):
+                    continue
+                # name
+                m = re.match(r'^name\s*=\s*(.*)$', line, flags=re.I)
+                if m:
+                    name = m.group(1).strip()
+                    continue
+                m = re.match(r'^detect\.ext\s*=\s*(.*)$', line, flags=re.I)
+                if m:
+                    exts_raw = m.group(1).strip()
+                    exts = [e.strip().lstrip('.') for e in re.split('[,;]', exts_raw) if e.strip()]
+                    continue
+                # content detectors: detect.regex/includes/contains/priority
+                m = re.match(r'^detect\.(regex|includes|contains|priority)\s*=\s*(.*)$', line, flags=re.I)
+                if m:
+                    detect[m.group(1).lower()] = m.group(2).strip()
+                    continue
+                # regex lines: regex.<TOKEN>_RE = <pattern>
+                m = re.match(r'^\s*regex\.([^.=\s]+)_RE\s*=\s*(.*)$', line)
+                if m:
+                    token = m.group(1)
+                    pat = m.group(2).rstrip()
+                    # Unwrap raw-style R"..." or R'...' fragments inside the
+                    # pattern so they're valid Python regex syntax.
+                    try:
+                        pat = re.sub(r'[rR]"((?:\\.|[^"\\])*)"', r'\1', pat, flags=re.DOTALL)
+                        pat = re.sub(r"[rR]'((?:\\.|[^'\\])*)'", r"\1", pat, flags=re.DOTALL)
+                        # If the entire RHS is quoted, unwrap it
+                        if (pat.startswith('"') and pat.endswith('"')) or (pat.startswith("'") and pat.endswith("'")):
+                            pat = pat[1:-1]
+                    except Exception:
+                        pass
+                    regexes.append((token, pat))
+                    continue
+                # tag.<name>.(fg|bg)
+                m = re.match(r'^\s*tag\.([^.\s]+)\.(fg|bg)\s*=\s*(.*)$', line)
+                if m:
+                    tagname = m.group(1)
+                    which = m.group(2)
+                    val = m.group(3).strip()
+                    tags.setdefault(tagname, {})[which] = val
+                    continue
+                # csv lists like keywords.csv = a,b,c
+                m = re.match(r'^\s*([A-Za-z0-9_]+)\.csv\s*=\s*(.*)$', line)
+                if m:
+                    tok = m.group(1)
+                    val = m.group(2).strip()
+                    csv_lists[tok] = val
+                    continue
+    except Exception:
+        # fallback: skip file on read error
+        return None
+    if not name:
+        name = os.path.splitext(os.path.basename(path))[0]
+
+    # CSV keyword lists are classified by looking identifiers up in a dict
+    # (see build_syntax); only entries that are not plain identifiers are
+    # still turned into a regex alternation
+    word_lists = []
+    for tok, csv in csv_lists.items():
+        try:
+            words = [w.strip() for w in re.split('[,\s]+', csv) if w.strip()]
+            tname = (tok.rstrip('s') if tok.endswith('s') else tok).upper()
+            plain = [w for w in words if IDENT_RE.fullmatch(w)]
+            other = [w for w in words if not IDENT_RE.fullmatch(w)]
+            if plain:
+                word_lists.append((tname, plain))
+            if other:
+                parts = [re.escape(w) for w in other]
+                regexes.append((tname, r'\b(?:' + '|'.join(parts) + r')\b'))
+        except Exception:
+            pass
+
+    return {'name': name, 'exts': exts, 'regexes': regexes, 'words': word_lists,
+            'tags': tags, 'detect': detect}
+
+
+def word_classes(path):
+    """Return {token: frozenset(words)} from the CSV word lists of one .ini.
+
+    For consumers without a SyntaxHighlighter at hand; the sets are the
+    same ones the highlighter classifies identifiers with.
+    """
+    parsed = parse_syntax_file(path)
+    out = {}
+    for token, ws in (parsed or {}).get('words', []):
+        out[token] = out.get(token, frozenset()) | frozenset(ws)
+    return out
+
+
+def build_syntax(fn, path, parsed):
+    """Compile a parsed definition into the record the highlighter uses.
+
+    Individual regexes in `compiled` may be None when the definition came
+    from the cache; they are compiled on demand (see
+    `syntax_highlighter.profile_patterns`).
+    """
+    name = parsed['name']
+    exts = parsed['exts']
+    regexes = parsed['regexes']
+    tags = parsed['tags']
+    word_lists = parsed.get('words', [])
+    words, word_sets = _word_table(word_lists)
+    # compile once here; bad patterns are reported now rather than
+    # skipped on every pass. The verdict is kept with the parsed definition,
+    # so a cached file only needs its combined scanner compiled.
+    checked = parsed.get('checked')
+    if checked is None:
+        compiled, rejected, timings = compile_patterns(regexes)
+        parsed['checked'] = ([(t, body) for t, body, _ in compiled], rejected, timings)
+    else:
+        usable, rejected, timings = checked
+        compiled = [(t, body, None) for t, body in usable]
+    for token, reason in rejected:
+        if reason.startswith('matches the empty'):
+            # \b\b placeholders for unused token slots
+            continue
+        print(f"[WARNING] {fn}: regex.{token}_RE rejected: {reason}")
+
+    # one alternation of every token pattern, scanned in a single pass
+    scanner, scan_names, error = build_scanner(compiled, bool(words))
+    if error:
+        print(f"[WARNING] {fn}: could not combine token patterns: {error}")
+
+    # store parsed syntax
+    syn = {
+        'file': path,
+        'name': name,
+        'exts': exts,
+        'regexes': regexes,
+        'word_lists': word_lists,
+        'tokens': list(dict.fromkeys([t for t, _ in regexes] + [t for t, _ in word_lists])),
+        'words': words,
+        'word_sets': word_sets,
+        'tags': tags,
+        'blocks': derive_blocks(regexes),
+        'compiled': compiled,
+        'rejected': rejected,
+        'timings': timings,
+        'scanner': scanner,
+        'scan_names': scan_names,
+        'detector': build_detector(fn, parsed.get('detect', {})),
+    }
+    # Optional debug: print parsed regex tokens and tag keys when enabled
+    try:
+        if os.environ.get('SYNTAX_DEBUG'):
+            print(f"[SYNTAX_DEBUG] Loaded syntax: {name}")
+            print(f"  file: {path}")
+            print(f"  exts: {exts}")
+            print(f"  regex tokens: {[t for t, _ in regexes]}")
+            print(f"  word lists: {[(t, len(ws)) for t, ws in word_lists]}")
+            print(f"  tag keys: {list(tags.keys())}")
+            for token, reason in rejected:
+                print(f"  rejected {token}: {reason}")
+    except Exception:
+        pass
+    return syn
+
+
+def _word_table(word_lists):
+    """Return ({word: token}, {token: frozenset(words)}) for CSV word lists.
+
+    The first list naming a word wins, as the first alternation did before.
+    """
+    words = {}
+    word_sets = {}
+    for token, ws in word_lists:
+        for w in ws:
+            words.setdefault(w, token)
+        word_sets[token] = word_sets.get(token, frozenset()) | frozenset(ws)
+    return words, word_sets
+
+
+def restrict_syntax(syn, tokens):
+    """Return a record of `syn` that only lexes the token classes in `tokens`.
+
+    The highlighter lexes with the classes that have a style: an unstyled
+    class that matched first would otherwise take text from a styled one
+    (a `^[ \\t]*` assignment pattern starting before a keyword) and leave
+    it uncolored. Patterns and word lists keep their order among the
+    classes kept. `syn` itself is returned when nothing is left out; other
+    views are built once per set of tokens and kept with `syn`.
+    """
+    keep = frozenset(tokens)
+    lexing = {t for t, _, _ in syn['compiled']} | {t for t, _ in syn['word_lists']}
+    if lexing <= keep:
+        return syn
+    views = syn.setdefault('views', {})
+    view = views.get(keep)
+    if view is None:
+        view = dict(syn)
+        view.pop('views', None)
+        view['compiled'] = [c for c in syn['compiled'] if c[0] in keep]
+        view['word_lists'] = [(t, ws) for t, ws in syn['word_lists'] if t in keep]
+        view['words'], view['word_sets'] = _word_table(view['word_lists'])
+        view['blocks'] = [b for b in syn.get('blocks', ()) if b[0] in keep]
+        view['tokens'] = [t for t in syn['tokens'] if t in keep]
+        view['scanner'], view['scan_names'], _ = build_scanner(view['compiled'], bool(view['words']))
+        views[keep] = view
+    return view
+
+
+def same_lexing(syn, parsed):
+    """True if `parsed` tokenizes text exactly like the record `syn`."""
+    return (syn.get('regexes') == parsed['regexes']
+            and syn.get('word_lists') == parsed.get('words', []))
+
+
+def restyle_syntax(fn, syn, parsed):
+    """Return a copy of `syn` with the non-lexing parts of `parsed`."""
+    syn = dict(syn)
+    syn.pop('views', None)
+    syn['name'] = parsed['name']
+    syn['exts'] = parsed['exts']
+    syn['tags'] = parsed['tags']
+    syn['detector'] = build_detector(fn, parsed.get('detect', {}))
+    return syn
+
+
+def build_detector(fn, detect):
+    """Precompile the detect.* entries of a syntax for `detect_syntax`.
+
+    `regex` must match for the content to count as evidence at all;
+    `includes` are whole words and `contains` substrings, both matched
+    case-insensitively, that add to the score. `priority` decides between
+    syntaxes that both qualify.
+    """
+    det = {'regex': None, 'words': None, 'contains': [], 'priority': 0}
+    pat = detect.get('regex')
+    if pat:
+        try:
+            det['regex'] = re.compile(pat)
+        except re.error as e:
+            print(f"[WARNING] {fn}: detect.regex rejected: invalid regex: {e}")
+    words = [w.strip() for w in re.split(r'[,;]', detect.get('includes', '')) if w.strip()]
+    if words:
+        det['words'] = re.compile(r'\b(?:' + '|'.join(re.escape(w) for w in words) + r')\b', re.I)
+    det['contains'] = [c.strip().lower() for c in re.split(r'[,;]', detect.get('contains', '')) if c.strip()]
+    try:
+        det['priority'] = int(detect.get('priority', 0))
+    except ValueError:
+        print(f"[WARNING] {fn}: detect.priority is not a number: {detect.get('priority')}")
+    return det
+
+
+# an identifier, as looked up in the CSV word lists
+IDENT_RE = re.compile(r'\b[A-Za-z_]\w*')
+
+
+# leading global flags such as (?m) or (?mi) on an .ini pattern
+_LEADING_FLAGS_RE = re.compile(r'^((?:\(\?[aiLmsux]+\))+)')
+
+
+# text with word boundaries, line starts and punctuation to catch
+# placeholder patterns like \b\b that only ever match the empty string
+_EMPTY_PROBE = 'a1 _b\n\t"c" #d: -1\n'
+
+
+# numbered or named backreferences, which would point at the wrong group
+# once a pattern is embedded in the combined scanner
+_BACKREF_RE = re.compile(r'\\[1-9]|\(\?P=')
+
+
+def compile_patterns(regexes):
+    """Compile every token pattern once, with the flags the scanner uses.
+
+    Returns (compiled, rejected, timings): `compiled` holds (token, body,
+    regex) for each usable pattern, `rejected` holds (token, reason) for the
+    rest and `timings` maps token -> compile seconds.
+    """
+    compiled = []
+    rejected = []
+    timings = {}
+    for token, pat in regexes:
+        if not pat:
+            rejected.append((token, 'empty pattern'))
+            continue
+        body = pat
+        m = _LEADING_FLAGS_RE.match(pat)
+        if m:
+            flags = ''.join(sorted(set(re.sub(r'[(?)]', '', m.group(1))) - {'m'}))
+            body = pat[m.end():]
+            if flags:
+                body = f'(?{flags}:{body})'
+        t0 = time.perf_counter()
+        try:
+            regex = re.compile(body, re.MULTILINE)
+        except re.error as e:
+            rejected.append((token, f'invalid regex: {e}'))
+            continue
+        timings[token] = time.perf_counter() - t0
+        if _BACKREF_RE.search(body):
+            rejected.append((token, 'backreferences are not supported in token patterns'))
+            continue
+        if any(e.start() == e.end() for e in regex.finditer(_EMPTY_PROBE)):
+            rejected.append((token, 'matches the empty string'))
+            continue
+        compiled.append((token, body, regex))
+    return compiled, rejected, timings
+
+
+def build_scanner(compiled, with_words=False):
+    """Combine compiled token patterns into one named-group alternation.
+
+    The text is then lexed in a single left-to-right pass: at each position
+    the earliest-declared token that matches wins and scanning resumes after
+    it, so tokens never overlap (a keyword inside a comment or string stays
+    part of that comment or string). MULTILINE applies to all of them.
+
+    With `with_words` a last alternative, group `_w`, matches any identifier
+    so the caller can classify it with a dict lookup; its name maps to None.
+
+    Returns (compiled scanner or None, {group name: token}, error or None).
+    """
+    parts = []
+    names = {}
+    for i, (token, body, _regex) in enumerate(compiled):
+        group = f'_t{i}'
+        names[group] = token
+        parts.append(f'(?P<{group}>{body})')
+    if with_words:
+        names['_w'] = None
+        parts.append(f'(?P<_w>{IDENT_RE.pattern})')
+    if not parts:
+        return None, {}, None
+    try:
+        return re.compile('|'.join(parts), re.MULTILINE), names, None
+    except re.error as e:
+        return None, {}, str(e)
+
+
+def _split_alternatives(pat):
+    """Split a regex on its top-level `|` (outside groups and classes)."""
+    parts = []
+    depth = 0
+    in_class = False
+    cur = []
+    i = 0
+    while i < len(pat):
+        c = pat[i]
+        if c == '\\':
+            cur.append(pat[i:i + 2])
+            i += 2
+            continue
+        if in_class:
+            if c == ']':
+                in_class = False
+        elif c == '[':
+            in_class = True
+            # a ']' right after '[' or '[^' is literal
+            j = i + 1
+            if j < len(pat) and pat[j] == '^':
+                j += 1
+            if j < len(pat) and pat[j] == ']':
+                cur.append(pat[i:j + 1])
+                i = j + 1
+                continue
+        elif c == '(':
+            depth += 1
+        elif c == ')':
+            depth -= 1
+        elif c == '|' and depth == 0:
+            parts.append(''.join(cur))
+            cur = []
+            i += 1
+            continue
+        cur.append(c)
+        i += 1
+    parts.append(''.join(cur))
+    return parts
+
+
+def _regex_literal(frag):
+    """Return the plain text `frag` matches, or None if it is not a literal."""
+    out = []
+    i = 0
+    while i < len(frag):
+        c = frag[i]
+        if c == '\\':
+            if i + 1 >= len(frag) or frag[i + 1].isalnum():
+                return None
+            out.append(frag[i + 1])
+            i += 2
+            continue
+        if c in '.^$*+?{}[]()|':
+            return None
+        out.append(c)
+        i += 1
+    return ''.join(out) or None
+
+
+# `open[\s\S]*?close`, spelled any of the usual ways a block comment is
+# written in the .ini files
+_BLOCK_BODY_RE = re.compile(r'^(.+?)(?:\[\\s\\S\]|\[\\S\\s\]|\[\\d\\D\]|\[\\w\\W\])\*\?(.+)$')
+
+
+def derive_blocks(regexes):
+    """Find delimited multi-line constructs (e.g. `/* ... */`) per token.
+
+    Returns a list of (token, open, close) for every top-level alternative of
+    a token pattern shaped like `open[\s\S]*?close` with literal delimiters.
+    """
+    blocks = []
+    for token, pat in regexes:
+        body = re.sub(r'^\(\?[aiLmsux]+\)', '', pat or '')
+        for alt in _split_alternatives(body):
+            m = _BLOCK_BODY_RE.match(alt.strip())
+            if not m:
+                continue
+            opener = _regex_literal(m.group(1))
+            closer = _regex_literal(m.group(2))
+            if opener and closer:
+                blocks.append((token, opener, closer))
+    return blocks
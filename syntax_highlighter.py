@@ -1,139 +1,196 @@
 import os
 import re
+import time
+import queue
+import pickle
+import hashlib
+import threading
 import configparser
 from tkinter import END
 
+from edit_hooks import add_edit_listener, remove_edit_listener, change_lines
+from line_index import line_index_for
+from syntax_tokenizer import NORMAL, INSIDE, TokenCache, lex
+from syntax_defs import IDENT_RE, build_syntax, parse_syntax_file, restrict_syntax, restyle_syntax, same_lexing
+
 
 class SyntaxHighlighter:
     """Load .ini syntax files and apply highlighting to a Tk Text widget.
 
     This is intentionally simple: it reads files from a `syntax` directory, loads
     regex.* entries as patterns and tag.*.fg/bg entries as colors, then applies
-    tags by searching the whole buffer. Highlighting is scheduled via
-    `after` to avoid running on every keystroke.
+    tags by searching the buffer. Highlighting is scheduled via `after` to
+    avoid running on every keystroke; unless a delay is given, the delay
+    adapts to how long recent passes took (`debounce_factor` times their
+    moving average, kept between `debounce_min_ms` and `debounce_max_ms`).
+
+    In incremental mode (the default) every insert/delete is observed through
+    `edit_hooks`, and a pass only re-lexes the lines touched since the last
+    one. The lexer state at the start of every line (normal, inside a block
+    comment, inside another multi-line token) is cached; a pass starts from
+    the cached state of its first line and carries on past its last line
+    only until the state it ends in agrees with the cached one, so opening or
+    closing a block comment re-lexes just the lines whose state changed.
+
+    With `viewport_first` (the default), any pass over more than
+    `lazy_threshold` lines colors the visible lines (plus `viewport_margin`)
+    at once and fills in the rest in `after()` slices of at most
+    `fill_slice_ms`; lines scrolled into view jump to the front of that queue
+    (see `on_view_changed`). A pass that runs over that same budget leaves
+    its remaining dirty lines to the fill as well. `status()` reports the
+    pass latency and the backlog, and is passed to `status_callback` when
+    it changes.
+
+    With `threaded` (the default) that background fill is tokenized on a
+    worker thread: each queued block is snapshotted on the Tk thread, scanned
+    by the worker and handed back through a queue that `_fill_step` drains
+    within the same time budget. Every job carries the edit generation it was
+    taken at; results for an older generation are dropped and their lines go
+    back on the queue. Tk itself is only ever touched from the main thread.
+
+    Parsed .ini files are kept in an on-disk cache (see `load_syntaxes`), and
+    `load_stats` records how the last load went. Patterns are compiled once
+    per syntax at load time. Ones that fail are
+    reported and kept in `rejected_patterns()`; `pattern_timings()` and
+    `profile_patterns()` show what each `regex.*_RE` line costs.
+
+    Lexing itself lives in `syntax_tokenizer`. `token_stream()` hands other
+    features the tokens of the whole buffer, lexed at most once per edit
+    generation and taken over from a full highlight pass when there was one.
     """
 
-    def __init__(self, text_widget, syntax_dir=None):
+    lazy_threshold = 2000
+    viewport_margin = 60
+    fill_block_lines = 200
+    fill_slice_ms = 8
+    fill_poll_ms = 5
+    max_inflight = 2
+    use_cache = True
+    detect_head_chars = 64 * 1024
+    detect_chunks = 4
+    detect_chunk_chars = 4096
+    watch_interval_ms = 1000
+    debounce_min_ms = 20
+    debounce_max_ms = 300
+    debounce_factor = 4
+    latency_alpha = 0.3  # weight of the newest pass in the moving average
+
+    def __init__(self, text_widget, syntax_dir=None, incremental=True, viewport_first=True,
+                 threaded=True):
         self.text = text_widget
         self.root = self.text.winfo_toplevel()
         self.syntax_dir = syntax_dir or os.path.join(os.path.dirname(__file__), 'syntax')
         self._syntaxes = {}  # name -> dict
         self._current = None
         self._after_id = None
+        self._dirty = []  # sorted, disjoint [first, last] line ranges
+        self._full = True  # next pass must cover the whole buffer
+        self._pending = []  # line ranges queued for the background fill
+        self._fill_id = None
+        self._generation = 0  # bumped on every edit
+        self._inflight = {}  # job id -> [first, last] handed to the worker
+        self._states = []  # lexer state at the start of line i + 1, None if unknown
+        self._pass_ms = None  # moving average of highlight() durations
+        self._last_status = None
+        self.status_callback = None  # called with status() when it changes
+        self._streams = TokenCache()
+        self._tag_of = {}  # token -> Tk tag of the current syntax
+        self._lexer = None  # the current syntax, lexing its styled tokens only
+        self._watch_id = None
+        self._watch_stamps = {}
+        self._job_seq = 0
+        self._jobs = None
+        self._results = None
+        self._worker = None
+        self.incremental = incremental
+        self.viewport_first = viewport_first
+        self.threaded = threaded
         self._load_all_syntaxes()
+        if self.incremental:
+            try:
+                add_edit_listener(self.text, self._on_edit)
+            except Exception:
+                self.incremental = False
+        # stale worker results are detected through edit notifications
+        self.threaded = self.threaded and self.incremental
 
-    def _load_all_syntaxes(self):
-        if not os.path.isdir(self.syntax_dir):
-            return
+    def close(self):
+        """Stop observing the text widget and cancel any pending pass."""
+        try:
+            if self._after_id:
+                self.root.after_cancel(self._after_id)
+        except Exception:
+            pass
+        self._after_id = None
+        try:
+            if self._watch_id:
+                self.root.after_cancel(self._watch_id)
+        except Exception:
+            pass
+        self._watch_id = None
+        self._cancel_fill()
+        remove_edit_listener(self.text, self._on_edit)
+        if self._worker is not None:
+            self._jobs.put(None)
+            self._worker = None
 
-        for fn in sorted(os.listdir(self.syntax_dir)):
-            if not fn.lower().endswith('.ini'):
-                continue
-            path = os.path.join(self.syntax_dir, fn)
+    def reload(self):
+        """Re-read the syntax directory and re-highlight with the same syntax.
+
+        Only .ini files whose mtime or size changed are parsed again. When
+        the current syntax changed in its colors only, the existing tags are
+        reconfigured and nothing is re-lexed or re-tagged; otherwise a new
+        pass is scheduled.
+        """
+        current = self._current
+        previous = self._syntaxes
+        self._load_all_syntaxes(previous)
+        if self._watch_id is not None:
+            self._watch_stamps = _dir_stamps(self.syntax_dir)
+        old = previous.get(current)
+        new = self._syntaxes.get(current)
+        if old is not None and new is not None and new['scanner'] is old['scanner']:
+            if new is not old:
+                self._streams.retarget(old, new)
+                tag_of, styles = self._tag_map(current)
+                if tag_of != self._tag_of:
+                    # a token gained or lost its style: re-tag everything
+                    self._full = True
+                self._set_tags(tag_of, styles)
+                self._lexer = restrict_syntax(new, tag_of)
+        else:
+            self._current = None
+            self._streams.clear()
+            self.set_syntax(current)
+        if self._full and self._current:
+            self.schedule_highlight()
+
+    def watch_syntax_dir(self, interval_ms=None):
+        """Poll the syntax directory and `reload` when an .ini changes.
+
+        Each poll only stats the directory's .ini files. A reload that
+        needs a new pass schedules it. Stopped by `close`.
+        """
+        self._watch_ms = interval_ms or self.watch_interval_ms
+        self._watch_stamps = _dir_stamps(self.syntax_dir)
+        if self._watch_id is None:
+            self._watch_id = self.root.after(self._watch_ms, self._poll_syntax_dir)
+
+    def _poll_syntax_dir(self):
+        self._watch_id = None
+        stamps = _dir_stamps(self.syntax_dir)
+        if stamps != self._watch_stamps:
+            self._watch_stamps = stamps
             try:
-                # Prefer a line-based parser for the [Syntax] section to preserve
-                # complex regex RHS exactly as written in the INI file.
-                regexes = []
-                tags = {}
-                csv_lists = {}
-                name = None
-                exts = []
-                try:
-                    with open(path, 'r', encoding='utf-8') as f:
-                        in_syntax = False
-                        for raw in f:
-                            line = raw.rstrip('\n')
-                            s = line.strip()
-                            if not in_syntax:
-                                if s.startswith('[') and s.lower().startswith('[syntax'):
-                                    in_syntax = True
-                                continue
-                            # end of syntax section
-                            if s.startswith('[') and in_syntax:
-                                break
-                            if not s or s.startswith(';') or s.startswith('#'):
-                                continue
-                            # name
-                            m = re.match(r'^name\s*=\s*(.*)$', line, flags=re.I)
-                            if m:
-                                name = m.group(1).strip()
-                                continue
-                            m = re.match(r'^detect\.ext\s*=\s*(.*)$', line, flags=re.I)
-                            if m:
-                                exts_raw = m.group(1).strip()
-                                exts = [e.strip().lstrip('.') for e in re.split('[,;]', exts_raw) if e.strip()]
-                                continue
-                            # regex lines: regex.<TOKEN>_RE = <pattern>
-                            m = re.match(r'^\s*regex\.([^.=\s]+)_RE\s*=\s*(.*)$', line)
-                            if m:
-                                token = m.group(1)
-                                pat = m.group(2).rstrip()
-                                # Unwrap raw-style R"..." or R'...' fragments inside the
-                                # pattern so they're valid Python regex syntax.
-                                try:
-                                    pat = re.sub(r'[rR]"((?:\\.|[^"\\])*)"', r'\1', pat, flags=re.DOTALL)
-                                    pat = re.sub(r"[rR]'((?:\\.|[^'\\])*)'", r"\1", pat, flags=re.DOTALL)
-                                    # If the entire RHS is quoted, unwrap it
-                                    if (pat.startswith('"') and pat.endswith('"')) or (pat.startswith("'") and pat.endswith("'")):
-                                        pat = pat[1:-1]
-                                except Exception:
-                                    pass
-                                regexes.append((token, pat))
-                                continue
-                            # tag.<name>.(fg|bg)
-                            m = re.match(r'^\s*tag\.([^.\s]+)\.(fg|bg)\s*=\s*(.*)$', line)
-                            if m:
-                                tagname = m.group(1)
-                                which = m.group(2)
-                                val = m.group(3).strip()
-                                tags.setdefault(tagname, {})[which] = val
-                                continue
-                            # csv lists like keywords.csv = a,b,c
-                            m = re.match(r'^\s*([A-Za-z0-9_]+)\.csv\s*=\s*(.*)$', line)
-                            if m:
-                                tok = m.group(1)
-                                val = m.group(2).strip()
-                                csv_lists[tok] = val
-                                continue
-                except Exception:
-                    # fallback: skip file on read error
-                    continue
-                if not name:
-                    name = os.path.splitext(fn)[0]
-
-                # If CSV keyword lists were present, convert them to regexes
-                for tok, csv in csv_lists.items():
-                    try:
-                        words = [w.strip() for w in re.split('[,\s]+', csv) if w.strip()]
-                        if words:
-                            parts = [re.escape(w) for w in words]
-                            pat = r'\b(?:' + '|'.join(parts) + r')\b'
-                            tname = tok.rstrip('s') if tok.endswith('s') else tok
-                            regexes.append((tname.upper(), pat))
-                    except Exception:
-                        pass
-
-                # store parsed syntax
-                self._syntaxes[name] = {
-                    'file': path,
-                    'name': name,
-                    'exts': exts,
-                    'regexes': regexes,
-                    'tags': tags,
-                }
-                # Optional debug: print parsed regex tokens and tag keys when enabled
-                try:
-                    if os.environ.get('SYNTAX_DEBUG'):
-                        print(f"[SYNTAX_DEBUG] Loaded syntax: {name}")
-                        print(f"  file: {path}")
-                        print(f"  exts: {exts}")
-                        print(f"  regex tokens: {[t for t, _ in regexes]}")
-                        print(f"  tag keys: {list(tags.keys())}")
-                except Exception:
-                    pass
-            except Exception:
-                # ignore file parse errors
-                continue
+                self.reload()
+            except Exception as e:
+                print(f"[WARNING] Syntax reload failed: {e}")
+        self._watch_id = self.root.after(self._watch_ms, self._poll_syntax_dir)
+
+    def _load_all_syntaxes(self, previous=None):
+        self._syntaxes, self.load_stats = load_syntaxes(
+            self.syntax_dir, previous=previous, use_cache=self.use_cache)
+        self._detect_memo = {}
 
     def get_syntax_for_file(self, filepath):
         if not filepath:
@@ -144,42 +201,81 @@ class SyntaxHighlighter:
                 return name
         return None
 
+    def find_syntax(self, filename):
+        """Return the name of the syntax loaded from `filename` (e.g. 'rathena.ini')."""
+        for name, syn in self._syntaxes.items():
+            if os.path.basename(syn.get('file', '')) == filename:
+                return name
+        return None
+
+    def token_stream(self, name=None):
+        """Return the `syntax_tokenizer.TokenStream` of the buffer.
+
+        `name` selects the syntax (default: the current one). The stream is
+        cached until the next edit, so every consumer shares one lexing.
+        """
+        syn = self._syntaxes.get(name or self._current)
+        if not syn:
+            return None
+        generation = self._generation if self.incremental else None
+        return self._streams.get(syn, generation, lambda: self.text.get('1.0', 'end-1c'))
+
     def set_syntax(self, name):
         if name is None or name not in self._syntaxes:
             self._current = None
+            self._cancel_fill()
+            self._set_tags({})
+            self._lexer = None
             return
         if self._current == name:
             return
         self._current = name
-        # create tags on text widget
+        self._full = True
+        self._cancel_fill()
+        self._set_tags(*self._tag_map(name))
+        self._lexer = restrict_syntax(self._syntaxes[name], self._tag_of)
+
+    def _tag_map(self, name):
+        """Return ({token: tagname}, {tagname: style}) for a syntax."""
         syn = self._syntaxes[name]
-        for token, _ in syn['regexes']:
+        tag_of = {}
+        styles = {}
+        for token in syn['tokens']:
             tag_key = self._choose_tag_key(token, syn['tags'])
-            tagname = self._tagname(name, token)
-            # make sure tag exists
-            if tag_key and syn['tags'].get(tag_key):
-                fg = syn['tags'][tag_key].get('fg') or None
-                bg = syn['tags'][tag_key].get('bg') or None
-                cfg = {}
-                if fg:
-                    cfg['foreground'] = fg
-                if bg:
-                    cfg['background'] = bg
-                try:
-                    self.text.tag_configure(tagname, **cfg)
-                except Exception:
-                    # fallback to simple configure
-                    try:
-                        if fg:
-                            self.text.tag_configure(tagname, foreground=fg)
-                        if bg:
-                            self.text.tag_configure(tagname, background=bg)
-                    except Exception:
-                        pass
-            else:
-                # define empty tag so it can be removed/used
+            style = syn['tags'].get(tag_key) if tag_key else None
+            if style and (style.get('fg') or style.get('bg')):
+                tag_of[token] = self._tagname(name, tag_key)
+                styles[tag_of[token]] = style
+        return tag_of, styles
+
+    def _set_tags(self, tag_of, styles=None):
+        """Switch to the token -> tag map `tag_of` and configure its tags.
+
+        Spans are disjoint, so every character carries at most one syntax
+        tag: tokens sharing a tag.* style share one Tk tag, and tokens with
+        no style are neither tagged nor lexed (see `restrict_syntax`). Tags of the previous map that are
+        not reused are cleared from the buffer.
+        """
+        for tagname in set(self._tag_of.values()) - set(tag_of.values()):
+            try:
+                self.text.tag_remove(tagname, '1.0', END)
+            except Exception:
+                pass
+        self._tag_of = tag_of
+        for tagname, style in (styles or {}).items():
+            fg = style.get('fg') or None
+            bg = style.get('bg') or None
+            # an empty value clears a color the tag had before a reload
+            cfg = {'foreground': fg or '', 'background': bg or ''}
+            try:
+                self.text.tag_configure(tagname, **cfg)
+            except Exception:
+                # fallback to simple configure
                 try:
-                    self.text.tag_configure(tagname)
+                    if fg:
+                        self.text.tag_configure(tagname, foreground=fg)
+                    if bg:
+                        self.text.tag_configure(tagname, background=bg)
                 except Exception:
                     pass
 
@@ -200,10 +296,13 @@ class SyntaxHighlighter:
                 return k
         return None
 
-    def _tagname(self, syntax_name, token):
-        return f"syn_{syntax_name}_{token.lower()}"
+    def _tagname(self, syntax_name, tag_key):
+        return f"syn_{syntax_name}_{tag_key.lower()}"
 
-    def schedule_highlight(self, delay=200):
+    def schedule_highlight(self, delay=None):
+        """Run `highlight` after `delay` ms (default: the adaptive delay)."""
+        if delay is None:
+            delay = self.debounce_delay()
         try:
             if self._after_id:
                 self.root.after_cancel(self._after_id)
@@ -211,54 +310,784 @@ class SyntaxHighlighter:
             pass
         self._after_id = self.root.after(delay, self.highlight)
 
+    def debounce_delay(self):
+        """Delay in ms `schedule_highlight` uses when none is given."""
+        if self._pass_ms is None:
+            return self.debounce_min_ms
+        delay = int(self._pass_ms * self.debounce_factor)
+        return max(self.debounce_min_ms, min(self.debounce_max_ms, delay))
+
+    def status(self):
+        """Return {'latency_ms', 'delay_ms', 'backlog'} for a status display.
+
+        `latency_ms` is the moving average of highlight() passes (None before
+        the first one) and `backlog` the number of lines still queued for or
+        being processed by the background fill.
+        """
+        backlog = self.pending_lines() + sum(b - a + 1 for a, b in self._inflight.values())
+        latency = round(self._pass_ms, 1) if self._pass_ms is not None else None
+        return {'latency_ms': latency, 'delay_ms': self.debounce_delay(), 'backlog': backlog}
+
+    def _notify_status(self):
+        if self.status_callback is None:
+            return
+        status = self.status()
+        if status == self._last_status:
+            return
+        self._last_status = status
+        try:
+            self.status_callback(status)
+        except Exception:
+            pass
+
+    def _on_edit(self, change):
+        """Record the lines touched by an insert/delete as dirty."""
+        first, last = change_lines(change)
+        self._dirty = _shift_ranges(self._dirty, change)
+        self._pending = _shift_ranges(self._pending, change)
+        self._generation += 1
+        if self._inflight:
+            # results for the old text will be dropped; queue those lines again
+            self._pending.extend(_shift_ranges(list(self._inflight.values()), change))
+            self._pending.sort()
+            self._inflight = {}
+        # the edited line still starts in the same state; the lines it now
+        # spans are unknown, and the ones after it keep theirs until re-lexed
+        i = change.line
+        if i <= len(self._states):
+            k = change.removed.count('\n')
+            self._states[i:i + k] = [None] * (last - first)
+        self._mark_dirty(first, last)
+
+    def _mark_dirty(self, first, last):
+        merged = []
+        for a, b in self._dirty:
+            if b + 1 < first or a > last + 1:
+                merged.append([a, b])
+            else:
+                first = min(first, a)
+                last = max(last, b)
+        merged.append([first, last])
+        merged.sort()
+        self._dirty = merged
+
     def highlight(self):
         self._after_id = None
         if not self._current:
             return
-        syn = self._syntaxes.get(self._current)
+        syn = self._lexer
         if not syn:
             return
 
         try:
-            content = self.text.get('1.0', 'end-1c')
+            nlines = int(self.text.index('end-1c').split('.')[0])
         except Exception:
             return
+        started = time.perf_counter()
+        deadline = started + self.fill_slice_ms / 1000.0
+
+        if self._full or not self.incremental:
+            self._full = False
+            self._dirty = [[1, nlines]]
+            self._pending = []
+            self._inflight = {}
+            self._states = [None] * nlines
+
+        dirty, self._dirty = self._dirty, []
+        queued = False
+        for first, last in dirty:
+            if first > nlines:
+                continue
+            last = min(last, nlines)
+            if self.viewport_first and (last - first >= self.lazy_threshold
+                                        or time.perf_counter() > deadline):
+                step = self.fill_block_lines
+                self._pending.extend([a, min(a + step - 1, last)] for a in range(first, last + 1, step))
+                queued = True
+            else:
+                self._highlight_lines(syn, first, last, deadline=deadline)
+
+        if queued:
+            self._pending.sort()
+            # color what is on screen now, leave the rest to the fill
+            for _ in range(self._promote_visible(nlines)):
+                first, last = self._pending.pop(0)
+                self._highlight_lines(syn, first, last)
+            self._schedule_fill()
 
-        # remove all current syntax tags
-        for token, _ in syn['regexes']:
+        elapsed = (time.perf_counter() - started) * 1000.0
+        if self._pass_ms is None:
+            self._pass_ms = elapsed
+        else:
+            self._pass_ms += self.latency_alpha * (elapsed - self._pass_ms)
+        self._notify_status()
+
+    def on_view_changed(self, *args):
+        """Call when the widget scrolls so queued visible lines go first."""
+        if not self._pending:
+            return
+        try:
+            nlines = int(self.text.index('end-1c').split('.')[0])
+        except Exception:
+            return
+        if self._promote_visible(nlines):
+            self._schedule_fill(0)
+
+    def pending_lines(self):
+        """Number of lines still waiting for the background fill."""
+        return sum(b - a + 1 for a, b in self._pending)
+
+    def _promote_visible(self, nlines):
+        """Move queued lines in or near the viewport to the front.
+
+        Returns the number of ranges now at the front of `_pending`.
+        """
+        try:
+            top, bottom = self.text.yview()
+        except Exception:
+            return 0
+        vfirst = max(1, int(float(top) * nlines) + 1 - self.viewport_margin)
+        vlast = min(nlines, int(float(bottom) * nlines) + 1 + self.viewport_margin)
+        front = []
+        rest = []
+        for a, b in self._pending:
+            if b < vfirst or a > vlast:
+                rest.append([a, b])
+                continue
+            if a < vfirst:
+                rest.append([a, vfirst - 1])
+            front.append([max(a, vfirst), min(b, vlast)])
+            if b > vlast:
+                rest.append([vlast + 1, b])
+        rest.sort()
+        self._pending = front + rest
+        return len(front)
+
+    def _schedule_fill(self, delay=1):
+        if self._fill_id:
             try:
-                self.text.tag_remove(self._tagname(self._current, token), '1.0', END)
+                self.root.after_cancel(self._fill_id)
             except Exception:
                 pass
+        self._fill_id = self.root.after(delay, self._fill_step)
 
-        # apply each regex in order
-        for token, pat in syn['regexes']:
-            if not pat:
-                continue
-            tagname = self._tagname(self._current, token)
+    def _cancel_fill(self):
+        self._pending = []
+        self._inflight = {}
+        self._generation += 1
+        if self._fill_id:
+            try:
+                self.root.after_cancel(self._fill_id)
+            except Exception:
+                pass
+        self._fill_id = None
+        self._notify_status()
+
+    def _fill_step(self):
+        """Highlight queued ranges until this slice's time budget runs out."""
+        self._fill_id = None
+        syn = self._lexer if self._current else None
+        if not syn:
+            self._pending = []
+            self._notify_status()
+            return
+        try:
+            nlines = int(self.text.index('end-1c').split('.')[0])
+        except Exception:
+            return
+        deadline = time.perf_counter() + self.fill_slice_ms / 1000.0
+        if self.threaded and self._start_worker():
+            self._drain_results(syn, nlines, deadline)
+            while self._pending and len(self._inflight) < self.max_inflight:
+                first, last = self._pending.pop(0)
+                if first <= nlines:
+                    self._submit(syn, first, min(last, nlines), nlines)
+            if self._pending or self._inflight:
+                self._schedule_fill(self.fill_poll_ms)
+        else:
+            while self._pending and time.perf_counter() < deadline:
+                first, last = self._pending.pop(0)
+                if first <= nlines:
+                    self._highlight_lines(syn, first, min(last, nlines), deadline=deadline)
+            if self._pending:
+                self._schedule_fill()
+        self._notify_status()
+
+    def _start_worker(self):
+        if self._worker is not None:
+            return True
+        try:
+            self._jobs = queue.Queue()
+            self._results = queue.Queue()
+            self._worker = threading.Thread(target=self._work, name='syntax-highlighter', daemon=True)
+            self._worker.start()
+        except Exception:
+            self._worker = None
+            self.threaded = False
+            return False
+        return True
+
+    def _work(self):
+        """Worker thread: tokenize snapshots, never touching Tk."""
+        jobs, results = self._jobs, self._results
+        while True:
+            job = jobs.get()
+            if job is None:
+                return
+            gen, key, syn, content, state = job
+            lexed = None
+            if gen == self._generation:
+                try:
+                    lexed = lex(syn, content, state)
+                except Exception:
+                    lexed = ([], [], NORMAL, False)
+            results.put((gen, key, state, lexed))
+
+    def _submit(self, syn, first, last, nlines):
+        """Snapshot lines first..last and hand them to the worker."""
+        first, last = self._widen(first, last)
+        content = self._region_text(first, last, nlines)
+        if content is None:
+            return
+        self._job_seq += 1
+        self._inflight[self._job_seq] = [first, last]
+        self._jobs.put((self._generation, self._job_seq, syn, content, self._state_at(first)))
+
+    def _drain_results(self, syn, nlines, deadline):
+        """Apply finished worker results until `deadline`."""
+        tagnames = self._tagnames(syn)
+        while time.perf_counter() < deadline:
             try:
-                # compile with multiline/dotall to honor most patterns in ini
-                regex = re.compile(pat, re.MULTILINE | re.DOTALL)
-            except re.error:
-                # invalid pattern: skip
+                gen, key, state, lexed = self._results.get_nowait()
+            except queue.Empty:
+                return
+            region = self._inflight.pop(key, None)
+            if region is None or gen != self._generation or lexed is None:
+                # taken before the latest edit; its lines were requeued
                 continue
+            first, last = region
+            spans, crossing, end_state, runs_past = lexed
+            if self._state_at(first) != state:
+                # another block has since changed the state this one starts
+                # in, so it was lexed from the wrong state: redo it
+                self._pending.insert(0, [first, last])
+                continue
+            if last < nlines and runs_past:
+                # a token runs past the block: lex it again with more lines
+                self._pending.insert(0, [first, min(nlines, last + max(8, last - first + 1))])
+                continue
+            if self._apply_spans(tagnames, first, last, spans, crossing, state, end_state, nlines):
+                # the following lines were lexed from another state
+                self._pending.insert(0, [last + 1, min(nlines, last + self.fill_block_lines)])
+
+    def _state_at(self, line):
+        """Cached lexer state at the start of `line` (unknown counts as normal)."""
+        if line - 1 < len(self._states):
+            return self._states[line - 1] or NORMAL
+        return NORMAL
+
+    def _highlight_lines(self, syn, first, last, widen=True, deadline=None):
+        """Re-lex lines first..last (inclusive) and replace their tags.
+
+        Lexing carries on past `last` while the state it ends in differs
+        from the cached state of the next line. Once more than
+        `lazy_threshold` lines have been done that way, or `deadline` has
+        passed (and `viewport_first` is on), the rest is left to the
+        background fill.
+        """
+        tagnames = self._tagnames(syn)
+        try:
+            nlines = int(self.text.index('end-1c').split('.')[0])
+        except Exception:
+            return
+        if widen:
+            first, last = self._widen(first, last)
+        state = self._state_at(first)
+        done = 0
+
+        while True:
+            while True:
+                content = self._region_text(first, last, nlines)
+                if content is None:
+                    return
+                spans, crossing, end_state, runs_past = lex(syn, content, state)
+                # a token running into the end of the region may continue past it
+                if last < nlines and runs_past:
+                    last = min(nlines, last + max(8, last - first + 1))
+                    continue
+                break
+            whole = first == 1 and last == nlines
+            if whole and self.incremental and syn is self._syntaxes.get(self._current):
+                # the whole buffer, lexed with every token class: keep it as
+                # this generation's token stream
+                self._streams.put(syn, self._generation, content, spans)
+            if not self._apply_spans(tagnames, first, last, spans, crossing, state, end_state, nlines):
+                return
+            done += last - first + 1
+            first, last = last + 1, min(nlines, last + max(8, last - first + 1))
+            state = end_state
+            if self.viewport_first and (done >= self.lazy_threshold or (
+                    deadline is not None and time.perf_counter() > deadline)):
+                self._pending.insert(0, [first, last])
+                self._schedule_fill()
+                return
+
+    def _widen(self, first, last):
+        """Move `first` back to a line where lexing can start."""
+        states = self._states
+        while first > 1 and first - 1 < len(states) and states[first - 1] == INSIDE:
+            first -= 1
+        return first, last
+
+    def _tagnames(self, syn):
+        return list(dict.fromkeys(self._tag_of.values()))
+
+    def _region_text(self, first, last, nlines):
+        end = f'{last + 1}.0' if last < nlines else 'end-1c'
+        try:
+            return self.text.get(f'{first}.0', end)
+        except Exception:
+            return None
+
+    def _apply_spans(self, tagnames, first, last, spans, crossing, state, end_state, nlines):
+        """Make the syntax tags on lines first..last match `spans`.
+
+        Also records the state every line of the region starts in. Returns
+        True if the line after the region had been lexed from a state other
+        than `end_state`, i.e. lexing has to go on.
+        """
+        lines = line_index_for(self.text)
+        base = lines.offset(first)
+        limit = lines.offset(last + 1) if last < nlines else lines.total
+        diverged = self._store_states(lines, base, first, last, crossing, state, end_state, nlines)
+
+        # merged [start, end] offsets per tag, in buffer coordinates
+        wanted = {}
+        tag_of = self._tag_of
+        for token, start_off, end_off in spans:
+            tagname = tag_of.get(token)
+            if tagname is None:
+                continue
+            ranges = wanted.setdefault(tagname, [])
+            start_off += base
+            end_off += base
+            if ranges and start_off <= ranges[-1][1]:
+                ranges[-1][1] = max(ranges[-1][1], end_off)
+            else:
+                ranges.append([start_off, end_off])
+
+        # apply only the difference to what is already tagged, one multi-range
+        # tag_remove/tag_add per tag
+        whole = (last - first + 1) * 2 >= nlines
+        for tagname in tagnames:
+            want = wanted.get(tagname, [])
+            have = self._applied_ranges(tagname, lines, base, limit, whole)
+            stale = _subtract_ranges(have, want)
+            fresh = _subtract_ranges(want, have)
             try:
-                for m in regex.finditer(content):
-                    try:
-                        start_off = m.start()
-                        end_off = m.end()
-                        sidx = f'1.0 + {start_off}c'
-                        eidx = f'1.0 + {end_off}c'
-                        self.text.tag_add(tagname, sidx, eidx)
-                    except Exception:
-                        # if indexes fail, try using index arithmetic from spans
-                        pass
+                if stale:
+                    self.text.tag_remove(tagname, *_range_indices(lines, stale))
+                if fresh:
+                    self.text.tag_add(tagname, *_range_indices(lines, fresh))
             except Exception:
-                # runtime error while iterating matches
-                continue
+                pass
+        return diverged
+
+    def _store_states(self, lines, base, first, last, crossing, state, end_state, nlines):
+        states = self._states
+        if len(states) < nlines:
+            states.extend([None] * (nlines - len(states)))
+        states[first - 1] = state
+        states[first:last] = [NORMAL] * (last - first)
+        for start_off, end_off, inner in crossing:
+            # lines whose start lies strictly inside the token
+            a = lines.line_col(base + start_off)[0]
+            b, col = lines.line_col(base + end_off)
+            if col == 0:
+                b -= 1
+            b = min(b, last)
+            if a < b:
+                states[a:b] = [inner] * (b - a)
+        if last >= nlines:
+            return False
+        previous = states[last]
+        states[last] = end_state
+        return previous is not None and previous != end_state
+
+    def _applied_ranges(self, tagname, lines, lo, hi, whole):
+        """Return the ranges of `tagname` clipped to offsets lo..hi.
+
+        With `whole` the ranges of the entire buffer are fetched in one call;
+        otherwise only the ranges overlapping lo..hi are walked.
+        """
+        pairs = []
+        try:
+            if whole:
+                flat = self.text.tag_ranges(tagname)
+                pairs = list(zip(flat[0::2], flat[1::2]))
+            else:
+                start = lines.index(lo)
+                end = lines.index(hi)
+                prev = self.text.tag_prevrange(tagname, start)
+                if prev:
+                    pairs.append(prev)
+                idx = start
+                while True:
+                    r = self.text.tag_nextrange(tagname, idx, end)
+                    if not r:
+                        break
+                    pairs.append(r)
+                    idx = r[1]
+        except Exception:
+            return []
+        out = []
+        for a, b in pairs:
+            s = max(lo, lines.offset(*map(int, str(a).split('.'))))
+            e = min(hi, lines.offset(*map(int, str(b).split('.'))))
+            if s < e:
+                out.append([s, e])
+        return out
 
     def set_syntax_for_file(self, filepath):
-        name = self.get_syntax_for_file(filepath)
+        name = self.detect_syntax(filepath)
         if name:
             self.set_syntax(name)
         return name
+
+    def detect_syntax(self, filepath=None, content=None):
+        """Pick the syntax for `content` (default: the buffer) and `filepath`.
+
+        Each syntax's detect.* entries are scored against a bounded sample of
+        the text (the first `detect_head_chars` plus `detect_chunks` strided
+        pieces). Among syntaxes whose detect.regex matches the sample the
+        highest detect.priority wins, then one matching the extension of
+        `filepath`, then the higher score; with no content match the
+        extension alone decides. Verdicts are memoized by a hash of the
+        sample.
+        """
+        ext = os.path.splitext(filepath or '')[1].lstrip('.').lower()
+        try:
+            if content is None:
+                lines = line_index_for(self.text)
+                sample = _detection_sample(
+                    lines.total, lambda a, b: self.text.get(lines.index(a), lines.index(b)),
+                    self.detect_head_chars, self.detect_chunks, self.detect_chunk_chars)
+            else:
+                sample = _detection_sample(
+                    len(content), lambda a, b: content[a:b],
+                    self.detect_head_chars, self.detect_chunks, self.detect_chunk_chars)
+        except Exception:
+            return self.get_syntax_for_file(filepath)
+
+        key = (hashlib.blake2b(sample.encode('utf-8', 'surrogatepass'), digest_size=16).digest(), ext)
+        if key in self._detect_memo:
+            return self._detect_memo[key]
+
+        best = None
+        lowered = sample.lower()
+        if sample.strip():
+            for name, syn in self._syntaxes.items():
+                score = _score_detector(syn['detector'], sample, lowered)
+                if score is None:
+                    continue
+                ext_match = bool(ext) and ext in syn.get('exts', [])
+                rank = (syn['detector']['priority'], ext_match, score)
+                if best is None or rank > best[0]:
+                    best = (rank, name)
+        # no content evidence: fall back to the extension alone
+        name = best[1] if best else self.get_syntax_for_file(filepath)
+
+        if len(self._detect_memo) >= 64:
+            self._detect_memo.pop(next(iter(self._detect_memo)))
+        self._detect_memo[key] = name
+        return name
+
+    def word_classes(self, name=None):
+        """Return {token: frozenset(words)} of a syntax's CSV word lists.
+
+        This is the lookup identifiers are classified with, for consumers
+        such as the validator or autocomplete.
+        """
+        syn = self._syntaxes.get(name or self._current)
+        return dict(syn['word_sets']) if syn else {}
+
+    def word_token(self, word, name=None):
+        """Return the token class (e.g. 'KEYWORD') of `word`, or None."""
+        syn = self._syntaxes.get(name or self._current)
+        return syn['words'].get(word) if syn else None
+
+    def rejected_patterns(self, name=None):
+        """Return [(token, reason)] for patterns of a syntax that were not used."""
+        syn = self._syntaxes.get(name or self._current)
+        return list(syn['rejected']) if syn else []
+
+    def pattern_timings(self, name=None):
+        """Return {token: compile seconds} for a syntax (default: current)."""
+        syn = self._syntaxes.get(name or self._current)
+        return dict(syn['timings']) if syn else {}
+
+    def profile_patterns(self, content=None, name=None):
+        """Time each token pattern separately over `content` (default: buffer).
+
+        See the module-level `profile_patterns` for the returned rows.
+        """
+        syn = self._syntaxes.get(name or self._current)
+        if not syn:
+            return []
+        if content is None:
+            content = self.text.get('1.0', 'end-1c')
+        return profile_patterns(syn, content)
+
+
+def load_syntaxes(syntax_dir, previous=None, use_cache=True):
+    """Load every .ini in `syntax_dir`; return ({name: syntax}, stats).
+
+    `previous` is an earlier result: syntaxes whose file has the same mtime
+    and size are reused as they are. Other files come from the on-disk
+    cache of parsed definitions when it has a current entry, and are parsed
+    (and the cache updated) otherwise. Patterns are compiled for every
+    syntax not reused, unless only its tag.* colors, name, extensions or
+    detect.* entries changed: the new record then shares the compiled
+    patterns of the previous one ("restyled"). `stats` counts files per
+    source and the time spent.
+    """
+    t0 = time.perf_counter()
+    stats = {'files': 0, 'reused': 0, 'restyled': 0, 'cached': 0, 'parsed': 0, 'seconds': 0.0}
+    syntaxes = {}
+    if not os.path.isdir(syntax_dir):
+        return syntaxes, stats
+
+    reusable = {syn['file']: syn for syn in (previous or {}).values()}
+    cache = _read_syntax_cache() if use_cache else {}
+    cache_dirty = False
+    seen = set()
+    for fn in sorted(os.listdir(syntax_dir)):
+        if not fn.lower().endswith('.ini'):
+            continue
+        path = os.path.abspath(os.path.join(syntax_dir, fn))
+        try:
+            st = os.stat(path)
+        except OSError:
+            continue
+        stamp = (st.st_mtime_ns, st.st_size)
+        seen.add(path)
+        stats['files'] += 1
+
+        syn = reusable.get(path)
+        if syn is not None and syn.get('stamp') == stamp:
+            syntaxes[syn['name']] = syn
+            stats['reused'] += 1
+            continue
+
+        entry = cache.get(path)
+        if entry is not None and entry[0] == stamp:
+            parsed = entry[1]
+            stats['cached'] += 1
+        else:
+            try:
+                parsed = parse_syntax_file(path)
+            except Exception:
+                # ignore file parse errors
+                parsed = None
+            if parsed is None:
+                continue
+            cache[path] = (stamp, parsed)
+            cache_dirty = True
+            stats['parsed'] += 1
+
+        try:
+            if syn is not None and same_lexing(syn, parsed):
+                syn = restyle_syntax(fn, syn, parsed)
+                stats['restyled'] += 1
+            else:
+                syn = build_syntax(fn, path, parsed)
+        except Exception:
+            continue
+        syn['stamp'] = stamp
+        syntaxes[syn['name']] = syn
+
+    if use_cache:
+        # forget entries for files removed from this directory
+        folder = os.path.abspath(syntax_dir)
+        for path in list(cache):
+            if os.path.dirname(path) == folder and path not in seen:
+                del cache[path]
+                cache_dirty = True
+        if cache_dirty:
+            _write_syntax_cache(cache)
+    stats['seconds'] = time.perf_counter() - t0
+    if os.environ.get('SYNTAX_DEBUG'):
+        print(f"[SYNTAX_DEBUG] load stats: {stats}")
+    return syntaxes, stats
+
+
+# parsed (not compiled) syntax definitions, keyed by absolute .ini path
+_SYNTAX_CACHE_VERSION = 3
+_SYNTAX_CACHE_FILE = os.path.join(os.path.expanduser('~'), '.balrognpc', 'syntax_cache.pickle')
+
+
+def _dir_stamps(syntax_dir):
+    """Return {file name: (mtime_ns, size)} of the .ini files in `syntax_dir`."""
+    stamps = {}
+    try:
+        with os.scandir(syntax_dir) as it:
+            for entry in it:
+                if entry.name.lower().endswith('.ini'):
+                    st = entry.stat()
+                    stamps[entry.name] = (st.st_mtime_ns, st.st_size)
+    except OSError:
+        pass
+    return stamps
+
+
+def _read_syntax_cache():
+    """Return {path: ((mtime_ns, size), parsed)} or {} if missing or stale."""
+    try:
+        with open(_SYNTAX_CACHE_FILE, 'rb') as f:
+            data = pickle.load(f)
+        if data.get('version') == _SYNTAX_CACHE_VERSION:
+            return data['entries']
+    except Exception:
+        pass
+    return {}
+
+
+def _write_syntax_cache(entries):
+    try:
+        os.makedirs(os.path.dirname(_SYNTAX_CACHE_FILE), exist_ok=True)
+        tmp = _SYNTAX_CACHE_FILE + '.tmp'
+        with open(tmp, 'wb') as f:
+            pickle.dump({'version': _SYNTAX_CACHE_VERSION, 'entries': entries}, f,
+                        protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, _SYNTAX_CACHE_FILE)
+    except Exception as e:
+        print(f"[WARNING] Could not write syntax cache: {e}")
+
+
+def _score_detector(det, sample, lowered):
+    """Return how strongly `sample` looks like a syntax, or None if not at all."""
+    score = 0
+    if det['regex'] is not None:
+        for m in det['regex'].finditer(sample):
+            score += 1
+            # lookahead-only detectors match the empty string everywhere
+            if score >= 50 or m.start() == m.end():
+                break
+        if not score:
+            return None
+    if det['words'] is not None:
+        score += 2 * len({m.group(0).lower() for m in det['words'].finditer(sample)})
+    score += 5 * sum(1 for c in det['contains'] if c in lowered)
+    if det['regex'] is None and not score:
+        return None
+    return score
+
+
+def _detection_sample(length, read, head, chunks, size):
+    """Read the first `head` chars plus `chunks` strided pieces of `size`.
+
+    `read(start, end)` returns that slice of the text. Strided pieces are
+    trimmed to whole lines so line-anchored detectors see real line starts.
+    """
+    if length <= head + chunks * size:
+        return read(0, length)
+    parts = [read(0, head)]
+    stride = (length - head) // chunks
+    for i in range(chunks):
+        start = head + i * stride + max(0, (stride - size) // 2)
+        piece = read(start, min(length, start + size))
+        piece = piece[piece.find('\n') + 1:piece.rfind('\n') + 1]
+        if piece:
+            parts.append(piece)
+    return '\n'.join(parts)
+
+
+def profile_patterns(syn, content):
+    """Time each compiled token pattern of `syn` on its own over `content`.
+
+    Returns a list of dicts (token, compile, match, matches), slowest match
+    first, so the expensive `regex.*_RE` line of an .ini stands out.
+    """
+    timings = syn.get('timings', {})
+    rows = []
+    for token, body, regex in syn.get('compiled', []):
+        if regex is None:
+            regex = re.compile(body, re.MULTILINE)
+        t0 = time.perf_counter()
+        count = 0
+        for _m in regex.finditer(content):
+            count += 1
+        rows.append({
+            'token': token,
+            'compile': timings.get(token, 0.0),
+            'match': time.perf_counter() - t0,
+            'matches': count,
+        })
+    words = syn.get('words')
+    if words:
+        # the identifier pass with its dict lookups, covering every CSV list
+        t0 = time.perf_counter()
+        count = 0
+        for m in IDENT_RE.finditer(content):
+            if m.group() in words:
+                count += 1
+        rows.append({'token': '(word lists)', 'compile': 0.0,
+                     'match': time.perf_counter() - t0, 'matches': count})
+    rows.sort(key=lambda r: r['match'], reverse=True)
+    return rows
+
+
+def _subtract_ranges(ranges, other):
+    """Return the parts of sorted, disjoint `ranges` not covered by `other`."""
+    out = []
+    j = 0
+    for start, end in ranges:
+        while j < len(other) and other[j][1] <= start:
+            j += 1
+        k = j
+        while start < end and k < len(other) and other[k][0] < end:
+            if other[k][0] > start:
+                out.append([start, other[k][0]])
+            start = max(start, other[k][1])
+            k += 1
+        if start < end:
+            out.append([start, end])
+    return out
+
+
+def _range_indices(lines, ranges):
+    """Flatten offset ranges into Tk index arguments for tag_add/tag_remove."""
+    args = []
+    for start, end in ranges:
+        args.append(lines.index(start))
+        args.append(lines.index(end))
+    return args
+
+
+def _shift_ranges(ranges, change):
+    """Move [first, last] line ranges to where `change` left their lines."""
+    first, last = change_lines(change)
+    removed_lines = change.removed.count('\n')
+    delta = (last - first) - removed_lines
+    shifted = []
+    for a, b in ranges:
+        if b < first:
+            shifted.append([a, b])
+        elif a > first + removed_lines:
+            shifted.append([a + delta, b + delta])
+        else:
+            shifted.append([min(a, first), max(first, b + delta)])
+    return shifted
+
+
+if __name__ == '__main__':
+    # Time syntax loading, e.g. to compare startup with and without the cache:
+    #   python syntax_highlighter.py [--no-cache] [syntax_dir]
+    import sys
+    args = sys.argv[1:]
+    use_cache = '--no-cache' not in args
+    args = [a for a in args if a != '--no-cache']
+    folder = args[0] if args else os.path.join(os.path.dirname(os.path.abspath(__file__)), 'syntax')
+    loaded, stats = load_syntaxes(folder, use_cache=use_cache)
+    print(f"{len(loaded)} syntaxes in {stats['seconds'] * 1000:.1f} ms "
+          f"(parsed {stats['parsed']}, from cache {stats['cached']})")
@@ -0,0 +1,273 @@
+"""Turn text into typed tokens using the syntax definitions in `syntax/`.
+
+Nothing here touches Tk: the functions take a syntax record (as built by
+`syntax_defs.build_syntax`, which `load_syntax` and the highlighter's
+`load_syntaxes` both use) and a string. `lex` lexes any piece of
+a document given the lexer state its first line starts in, which is what
+the highlighter re-lexes edited line ranges with; `tokenize` and
+`TokenStream` give the tokens of a whole text.
+
+`TokenCache` keeps the stream of one buffer per edit generation, so the
+highlighter, the script validator and anything else that wants tokens
+(outlines, symbol lists) share one lexing of each version of the text.
+"""
+
+import os
+from bisect import bisect_right
+from collections import namedtuple
+
+from line_index import LineIndex
+from syntax_defs import build_syntax, parse_syntax_file
+
+
+# Lexer state at the start of a line: outside every token, or inside a
+# multi-line token that cannot be resumed there, so lexing has to start from
+# an earlier line. Inside the k-th entry of syn['blocks'] (a block comment,
+# say) the state is k + 1 and lexing can resume at the line itself.
+NORMAL = 0
+INSIDE = -1
+
+# `type` is the token class of the syntax file (STRING, COMMENT, BUILTIN...),
+# start/end are offsets into the tokenized text.
+Token = namedtuple('Token', 'type start end')
+
+
+def scan(syn, content, pos=0):
+    """Yield non-overlapping (token, start, end) spans in one pass."""
+    scanner = syn.get('scanner')
+    if scanner is None:
+        return
+    names = syn['scan_names']
+    words = syn['words']
+    for m in scanner.finditer(content, pos):
+        token = names[m.lastgroup]
+        if token is None:
+            # identifier: keyword/builtin only if it is in a word list
+            token = words.get(m.group())
+            if token is None:
+                continue
+        yield token, m.start(), m.end()
+
+
+def lex(syn, content, state=NORMAL):
+    """Lex `content`, which starts in lexer `state`.
+
+    Returns (spans, crossing, end_state, runs_past): the (token, start, end)
+    spans; a (start, end, state) triple for every span containing a line
+    start, with the state such a line starts in; the state at the end of
+    `content`; and whether a token that cannot be resumed reaches the end,
+    so it may continue past it.
+
+    Starting inside a block the text up to its closer belongs to it. A block
+    opener such as `/*` with no closer in `content` opens a token running to
+    the end, which the next lines resume.
+    """
+    blocks = syn.get('blocks', ())
+    spans = []
+    pos = 0
+    end_state = NORMAL
+    if state > NORMAL:
+        token, _opener, closer = blocks[state - 1]
+        end = content.find(closer)
+        if end < 0:
+            pos = len(content)
+            end_state = state
+        else:
+            pos = end + len(closer)
+        spans.append((token, 0, pos))
+    if pos < len(content):
+        spans.extend(scan(syn, content, pos))
+        opened = _open_block(blocks, content, spans, pos)
+        if opened is not None:
+            start, end_state = opened
+            while spans and spans[-1][1] >= start:
+                spans.pop()
+            spans.append((blocks[end_state - 1][0], start, len(content)))
+
+    crossing = []
+    for i, (token, start, end) in enumerate(spans):
+        if end_state > NORMAL and i == len(spans) - 1:
+            # the token left open also covers a line starting at the very end
+            end += 1
+        if content.find('\n', start, end - 1) < 0:
+            continue
+        inner = INSIDE
+        if start == 0 and state > NORMAL:
+            inner = state
+        else:
+            for k, (tok, opener, _closer) in enumerate(blocks, 1):
+                if tok == token and content.startswith(opener, start):
+                    inner = k
+                    break
+        crossing.append((start, end, inner))
+    runs_past = end_state == NORMAL and bool(spans) and spans[-1][2] >= len(content)
+    return spans, crossing, end_state, runs_past
+
+
+def _open_block(blocks, content, spans, pos):
+    """Return (offset, state) of the first block opener outside every span.
+
+    Such an opener has no closer after it in `content`.
+    """
+    best = None
+    starts = None
+    for k, (_token, opener, _closer) in enumerate(blocks, 1):
+        at = content.find(opener, pos)
+        while at >= 0 and (best is None or at < best[0]):
+            if starts is None:
+                starts = [start for _, start, _ in spans]
+            i = bisect_right(starts, at) - 1
+            if i < 0 or spans[i][2] <= at:
+                best = (at, k)
+                break
+            at = content.find(opener, spans[i][2])
+    return best
+
+
+def tokenize(syn, content, state=NORMAL):
+    """Return the `Token`s of `content`, which starts in lexer `state`."""
+    return [Token._make(span) for span in lex(syn, content, state)[0]]
+
+
+class TokenStream:
+    """The tokens of one text, with line lookups for consumers."""
+
+    def __init__(self, syn, content, tokens=None, generation=None):
+        self.syntax = syn
+        self.name = syn.get('name')
+        self.content = content
+        self.generation = generation
+        self.tokens = tokenize(syn, content) if tokens is None else tokens
+        self._lines = None
+        self._starts = None
+
+    @property
+    def lines(self):
+        """`LineIndex` of the text, built on first use."""
+        if self._lines is None:
+            self._lines = LineIndex(self.content)
+        return self._lines
+
+    def text(self, token):
+        return self.content[token.start:token.end]
+
+    def line_of(self, token):
+        """1-based line a token starts on."""
+        return self.lines.line_col(token.start)[0]
+
+    def of_type(self, *types):
+        """Yield the tokens whose type is one of `types`."""
+        for token in self.tokens:
+            if token.type in types:
+                yield token
+
+    def on_lines(self, first, last=None):
+        """Return the tokens overlapping lines first..last (default: first)."""
+        if last is None:
+            last = first
+        lines = self.lines
+        lo = lines.offset(first)
+        hi = lines.offset(last + 1) if last < len(lines) else lines.total
+        if self._starts is None:
+            self._starts = [t.start for t in self.tokens]
+        i = max(0, bisect_right(self._starts, lo) - 1)
+        out = []
+        for token in self.tokens[i:]:
+            if token.start >= hi and token.start > lo:
+                break
+            if token.end > lo or token.start == lo:
+                out.append(token)
+        return out
+
+    def covered_lines(self, *types):
+        """Return the numbers of non-blank lines made up only of `types`.
+
+        With ('COMMENT',) these are the lines holding nothing but comments.
+        """
+        content = self.content
+        pieces = []
+        pos = 0
+        for token in self.of_type(*types):
+            if token.start < pos:
+                continue
+            pieces.append(content[pos:token.start])
+            # keep the newlines so the lines still line up
+            pieces.append('\n' * content.count('\n', token.start, token.end))
+            pos = token.end
+        pieces.append(content[pos:])
+        rest = ''.join(pieces).split('\n')
+        return {num for num, (line, left) in enumerate(zip(content.split('\n'), rest), 1)
+                if line.strip() and not left.strip()}
+
+    def word_classes(self):
+        """{token: frozenset(words)} of the CSV word lists of the syntax."""
+        return dict(self.syntax.get('word_sets', {}))
+
+
+class TokenCache:
+    """Token streams of one buffer, one per (syntax, generation).
+
+    `generation` is any value that changes whenever the text does (the
+    highlighter's edit counter). Pass None when there is no such counter;
+    the text is then read every time and compared with the cached one.
+    """
+
+    max_streams = 4
+
+    def __init__(self):
+        self._streams = {}
+
+    def get(self, syn, generation, read):
+        """Return the `TokenStream` of the text `read()` returns."""
+        key = (id(syn), generation)
+        stream = self._streams.get(key)
+        if stream is not None and stream.syntax is syn:
+            if generation is not None:
+                return stream
+            content = read()
+            if content == stream.content:
+                return stream
+        else:
+            content = read()
+        return self._put(key, TokenStream(syn, content, generation=generation))
+
+    def put(self, syn, generation, content, spans):
+        """Record `spans` that were lexed from the whole text elsewhere."""
+        if generation is None:
+            return None
+        stream = TokenStream(syn, content, [Token._make(s) for s in spans], generation)
+        return self._put((id(syn), generation), stream)
+
+    def clear(self):
+        self._streams = {}
+
+    def retarget(self, old, new):
+        """Hand the streams of syntax `old` to `new`, which lexes the same."""
+        for key, stream in list(self._streams.items()):
+            if stream.syntax is old:
+                del self._streams[key]
+                stream.syntax = new
+                stream.name = new.get('name')
+                self._streams[(id(new), key[1])] = stream
+
+    def _put(self, key, stream):
+        if key not in self._streams and len(self._streams) >= self.max_streams:
+            self._streams.pop(next(iter(self._streams)))
+        self._streams[key] = stream
+        return stream
+
+
+def load_syntax(path):
+    """Load and compile the single syntax file `path` (None if unusable)."""
+    parsed = parse_syntax_file(path)
+    if not parsed:
+        return None
+    return build_syntax(os.path.basename(path), path, parsed)
+
+
+def tokenize_text(content, path):
+    """Return the `TokenStream` of `content` under the syntax file `path`."""
+    syn = load_syntax(path)
+    if syn is None:
+        return None
+    return TokenStream(syn, content)
@@ -0,0 +1,119 @@
+"""Tab strip for the open documents, drawn on a single Canvas.
+
+A ttk.Notebook wants a child widget per page, which is what the editor
+avoids (see documents). `TabBar` only draws a label and a close mark per
+tab, so thirty open files cost thirty pairs of canvas items and nothing
+else. When the tabs are wider than the window the strip scrolls to keep
+the active one in view; the mouse wheel scrolls it too.
+"""
+
+from tkinter import Canvas
+from tkinter import font as tkfont
+
+
+class TabBar(Canvas):
+    """Row of tabs; `set_tabs` says what to show.
+
+    `on_select(key)` is called when a tab is clicked and `on_close(key)`
+    when its close mark is clicked or it is middle-clicked.
+    """
+
+    padx = 8
+    close_text = '×'
+
+    def __init__(self, master, on_select=None, on_close=None, font='TkDefaultFont',
+                 bg='#dcdcdc', tab_bg='#ececec', active_bg='#ffffff', fg='#333333', **kw):
+        kw.setdefault('highlightthickness', 0)
+        kw.setdefault('bd', 0)
+        kw.setdefault('takefocus', 0)
+        self._font = tkfont.Font(root=master, font=font)
+        kw.setdefault('height', self._font.metrics('linespace') + 8)
+        super().__init__(master, bg=bg, **kw)
+        self.on_select = on_select
+        self.on_close = on_close
+        self.tab_bg = tab_bg
+        self.active_bg = active_bg
+        self.fg = fg
+        self._tabs = []     # (key, label)
+        self._active = None
+        self._spans = []    # (x0, x1, close_x0, key) in unscrolled coordinates
+        self._offset = 0
+        self._key = None
+        self.bind('<Button-1>', self._on_click)
+        self.bind('<Button-2>', self._on_middle_click)
+        self.bind('<MouseWheel>', lambda e: self._scroll(-1 if e.delta > 0 else 1))
+        self.bind('<Button-4>', lambda e: self._scroll(-1))
+        self.bind('<Button-5>', lambda e: self._scroll(1))
+        self.bind('<Configure>', lambda e: self.redraw(force=True))
+
+    def set_tabs(self, tabs, active):
+        """Show `tabs`, a list of (key, label), with `active` the selected key."""
+        self._tabs = list(tabs)
+        self._active = active
+        self.redraw()
+
+    def redraw(self, force=False):
+        """Lay the tabs out and draw them, scrolled to show the active one."""
+        key = (tuple(self._tabs), self._active, self.winfo_width())
+        if key == self._key and not force:
+            return
+        self._key = key
+        self._layout()
+        for x0, x1, _, tab in self._spans:
+            if tab == self._active:
+                if x0 < self._offset:
+                    self._offset = x0
+                elif x1 > self._offset + self.winfo_width():
+                    self._offset = x1 - self.winfo_width()
+                break
+        self._paint()
+
+    def _layout(self):
+        self._spans = []
+        x = 0
+        close_w = self._font.measure(self.close_text)
+        for tab, label in self._tabs:
+            width = self._font.measure(label) + close_w + 3 * self.padx
+            self._spans.append((x, x + width, x + width - close_w - self.padx, tab))
+            x += width + 1
+
+    def _paint(self):
+        total = self._spans[-1][1] if self._spans else 0
+        self._offset = max(0, min(self._offset, total - self.winfo_width()))
+        self.delete('all')
+        height = int(self.cget('height'))
+        y = height // 2 + 1
+        for (x0, x1, close_x0, tab), (_, label) in zip(self._spans, self._tabs):
+            x0 -= self._offset
+            active = tab == self._active
+            self.create_rectangle(x0, 2 if active else 4, x1 - self._offset, height, width=0,
+                                  fill=self.active_bg if active else self.tab_bg)
+            self.create_text(x0 + self.padx, y, anchor='w', text=label,
+                             font=self._font, fill=self.fg)
+            self.create_text(close_x0 - self._offset, y, anchor='w', text=self.close_text,
+                             font=self._font, fill=self.fg)
+
+    def _scroll(self, direction):
+        # scrolling by hand may hide the active tab; it comes back on the next change
+        self._offset += direction * 60
+        self._paint()
+
+    def _hit(self, x):
+        x += self._offset
+        for x0, x1, close_x0, tab in self._spans:
+            if x0 <= x < x1:
+                return tab, x >= close_x0
+        return None, False
+
+    def _on_click(self, event):
+        tab, close = self._hit(event.x)
+        if tab is None:
+            return
+        callback = self.on_close if close else self.on_select
+        if callback:
+            callback(tab)
+
+    def _on_middle_click(self, event):
+        tab, _ = self._hit(event.x)
+        if tab is not None and self.on_close:
+            self.on_close(tab)
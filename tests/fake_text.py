@@ -0,0 +1,243 @@
+"""A string-backed stand-in for a Tk Text widget.
+
+Only what the modules under test use is implemented: index (line.col,
+end, line.end and +/- Nc offsets), compare, get, insert, delete (with
+several ranges, the way Tk does it) and replace; tags, kept per
+character; and after/after_idle timers, which run only when the test
+calls `run_timers`.
+"""
+
+import re
+
+
+class FakeTk:
+    def __init__(self):
+        self.commands = {}
+
+    def call(self, *args):
+        if len(args) == 1 and isinstance(args[0], tuple):
+            args = args[0]
+        if args[0] == 'rename':
+            self.commands[args[2]] = self.commands.pop(args[1])
+            return ''
+        return self.commands[args[0]](*args[1:])
+
+    def createcommand(self, name, fn):
+        self.commands[name] = fn
+
+
+class FakeText:
+    _count = 0
+
+    def __init__(self, content=''):
+        FakeText._count += 1
+        self._w = f'.text{FakeText._count}'
+        self._tclCommands = None
+        self.tk = FakeTk()
+        self.tk.createcommand(self._w, self._command)
+        self.s = content + '\n'
+        self.tags = [set() for _ in self.s]  # tag names of every character
+        self.tag_config = {}
+        self.timers = {}
+        self._timer_seq = 0
+        self.view = (0.0, 1.0)
+
+    # the tkinter methods used by the modules under test
+    def insert(self, index, chars, *args):
+        return self.tk.call(self._w, 'insert', index, chars, *args)
+
+    def delete(self, *indices):
+        return self.tk.call(self._w, 'delete', *indices)
+
+    def get(self, start, end=None):
+        return self.tk.call(self._w, 'get', start, *([end] if end else []))
+
+    def index(self, index):
+        return self.tk.call(self._w, 'index', index)
+
+    def tag_add(self, tag, *indices):
+        return self.tk.call(self._w, 'tag', 'add', tag, *indices)
+
+    def tag_remove(self, tag, *indices):
+        return self.tk.call(self._w, 'tag', 'remove', tag, *indices)
+
+    def tag_ranges(self, tag):
+        return self.tk.call(self._w, 'tag', 'ranges', tag)
+
+    def tag_nextrange(self, tag, index1, index2=None):
+        return self.tk.call(self._w, 'tag', 'nextrange', tag, index1, *([index2] if index2 else []))
+
+    def tag_prevrange(self, tag, index1, index2=None):
+        return self.tk.call(self._w, 'tag', 'prevrange', tag, index1, *([index2] if index2 else []))
+
+    def tag_configure(self, tag, **kw):
+        self.tag_config.setdefault(tag, {}).update(kw)
+
+    def winfo_toplevel(self):
+        return self
+
+    def yview(self, *args):
+        return self.view
+
+    def after(self, ms, fn):
+        self._timer_seq += 1
+        key = f'after#{self._timer_seq}'
+        self.timers[key] = fn
+        return key
+
+    def after_idle(self, fn):
+        return self.after(0, fn)
+
+    def after_cancel(self, key):
+        self.timers.pop(key, None)
+
+    def run_timers(self, limit=10000):
+        """Run pending after/after_idle callbacks, oldest first, until none are left."""
+        for _ in range(limit):
+            if not self.timers:
+                return
+            self.timers.pop(next(iter(self.timers)))()
+        raise AssertionError('timers keep rescheduling')
+
+    # what tests look at
+
+    def text(self):
+        return self.s[:-1]
+
+    def tagged(self, tag):
+        """Return the (start, end) character offsets of the ranges of `tag`."""
+        runs = []
+        for i, names in enumerate(self.tags):
+            if tag in names:
+                if runs and runs[-1][1] == i:
+                    runs[-1][1] = i + 1
+                else:
+                    runs.append([i, i + 1])
+        return [tuple(r) for r in runs]
+
+    def tags_at(self, offset):
+        return self.tags[offset]
+
+    # -- Tcl side ----------------------------------------------------------------
+
+    def _command(self, op, *args):
+        return getattr(self, '_cmd_' + op)(*args)
+
+    def _offset(self, index):
+        index = str(index).strip()
+        m = re.match(r'^(.*?)\s*([+-])\s*(\d+)\s*(?:c|chars)$', index)
+        if m:
+            off = self._offset(m.group(1)) + int(m.group(3)) * (1 if m.group(2) == '+' else -1)
+            return max(0, min(off, len(self.s)))
+        if index == 'end':
+            # Tk's `end` is the position after the final newline
+            return len(self.s)
+        m = re.match(r'^(\d+)\.(\d+|end)$', index)
+        lines = self.s[:-1].split('\n')
+        line = int(m.group(1))
+        if line > len(lines):
+            return len(self.s)
+        start = sum(len(ln) + 1 for ln in lines[:line - 1])
+        length = len(lines[line - 1])
+        col = length if m.group(2) == 'end' else min(int(m.group(2)), length)
+        return start + col
+
+    def _index(self, off):
+        line = self.s.count('\n', 0, off) + 1
+        return f'{line}.{off - (self.s.rfind(chr(10), 0, off) + 1)}'
+
+    def _cmd_index(self, index):
+        return self._index(self._offset(index))
+
+    def _cmd_compare(self, a, op, b):
+        a, b = self._offset(a), self._offset(b)
+        return {'<': a < b, '<=': a <= b, '==': a == b, '>=': a >= b, '>': a > b, '!=': a != b}[op]
+
+    def _cmd_get(self, start, end=None):
+        a = self._offset(start)
+        b = a + 1 if end is None else self._offset(end)
+        return self.s[a:b]
+
+    def _cmd_insert(self, index, *chars_tags):
+        off = min(self._offset(index), len(self.s) - 1)
+        text = ''.join(chars_tags[0::2])
+        if len(chars_tags) > 1:
+            given = set(chars_tags[1].split()) if isinstance(chars_tags[1], str) else set(chars_tags[1])
+        else:
+            # without tags the text gets those on both sides of it
+            before = self.tags[off - 1] if off else set()
+            given = before & self.tags[off]
+        self.s = self.s[:off] + text + self.s[off:]
+        self.tags[off:off] = [set(given) for _ in text]
+
+    def _range(self, a, b=None):
+        a = self._offset(a)
+        b = a + 1 if b is None else self._offset(b)
+        if b >= len(self.s):
+            # the final newline stays; a range running into it from a line
+            # start takes the newline before instead
+            b = len(self.s) - 1
+            if 0 < a < b and self.s[a - 1] == '\n':
+                a -= 1
+        return a, b
+
+    def _cmd_delete(self, *indices):
+        ranges = []
+        for i in range(0, len(indices), 2):
+            ranges.append(self._range(*indices[i:i + 2]))
+        merged = []
+        for a, b in sorted(r for r in ranges if r[0] < r[1]):
+            if merged and a <= merged[-1][1]:
+                merged[-1] = (merged[-1][0], max(b, merged[-1][1]))
+            else:
+                merged.append((a, b))
+        for a, b in reversed(merged):
+            self.s = self.s[:a] + self.s[b:]
+            del self.tags[a:b]
+
+    def _cmd_replace(self, start, end, *chars_tags):
+        a, b = self._range(start, end)
+        text = ''.join(chars_tags[0::2])
+        self.s = self.s[:a] + text + self.s[b:]
+        self.tags[a:b] = [set() for _ in text]
+
+    def _runs(self, tag):
+        return [(self._index(a), self._index(b)) for a, b in self.tagged(tag)]
+
+    def _tag_spans(self, indices):
+        for i in range(0, len(indices), 2):
+            a = self._offset(indices[i])
+            b = a + 1 if i + 1 >= len(indices) else self._offset(indices[i + 1])
+            yield a, min(b, len(self.s))
+
+    def _cmd_tag(self, op, tag, *args):
+        if op == 'add':
+            for a, b in self._tag_spans(args):
+                for i in range(a, b):
+                    self.tags[i].add(tag)
+        elif op == 'remove':
+            for a, b in self._tag_spans(args):
+                for i in range(a, b):
+                    self.tags[i].discard(tag)
+        elif op == 'ranges':
+            return tuple(x for run in self._runs(tag) for x in run)
+        elif op == 'nextrange':
+            # the first range starting in [index1, index2); one that only
+            # runs through index1 does not count (as in tkText.c)
+            lo = self._offset(args[0])
+            hi = self._offset(args[1]) if len(args) > 1 else len(self.s)
+            for a, b in self.tagged(tag):
+                if lo <= a < hi:
+                    return self._index(a), self._index(b)
+            return ''
+        elif op == 'prevrange':
+            # the last range starting before index1 (and at or after index2)
+            hi = self._offset(args[0])
+            lo = self._offset(args[1]) if len(args) > 1 else 0
+            found = ''
+            for a, b in self.tagged(tag):
+                if lo <= a < hi:
+                    found = self._index(a), self._index(b)
+            return found
+        else:
+            raise NotImplementedError(op)
@@ -0,0 +1,77 @@
+from edit_hooks import TextChange, add_edit_listener, apply_to_lines, edit_bus_for
+
+from fake_text import FakeText
+
+
+def _watch(text):
+    changes = []
+    add_edit_listener(text, changes.append)
+    return changes
+
+
+def _replay(content, changes):
+    lines = content.split('\n')
+    for c in changes:
+        apply_to_lines(lines, c.line, c.col, c.removed, c.inserted)
+    return '\n'.join(lines)
+
+
+def test_insert_and_delete_are_reported():
+    text = FakeText('alpha\nbeta')
+    changes = _watch(text)
+    text.insert('2.0', 'new ')
+    text.delete('1.1', '1.3')
+    assert changes == [TextChange(2, 0, '', 'new '), TextChange(1, 1, 'lp', '')]
+
+
+def test_multi_range_delete_reports_each_range_last_first():
+    content = 'one two three\nfour five\nsix'
+    text = FakeText(content)
+    changes = _watch(text)
+    text.delete('1.0', '1.4', '2.5', '2.9', '3.0', '3.1')
+    assert changes == [
+        TextChange(3, 0, 's', ''),
+        TextChange(2, 5, 'five', ''),
+        TextChange(1, 0, 'one ', ''),
+    ]
+    # the untouched text between the ranges is kept
+    assert _replay(content, changes) == text.get('1.0', 'end-1c') == 'two three\nfour \nix'
+
+
+def test_overlapping_and_unsorted_ranges_are_merged():
+    content = 'abcdefghij'
+    text = FakeText(content)
+    changes = _watch(text)
+    text.delete('1.6', '1.8', '1.1', '1.4', '1.3', '1.5')
+    assert changes == [TextChange(1, 6, 'gh', ''), TextChange(1, 1, 'bcde', '')]
+    assert _replay(content, changes) == text.get('1.0', 'end-1c') == 'afij'
+
+
+def test_delete_up_to_end_takes_the_previous_newline():
+    content = 'first\nsecond'
+    text = FakeText(content)
+    changes = _watch(text)
+    text.delete('2.0', 'end')
+    assert changes == [TextChange(1, 5, '\nsecond', '')]
+    assert _replay(content, changes) == text.get('1.0', 'end-1c') == 'first'
+
+
+def test_replace_is_one_change():
+    text = FakeText('hello world')
+    changes = _watch(text)
+    text.tk.call(text._w, 'replace', '1.6', '1.11', 'there')
+    assert changes == [TextChange(1, 6, 'world', 'there')]
+
+
+def test_bus_batches_changes_until_idle():
+    text = FakeText('a\nb\nc')
+    bus = edit_bus_for(text)
+    batches = []
+    bus.subscribe(batches.append)
+    text.insert('2.0', 'x')
+    text.insert('3.0', 'y\n')
+    assert not batches
+    text.run_timers()
+    assert len(batches) == 1
+    assert (batches[0].first, batches[0].last) == (2, 4)
+    assert bus.serial == 2
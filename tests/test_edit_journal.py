@@ -0,0 +1,161 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from edit_hooks import edit_bus_for
+from edit_journal import EditJournal, _alive, discard_journal, pending_journals, recover_journal
+
+from fake_text import FakeText
+
+
+def _journal(tmp_path, content=''):
+    text = FakeText(content)
+    journal = EditJournal(edit_bus_for(text), str(tmp_path / 'journal'))
+    return text, journal
+
+
+def _crash(journal):
+    """Let the writer finish what is queued, leaving the journal behind."""
+    journal.bus.flush()
+    journal._queue.put(None)
+    journal._thread.join(5)
+
+
+def _edit(text):
+    text.insert('1.0', 'first\n')
+    text.insert('end', '\nlast line')
+    text.delete('2.0', '2.3')
+    text.tk.call(text._w, 'replace', '1.0', '1.5', '1st')
+    text.delete('1.0', '1.1', '2.0', '2.2')
+    text.insert('2.1', '한글 ✓')
+
+
+def _recovered(journal):
+    found = pending_journals(journal.journal_dir)
+    assert len(found) == 1
+    return recover_journal(found[0], journal.journal_dir)
+
+
+def test_edits_over_the_file_are_recovered(tmp_path):
+    path = tmp_path / 'npc.txt'
+    path.write_text('prontera,150,150,4\tscript\tKafra\n{\n}', encoding='utf-8')
+    text, journal = _journal(tmp_path, path.read_text(encoding='utf-8'))
+    journal.start(str(path))
+    _edit(text)
+    _crash(journal)
+    assert _recovered(journal) == text.get('1.0', 'end-1c')
+
+
+def test_untitled_buffer_is_recovered(tmp_path):
+    text, journal = _journal(tmp_path)
+    journal.start(None, content='')
+    _edit(text)
+    _crash(journal)
+    assert _recovered(journal) == text.get('1.0', 'end-1c')
+
+
+def test_edits_over_a_snapshot_are_recovered(tmp_path):
+    text, journal = _journal(tmp_path, 'unsaved\ntext')
+    journal.start(None, content='unsaved\ntext')
+    _edit(text)
+    _crash(journal)
+    assert _recovered(journal) == text.get('1.0', 'end-1c')
+
+
+def test_compacted_journal_is_recovered(tmp_path):
+    text, journal = _journal(tmp_path)
+    journal.compact_bytes = 200
+    journal.start(None, content='')
+    for i in range(50):
+        text.insert('end', f'line {i}\n')
+        journal.bus.flush()
+    text.delete('3.0', '10.0')
+    _crash(journal)
+    assert journal.meta['gen'] > 1
+    assert _recovered(journal) == text.get('1.0', 'end-1c')
+    snaps = [n for n in os.listdir(journal.journal_dir) if n.endswith('.snap')]
+    assert snaps == [f"{journal.key}.{journal.meta['gen']}.snap"]
+
+
+def test_changed_file_is_not_replayed(tmp_path):
+    path = tmp_path / 'npc.txt'
+    path.write_text('abc', encoding='utf-8')
+    text, journal = _journal(tmp_path, 'abc')
+    journal.start(str(path))
+    text.insert('1.1', 'x')
+    _crash(journal)
+    path.write_text('changed on disk', encoding='utf-8')
+    meta, = pending_journals(journal.journal_dir)
+    with pytest.raises(ValueError):
+        recover_journal(meta, journal.journal_dir)
+
+
+def test_log_of_an_older_base_is_ignored(tmp_path):
+    journal_dir = tmp_path / 'journal'
+    journal_dir.mkdir()
+    meta = {'path': None, 'encoding': 'utf-8', 'base': 'snapshot', 'gen': 2, 'pid': 0}
+    (journal_dir / 'k.json').write_text(json.dumps(meta))
+    (journal_dir / 'k.2.snap').write_text('new base')
+    # the crash came before the log was started over for generation 2
+    (journal_dir / 'k.log').write_text('{"gen": 1}\n[1, 0, "", "old edit "]\n')
+    found, = pending_journals(str(journal_dir))
+    assert recover_journal(found, str(journal_dir)) == 'new base'
+
+
+def test_record_cut_short_ends_the_log(tmp_path):
+    journal_dir = tmp_path / 'journal'
+    journal_dir.mkdir()
+    meta = {'path': None, 'encoding': 'utf-8', 'base': 'empty', 'gen': 1, 'pid': 0}
+    (journal_dir / 'k.json').write_text(json.dumps(meta))
+    (journal_dir / 'k.log').write_text('{"gen": 1}\n[1, 0, "", "kept"]\n[1, 4, "", " lo')
+    found, = pending_journals(str(journal_dir))
+    assert recover_journal(found, str(journal_dir)) == 'kept'
+
+
+def test_clean_close_and_discard_leave_nothing(tmp_path):
+    text, journal = _journal(tmp_path)
+    journal.start(None, content='')
+    text.insert('1.0', 'typed')
+    journal.bus.flush()
+    journal.close()
+    assert pending_journals(journal.journal_dir) == []
+
+    text, journal = _journal(tmp_path)
+    journal.start(None, content='')
+    text.insert('1.0', 'typed')
+    _crash(journal)
+    meta, = pending_journals(journal.journal_dir)
+    discard_journal(meta, journal.journal_dir)
+    assert os.listdir(journal.journal_dir) == []
+
+
+def _write_meta(journal_dir, pid):
+    journal_dir.mkdir(exist_ok=True)
+    meta = {'path': None, 'encoding': 'utf-8', 'base': 'empty', 'gen': 1, 'pid': pid}
+    (journal_dir / 'k.json').write_text(json.dumps(meta))
+    (journal_dir / 'k.log').write_text('{"gen": 1}\n[1, 0, "", "unsaved"]\n')
+
+
+def test_journal_of_a_running_editor_is_left_alone(tmp_path):
+    journal_dir = tmp_path / 'journal'
+    other = subprocess.Popen([sys.executable, '-c', 'import time; time.sleep(60)'])
+    try:
+        assert _alive(other.pid)
+        _write_meta(journal_dir, other.pid)
+        assert pending_journals(str(journal_dir)) == []
+    finally:
+        other.kill()
+        other.wait()
+    # once that editor is gone its journal is offered
+    assert not _alive(other.pid)
+    found, = pending_journals(str(journal_dir))
+    assert recover_journal(found, str(journal_dir)) == 'unsaved'
+
+
+def test_odd_pids_are_not_running_editors():
+    assert not _alive(os.getpid())
+    for pid in (None, 0, -1, 'x'):
+        assert not _alive(pid)
@@ -0,0 +1,84 @@
+import os
+import stat
+
+import pytest
+
+import file_saver
+from file_saver import BackgroundSaver, write_atomic
+
+
+def _mode(path):
+    return stat.S_IMODE(os.stat(path).st_mode)
+
+
+@pytest.mark.skipif(os.name != 'posix', reason='POSIX permissions')
+def test_new_file_gets_umask_permissions(tmp_path, monkeypatch):
+    monkeypatch.setattr(file_saver, '_UMASK', 0o022)
+    path = tmp_path / 'new.npc'
+    write_atomic(str(path), b'prontera,150,150,4\tscript\tTest\t1,{}')
+    assert path.read_bytes().startswith(b'prontera')
+    assert _mode(path) == 0o644
+
+
+@pytest.mark.skipif(os.name != 'posix', reason='POSIX permissions')
+def test_existing_file_keeps_its_permissions(tmp_path):
+    path = tmp_path / 'old.npc'
+    path.write_bytes(b'old')
+    os.chmod(path, 0o640)
+    write_atomic(str(path), b'new')
+    assert path.read_bytes() == b'new'
+    assert _mode(path) == 0o640
+
+
+@pytest.mark.skipif(not hasattr(os, 'symlink'), reason='needs symlinks')
+def test_symlink_is_followed(tmp_path):
+    target = tmp_path / 'real.npc'
+    target.write_bytes(b'old')
+    link = tmp_path / 'link.npc'
+    os.symlink(target, link)
+    write_atomic(str(link), b'new')
+    assert os.path.islink(link)
+    assert target.read_bytes() == b'new'
+
+
+def test_no_temporary_files_left(tmp_path):
+    path = tmp_path / 'a.txt'
+    write_atomic(str(path), b'one')
+    write_atomic(str(path), b'two')
+    assert os.listdir(tmp_path) == ['a.txt']
+    assert path.read_bytes() == b'two'
+
+
+class _Widget:
+    def after(self, ms, fn):
+        return 'after#1'
+
+    def after_cancel(self, key):
+        pass
+
+
+def test_waited_save_reports_its_own_result(tmp_path):
+    saver = BackgroundSaver(_Widget())
+    results = []
+    good = tmp_path / 'good.npc'
+    bad = tmp_path / 'missing' / 'bad.npc'
+    saver.save(str(good), lambda: ('first', 1), 'utf-8',
+               lambda path, tag, error: results.append((tag, error)))
+    assert saver.busy
+    # the running save finishes (successfully) before the waited one fails
+    saver.save(str(bad), lambda: ('second', 2), 'utf-8',
+               lambda path, tag, error: results.append((tag, error)), wait=True)
+    assert not saver.busy
+    assert [tag for tag, _ in results] == [1, 2]
+    assert results[0][1] is None
+    assert isinstance(results[1][1], OSError)
+    assert good.read_text() == 'first'
+
+
+def test_unencodable_text_is_reported(tmp_path):
+    saver = BackgroundSaver(_Widget())
+    results = []
+    saver.save(str(tmp_path / 'a.txt'), lambda: ('한글', 1), 'latin-1',
+               lambda path, tag, error: results.append(error), wait=True)
+    assert isinstance(results[0], UnicodeEncodeError)
+    assert not (tmp_path / 'a.txt').exists()
@@ -0,0 +1,68 @@
+import mmap
+import re
+
+import pytest
+
+from large_file import LargeFileView, LineOffsets
+
+
+def _view(data, step=4):
+    """A LargeFileView over `data` without a widget (enough for find)."""
+    view = LargeFileView.__new__(LargeFileView)
+    view.data = data
+    view.index = LineOffsets(data, step=step)
+    view.index.build()
+    return view
+
+
+def _last_before(regex, data, start):
+    last = None
+    for m in regex.finditer(data):
+        if m.start() >= start:
+            break
+        last = (m.start(), m.end())
+    return last
+
+
+def test_line_offsets():
+    data = b''.join(b'line %d\n' % i for i in range(1, 101))
+    index = LineOffsets(data, step=8)
+    index.build()
+    assert index.lines == 101
+    for line in range(1, 101):
+        off = index.offset(line)
+        assert data[off:].startswith(b'line %d\n' % line)
+        assert index.line_of(off) == index.line_of(off + 3) == line
+
+
+def test_backward_match_across_chunk_start_is_found_whole():
+    data = b'.' * 200 + b'abcdefghij' + b'  more text'
+    view = _view(data)
+    assert view.find(re.compile(rb'\w+'), 212, backwards=True, chunk=6) == (200, 210)
+    assert view.find(re.compile(rb'\w+'), 205, backwards=True, chunk=6) == (200, 210)
+
+
+@pytest.mark.parametrize('chunk', [1, 6, 64])
+@pytest.mark.parametrize('pattern', [rb'\w+', rb'[a-z]+\d*', rb'(?m)^\w+', rb'\w+$', rb'o\w*o', rb'\d'])
+def test_backward_find_matches_a_scan_from_the_top(tmp_path, pattern, chunk):
+    data = b''.join(b'word%d foo%dbar oooo zz\n' % (i, i * 7) for i in range(60))
+    path = tmp_path / 'big.txt'
+    path.write_bytes(data)
+    with open(path, 'rb') as f:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            view = _view(mapped)
+            regex = re.compile(pattern)
+            for start in range(0, len(data) + 1, 13):
+                expected = _last_before(regex, data, start)
+                assert view.find(regex, start, backwards=True, chunk=chunk) == expected
+        finally:
+            mapped.close()
+
+
+def test_forward_find():
+    view = _view(b'alpha beta\ngamma beta\n')
+    regex = re.compile(rb'beta')
+    assert view.find(regex, 0) == (6, 10)
+    assert view.find(regex, 7) == (17, 21)
+    assert view.find(regex, 18) is None
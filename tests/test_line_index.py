@@ -0,0 +1,52 @@
+import random
+
+from line_index import LineIndex, line_index_for
+
+from fake_text import FakeText
+
+
+def _line_col(content, offset):
+    line = content.count('\n', 0, offset) + 1
+    return line, offset - (content.rfind('\n', 0, offset) + 1)
+
+
+def test_offsets_and_indices_round_trip():
+    content = 'first\n\nthird line\nlast'
+    idx = LineIndex(content)
+    assert len(idx) == 4
+    assert idx.total == len(content)
+    for off in range(len(content) + 1):
+        line, col = _line_col(content, off)
+        assert idx.line_col(off) == (line, col)
+        assert idx.offset(line, col) == off
+        assert idx.index(off) == f'{line}.{col}'
+
+
+def test_lines_outside_the_text_are_clamped():
+    idx = LineIndex('ab\ncd')
+    assert idx.offset(9, 0) == 5
+    assert idx.offset(0, 0) == 0
+
+
+def test_index_follows_widget_edits():
+    rnd = random.Random(7)
+    text = FakeText('\n'.join(f'line {i}' for i in range(40)))
+    idx = line_index_for(text)
+    for _ in range(300):
+        content = text.get('1.0', 'end-1c')
+        a, b = sorted(rnd.randrange(len(content) + 1) for _ in range(2))
+        pos = idx.index(a)
+        op = rnd.random()
+        if op < 0.4:
+            text.insert(pos, rnd.choice(['x', 'yz\n', '\n\n', 'word ']))
+        elif op < 0.8:
+            text.delete(pos, idx.index(b))
+        else:
+            c, d = sorted(rnd.randrange(len(content) + 1) for _ in range(2))
+            text.delete(pos, idx.index(b), idx.index(c), idx.index(d))
+        content = text.get('1.0', 'end-1c')
+        assert idx.total == len(content)
+        for off in range(0, len(content) + 1, 5):
+            line, col = _line_col(content, off)
+            assert idx.line_col(off) == (line, col)
+            assert idx.offset(line, col) == off
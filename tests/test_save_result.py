@@ -0,0 +1,58 @@
+import BalrogNPC as app
+from documents import Document
+from file_saver import BackgroundSaver
+
+
+class _Widget:
+    def after(self, ms, fn):
+        return 'after#1'
+
+    def after_cancel(self, key):
+        pass
+
+
+class _Var:
+    def set(self, value):
+        self.value = value
+
+
+class _Editor:
+    """Just enough of the editor for its save methods."""
+
+    _save_to_file = app.BalrogNPC._save_to_file
+    _save_snapshot = app.BalrogNPC._save_snapshot
+    _on_saved = app.BalrogNPC._on_saved
+
+    def __init__(self):
+        self.doc = Document()
+        self.docs = []  # the saved documents' tabs are closed: no UI to update
+        self.large_view = None
+        self._loader = None
+        self.status_var = _Var()
+        self.saver = BackgroundSaver(_Widget())
+
+
+def _doc(text):
+    doc = Document()
+    doc.text = text
+    return doc
+
+
+def test_failed_waited_save_is_not_reported_as_saved(tmp_path, monkeypatch):
+    errors = []
+    monkeypatch.setattr(app.messagebox, 'showerror', lambda *a: errors.append(a))
+    editor = _Editor()
+    # a background save is still running when the waited one starts; it
+    # succeeds while the waited save is being prepared
+    assert editor._save_to_file(str(tmp_path / 'other.npc'), doc=_doc('other')) is True
+    assert editor.saver.busy
+    ok = editor._save_to_file(str(tmp_path / 'missing' / 'npc.txt'), wait=True, doc=_doc('text'))
+    assert ok is False
+    assert len(errors) == 1
+    assert (tmp_path / 'other.npc').read_text() == 'other'
+
+
+def test_waited_save_reports_success(tmp_path):
+    editor = _Editor()
+    assert editor._save_to_file(str(tmp_path / 'npc.txt'), wait=True, doc=_doc('text')) is True
+    assert (tmp_path / 'npc.txt').read_text() == 'text'
@@ -0,0 +1,211 @@
+import re
+
+import pytest
+
+import syntax_highlighter
+from syntax_highlighter import SyntaxHighlighter
+from syntax_tokenizer import NORMAL
+
+from fake_text import FakeText
+
+
+@pytest.fixture(autouse=True)
+def no_syntax_cache(monkeypatch):
+    monkeypatch.setattr(SyntaxHighlighter, 'use_cache', False)
+
+
+def _highlighted(content, syntax='rathena.ini'):
+    text = FakeText(content)
+    hl = SyntaxHighlighter(text, threaded=False, viewport_first=False)
+    hl.set_syntax(hl.find_syntax(syntax))
+    hl.highlight()
+    text.run_timers()
+    return text, hl
+
+
+def _tag_at(text, hl, line, col):
+    """The syntax tag of the character at line.col, or None."""
+    tags = text.tags_at(text._offset(f'{line}.{col}')) & set(hl._tag_of.values())
+    assert len(tags) <= 1
+    return next(iter(tags), None)
+
+
+def _colored(text, hl, line, word):
+    col = text.text().split('\n')[line - 1].index(word)
+    return {_tag_at(text, hl, line, col + i) for i in range(len(word))}
+
+
+def test_unstyled_patterns_do_not_take_text_from_styled_ones():
+    text, hl = _highlighted('\tdefault:\n\t.@count = 5;\n\t@menu = 1;\n')
+    # DUNDER and VAR_ASSIGN have no tag.* style; their `^[ \t]*` patterns
+    # used to claim these lines before KEYWORD, SELFS and DECORATOR could
+    assert _colored(text, hl, 1, 'default') == {hl._tag_of['KEYWORD']}
+    assert _colored(text, hl, 2, '@count') == {hl._tag_of['SELFS']}
+    assert _colored(text, hl, 3, '@menu') == {hl._tag_of['DECORATOR']}
+    assert _tag_at(text, hl, 2, 11) == hl._tag_of['NUMBER']
+
+
+def test_unstyled_tokens_stay_in_the_token_stream():
+    text, hl = _highlighted('\t.@count = 5;\n')
+    stream = hl.token_stream()
+    assert [stream.text(t) for t in stream.of_type('VAR_ASSIGN')] == ['\t.@count =']
+
+
+DEMO_INI = '''[Syntax]
+name = Demo
+detect.ext = demo
+regex.COMMENT_RE = //[^\\n]*
+types.csv = int, string
+keywords.csv = string, return
+tag.comment.fg = #808080
+tag.keyword.fg = #0000ff
+'''
+
+
+def _demo(tmp_path, ini=DEMO_INI, content='string s; return 1; // int\n'):
+    (tmp_path / 'demo.ini').write_text(ini)
+    text = FakeText(content)
+    hl = SyntaxHighlighter(text, syntax_dir=str(tmp_path), threaded=False, viewport_first=False)
+    hl.set_syntax('Demo')
+    hl.highlight()
+    text.run_timers()
+    return text, hl
+
+
+def test_a_word_goes_to_the_first_styled_list_naming_it(tmp_path):
+    text, hl = _demo(tmp_path)
+    # TYPE has no style, so KEYWORD is the first list that colors `string`
+    assert _colored(text, hl, 1, 'string') == {hl._tag_of['KEYWORD']}
+    assert _colored(text, hl, 1, 'return') == {hl._tag_of['KEYWORD']}
+    assert hl.word_token('string') == 'TYPE'
+
+
+def test_reload_relexes_when_a_token_gains_a_style(tmp_path):
+    text, hl = _demo(tmp_path)
+    (tmp_path / 'demo.ini').write_text(DEMO_INI + 'tag.type.fg = #008000\n')
+    hl.reload()
+    text.run_timers()
+    assert _colored(text, hl, 1, 'string') == {hl._tag_of['TYPE']}
+    assert _colored(text, hl, 1, 'return') == {hl._tag_of['KEYWORD']}
+
+
+def _per_pattern_colors(syn, tag_of, content):
+    """Offsets the old highlighter colored: every match of every styled pattern."""
+    colored = set()
+    patterns = [(t, body) for t, body, _ in syn['compiled']]
+    patterns += [(t, r'\b(?:' + '|'.join(ws) + r')\b') for t, ws in syn['word_lists']]
+    for token, body in patterns:
+        if token in tag_of:
+            for m in re.finditer(body, content, re.MULTILINE):
+                colored.update(range(m.start(), m.end()))
+    return colored
+
+
+def test_no_character_loses_the_color_of_the_per_pattern_pass():
+    content = ('prontera,150,150,4\tscript\tKafra\t4_F_KAFRA1,{\n'
+               '\tdefault:\n\t.@count = 5;\n\t@menu = 1;\n\tset $@x, getarg(0);\n'
+               '\tif (Zeny < 500) { mes "Hi"; close; } // done\n}\n')
+    text, hl = _highlighted(content)
+    syn = hl._syntaxes[hl._current]
+    for offset in sorted(_per_pattern_colors(syn, hl._tag_of, content)):
+        assert text.tags_at(offset) & set(hl._tag_of.values()), (offset, content[offset])
+
+
+# -- incremental passes ------------------------------------------------------
+
+BODY = ''.join(f'\tmes "line {i}"; set .@n{i}, {i}; // note {i}\n' for i in range(1, 41))
+SCRIPT = 'prontera,150,150,4\tscript\tKafra\t4_F_KAFRA1,{\n' + BODY + '\tend;\n}\n'
+
+
+def _syntax_tags(text, hl):
+    names = set(hl._tag_of.values())
+    return [frozenset(t & names) for t in text.tags]
+
+
+def _edited(content, *edits, **options):
+    """Highlight `content`, then apply `edits` one pass each.
+
+    Each edit is ('insert', index, chars) or ('delete', index1, index2).
+    Returns the widget, the highlighter and the line counts handed to `lex`.
+    """
+    text = FakeText(content)
+    hl = SyntaxHighlighter(text, threaded=False, viewport_first=False)
+    for name, value in options.items():
+        setattr(hl, name, value)
+    hl.set_syntax(hl.find_syntax('rathena.ini'))
+    hl.highlight()
+    text.run_timers()
+    lexed = []
+    real_lex = syntax_highlighter.lex
+
+    def counting_lex(syn, region, state):
+        lexed.append(region.count('\n') + 1)
+        return real_lex(syn, region, state)
+
+    syntax_highlighter.lex = counting_lex
+    try:
+        for op, *args in edits:
+            getattr(text, op)(*args)
+            # as the editor does on every key
+            hl.schedule_highlight()
+            text.run_timers()
+    finally:
+        syntax_highlighter.lex = real_lex
+    return text, hl, lexed
+
+
+def _assert_matches_full_pass(text, hl):
+    fresh, fresh_hl = _highlighted(text.text())
+    assert _syntax_tags(text, hl) == _syntax_tags(fresh, fresh_hl)
+    assert [s or NORMAL for s in hl._states] == [s or NORMAL for s in fresh_hl._states]
+
+
+def test_typing_inside_a_block_comment_keeps_it_a_comment():
+    content = SCRIPT.replace('\tend;\n', '\t/* first\n\t   second\n\t   third */\n\tend;\n')
+    text, hl, lexed = _edited(content, ('insert', '43.8', ' mes "x"; end;'))
+    assert _colored(text, hl, 43, 'mes "x"; end;') == {hl._tag_of['COMMENT']}
+    _assert_matches_full_pass(text, hl)
+    assert sum(lexed) < 10
+
+
+def test_opening_a_block_comment_colors_the_lines_after_it():
+    text, hl, lexed = _edited(SCRIPT, ('insert', '10.0', '\t/* '), ('insert', '20.0', '\t*/ '))
+    for line in range(10, 21):
+        assert _tag_at(text, hl, line, 2) == hl._tag_of['COMMENT']
+    assert _tag_at(text, hl, 21, 1) == hl._tag_of['KEYWORD']
+    _assert_matches_full_pass(text, hl)
+
+
+def test_removing_the_opener_uncomments_the_block():
+    content = SCRIPT.replace('\tmes "line 5"', '\t/*mes "line 5"').replace('// note 9', '*/')
+    text, hl, _ = _edited(content, ('delete', '6.1', '6.3'))
+    assert _colored(text, hl, 7, 'mes') == {hl._tag_of['KEYWORD']}
+    assert _tag_at(text, hl, 10, 1) == hl._tag_of['KEYWORD']
+    _assert_matches_full_pass(text, hl)
+
+
+def test_an_edit_across_a_comment_boundary_matches_a_full_pass():
+    content = SCRIPT.replace('// note 4', '/* open').replace('// note 8', 'close */')
+    # delete from inside the comment to past its end, then type a new closer
+    text, hl, _ = _edited(content, ('delete', '7.10', '10.5'), ('insert', '12.0', '*/'))
+    _assert_matches_full_pass(text, hl)
+
+
+def test_relexing_stops_once_the_state_settles():
+    content = SCRIPT.replace('// note 30', '/* a comment').replace('// note 33', '*/')
+    # an edit that leaves every line's state as it was re-lexes only its line
+    _, _, lexed = _edited(content, ('insert', '10.1', 'mes "x"; '))
+    assert sum(lexed) <= 10
+    # opening a comment re-lexes up to the next closer, not to the end
+    text, hl, lexed = _edited(content, ('insert', '25.0', '/*'))
+    assert sum(lexed) < 30
+    assert _tag_at(text, hl, 30, 1) == hl._tag_of['COMMENT']
+    assert _tag_at(text, hl, 35, 1) == hl._tag_of['KEYWORD']
+    _assert_matches_full_pass(text, hl)
+
+
+def test_the_background_fill_matches_a_full_pass():
+    text, hl, _ = _edited(SCRIPT, ('insert', '3.0', '/*\n'), ('insert', '30.0', '*/'),
+                          viewport_first=True, lazy_threshold=8, fill_block_lines=5)
+    assert hl.pending_lines() == 0
+    _assert_matches_full_pass(text, hl)
@@ -0,0 +1,191 @@
+import os
+
+import pytest
+
+import syntax_highlighter
+from syntax_defs import build_detector
+from syntax_highlighter import SyntaxHighlighter, _score_detector, load_syntaxes
+
+from fake_text import FakeText
+
+SYNTAX = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'syntax')
+
+ALPHA_INI = '''[Syntax]
+name = Alpha
+detect.ext = a
+regex.COMMENT_RE = #[^\\n]*
+keywords.csv = let, in
+tag.comment.fg = #808080
+tag.keyword.fg = #0000ff
+'''
+
+BETA_INI = '''[Syntax]
+name = Beta
+detect.ext = b
+regex.STRING_RE = <[^>\\n]*>
+tag.string.fg = #008000
+'''
+
+
+@pytest.fixture
+def cache_file(tmp_path, monkeypatch):
+    path = tmp_path / 'cache' / 'syntax_cache.pickle'
+    monkeypatch.setattr(syntax_highlighter, '_SYNTAX_CACHE_FILE', str(path))
+    return path
+
+
+@pytest.fixture
+def syntax_dir(tmp_path):
+    folder = tmp_path / 'syntax'
+    folder.mkdir()
+    (folder / 'alpha.ini').write_text(ALPHA_INI)
+    (folder / 'beta.ini').write_text(BETA_INI)
+    return folder
+
+
+def _counts(stats):
+    return {k: stats[k] for k in ('parsed', 'cached', 'reused', 'restyled')}
+
+
+def test_parsed_files_are_cached_on_disk(syntax_dir, cache_file):
+    syntaxes, stats = load_syntaxes(str(syntax_dir))
+    assert sorted(syntaxes) == ['Alpha', 'Beta']
+    assert _counts(stats) == {'parsed': 2, 'cached': 0, 'reused': 0, 'restyled': 0}
+    assert cache_file.exists()
+    syntaxes, stats = load_syntaxes(str(syntax_dir))
+    assert _counts(stats) == {'parsed': 0, 'cached': 2, 'reused': 0, 'restyled': 0}
+    assert syntaxes['Alpha']['words'] == {'let': 'KEYWORD', 'in': 'KEYWORD'}
+
+
+def test_only_the_changed_file_is_parsed_again(syntax_dir, cache_file):
+    first, _ = load_syntaxes(str(syntax_dir))
+    (syntax_dir / 'beta.ini').write_text(BETA_INI.replace('>\\n]*>', '>\\n]+>'))
+    second, stats = load_syntaxes(str(syntax_dir), previous=first)
+    assert _counts(stats) == {'parsed': 1, 'cached': 0, 'reused': 1, 'restyled': 0}
+    assert second['Alpha'] is first['Alpha']
+    assert second['Beta']['regexes'] == [('STRING', '<[^>\\n]+>')]
+    # and the cache now holds the new definition
+    _, stats = load_syntaxes(str(syntax_dir))
+    assert _counts(stats) == {'parsed': 0, 'cached': 2, 'reused': 0, 'restyled': 0}
+
+
+def test_a_new_mtime_alone_invalidates_the_entry(syntax_dir, cache_file):
+    load_syntaxes(str(syntax_dir))
+    st = os.stat(syntax_dir / 'alpha.ini')
+    os.utime(syntax_dir / 'alpha.ini', ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+    _, stats = load_syntaxes(str(syntax_dir))
+    assert _counts(stats) == {'parsed': 1, 'cached': 1, 'reused': 0, 'restyled': 0}
+
+
+def test_a_new_size_alone_invalidates_the_entry(syntax_dir, cache_file):
+    load_syntaxes(str(syntax_dir))
+    st = os.stat(syntax_dir / 'alpha.ini')
+    with open(syntax_dir / 'alpha.ini', 'a') as f:
+        f.write('\n')
+    os.utime(syntax_dir / 'alpha.ini', ns=(st.st_atime_ns, st.st_mtime_ns))
+    _, stats = load_syntaxes(str(syntax_dir))
+    assert _counts(stats) == {'parsed': 1, 'cached': 1, 'reused': 0, 'restyled': 0}
+
+
+def test_a_cache_of_another_version_is_ignored(syntax_dir, cache_file, monkeypatch):
+    load_syntaxes(str(syntax_dir))
+    monkeypatch.setattr(syntax_highlighter, '_SYNTAX_CACHE_VERSION', syntax_highlighter._SYNTAX_CACHE_VERSION + 1)
+    _, stats = load_syntaxes(str(syntax_dir))
+    assert _counts(stats) == {'parsed': 2, 'cached': 0, 'reused': 0, 'restyled': 0}
+
+
+def test_an_unreadable_cache_is_ignored(syntax_dir, cache_file):
+    cache_file.parent.mkdir()
+    cache_file.write_bytes(b'not a pickle')
+    syntaxes, stats = load_syntaxes(str(syntax_dir))
+    assert sorted(syntaxes) == ['Alpha', 'Beta']
+    assert stats['parsed'] == 2
+
+
+def test_a_new_color_keeps_the_compiled_patterns(syntax_dir, cache_file):
+    first, _ = load_syntaxes(str(syntax_dir))
+    (syntax_dir / 'alpha.ini').write_text(ALPHA_INI.replace('#0000ff', '#ff0000'))
+    second, stats = load_syntaxes(str(syntax_dir), previous=first)
+    assert _counts(stats) == {'parsed': 1, 'cached': 0, 'reused': 1, 'restyled': 1}
+    assert second['Alpha'] is not first['Alpha']
+    assert second['Alpha']['scanner'] is first['Alpha']['scanner']
+    assert second['Alpha']['tags']['keyword'] == {'fg': '#ff0000'}
+
+
+def test_removed_files_leave_the_cache(syntax_dir, cache_file):
+    load_syntaxes(str(syntax_dir))
+    os.remove(syntax_dir / 'beta.ini')
+    syntaxes, _ = load_syntaxes(str(syntax_dir))
+    assert list(syntaxes) == ['Alpha']
+    assert list(syntax_highlighter._read_syntax_cache()) == [str(syntax_dir / 'alpha.ini')]
+
+
+def test_use_cache_off_leaves_no_cache_file(syntax_dir, cache_file):
+    _, stats = load_syntaxes(str(syntax_dir), use_cache=False)
+    assert stats['parsed'] == 2
+    assert not cache_file.exists()
+
+
+# -- detect.* scoring --------------------------------------------------------
+
+def _score(detect, sample):
+    return _score_detector(build_detector('test.ini', detect), sample, sample.lower())
+
+
+def test_the_detect_regex_must_match():
+    assert _score({'regex': r'^key:', 'contains': 'key'}, 'nothing here\n') is None
+
+
+def test_regex_matches_includes_and_contains_add_up():
+    detect = {'regex': r'(?m)^\w+:', 'includes': 'alpha, beta', 'contains': 'Gamma;delta'}
+    # two regex matches, two distinct included words (each counted once),
+    # one contained substring
+    assert _score(detect, 'a: Alpha alpha\nb: beta gamma\n') == 2 + 2 * 2 + 5
+
+
+def test_includes_are_whole_words():
+    assert _score({'includes': 'mes'}, 'message') is None
+    assert _score({'includes': 'mes'}, 'mes "hi";') == 2
+
+
+def test_without_a_regex_some_evidence_is_needed():
+    assert _score({'contains': 'Header:'}, 'Body: 1\n') is None
+    assert _score({'contains': 'Header:'}, 'header: 1\n') == 5
+    assert _score({}, 'anything') is None
+
+
+def test_a_lookahead_detector_counts_once():
+    assert _score({'regex': r'(?s)\A(?=.*\bHeader:\s)'}, 'Header: x\n' * 100) == 1
+
+
+def test_regex_matches_are_capped():
+    assert _score({'regex': r'x'}, 'x' * 500) == 50
+
+
+@pytest.fixture
+def detector(monkeypatch):
+    monkeypatch.setattr(SyntaxHighlighter, 'use_cache', False)
+    return SyntaxHighlighter(FakeText(''), syntax_dir=SYNTAX, threaded=False)
+
+
+def test_detect_syntax_prefers_priority_then_extension(detector):
+    header = 'Header:\n  Type: MOB_DB\n  Version: 1\nBody:\n  - Id: 1001\n'
+    plain = 'Body:\n  - Id: 1001\n    AegisName: PORING\n'
+    script = 'prontera,150,150,4\tscript\tKafra\t4_F_KAFRA1,{\n\tmes "Hi";\n\tclose;\n}\n'
+    assert detector.detect_syntax('mob_db.yml', header) == 'YAML-HeaderType'
+    assert detector.detect_syntax('mob_db.yml', plain) == 'YAML'
+    assert detector.detect_syntax('npc.yml', script) == 'rAthena Script'
+    # no content evidence: the extension decides
+    assert detector.detect_syntax('notes.yaml', '\n\n') == 'YAML'
+    assert detector.detect_syntax('notes.unknown', '') is None
+
+
+def test_detect_syntax_breaks_ties_by_extension_then_score(syntax_dir, cache_file):
+    for fn in ('alpha.ini', 'beta.ini'):
+        with open(syntax_dir / fn, 'a') as f:
+            f.write('detect.regex = (?m)^let\\b\n')
+    with open(syntax_dir / 'beta.ini', 'a') as f:
+        f.write('detect.includes = in\n')
+    hl = SyntaxHighlighter(FakeText(''), syntax_dir=str(syntax_dir), threaded=False)
+    assert hl.detect_syntax('x.a', 'let x = 1 in x\n') == 'Alpha'
+    assert hl.detect_syntax('x.txt', 'let x = 1 in x\n') == 'Beta'
@@ -0,0 +1,78 @@
+import os
+
+import pytest
+
+from syntax_tokenizer import INSIDE, NORMAL, TokenStream, lex, load_syntax, tokenize
+
+SYNTAX = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'syntax')
+
+SCRIPT = '''// Kafra in Prontera
+prontera,150,150,4\tscript\tKafra\t4_F_KAFRA1,{
+\t/* a block comment
+\t   over three lines */
+\tmes "[Kafra]";
+\tmes "Welcome // not a comment";
+\tif (Zeny < 500) close;
+\tset .@n, 3; /* short */ end;
+}
+'''
+
+
+@pytest.fixture(scope='module')
+def syn():
+    syn = load_syntax(os.path.join(SYNTAX, 'rathena.ini'))
+    assert syn is not None
+    return syn
+
+
+def test_tokens_cover_comments_and_strings(syn):
+    stream = TokenStream(syn, SCRIPT)
+    comments = [stream.text(t) for t in stream.of_type('COMMENT')]
+    assert comments[0] == '// Kafra in Prontera'
+    assert '/* a block comment\n\t   over three lines */' in comments
+    assert '"Welcome // not a comment"' in [stream.text(t) for t in stream.tokens]
+    assert stream.covered_lines('COMMENT') == {1, 3, 4}
+
+
+def test_lexing_line_by_line_matches_the_whole_text(syn):
+    whole = tokenize(syn, SCRIPT)
+    lines = SCRIPT.split('\n')
+    spans = []
+    state = NORMAL
+    pos = 0
+    for line in lines:
+        assert state != INSIDE
+        got, _, state, _ = lex(syn, line, state)
+        spans.extend((token, start + pos, end + pos) for token, start, end in got)
+        pos += len(line) + 1
+    # block comments come back per line; join the pieces to compare
+    joined = []
+    for token, start, end in spans:
+        if joined and joined[-1][0] == token == 'COMMENT' and joined[-1][2] + 1 == start \
+                and SCRIPT[joined[-1][2]] == '\n':
+            joined[-1] = (token, joined[-1][1], end)
+        else:
+            joined.append((token, start, end))
+    assert joined == [tuple(t) for t in whole]
+
+
+def test_on_lines_returns_tokens_overlapping_the_lines(syn):
+    stream = TokenStream(syn, SCRIPT)
+    on_four = stream.on_lines(4)
+    assert any(t.type == 'COMMENT' and stream.line_of(t) == 3 for t in on_four)
+    for token in stream.on_lines(5, 6):
+        assert stream.line_of(token) <= 6
+
+
+def test_csv_entries_that_are_not_identifiers_keep_their_alternation():
+    syn = load_syntax(os.path.join(SYNTAX, 'yaml.ini'))
+    # `~` and the builtins.csv punctuation cannot be found by the
+    # identifier lookup, so they are matched by `\b(?:...)\b` regexes
+    assert '~' not in syn['words'] and '|' not in syn['words']
+    assert syn['words']['true'] == 'KEYWORD'
+    assert 'BUILTIN' not in syn['word_sets']
+    assert ('KEYWORD', r'\b(?:\~)\b') in syn['regexes']
+    content = 'a~b c|d e!!f true\n'
+    stream = TokenStream(syn, content)
+    found = {(t.type, stream.text(t)) for t in stream.tokens}
+    assert {('KEYWORD', '~'), ('BUILTIN', '|'), ('BUILTIN', '!!'), ('KEYWORD', 'true')} <= found
@@ -0,0 +1,57 @@
+import threading
+
+from text_encoding import SniffingDecoder, sniff_encoding
+
+
+def _decode(data, encoding=None, chunk=7):
+    decoder = SniffingDecoder(encoding)
+    parts = [decoder.decode(data[i:i + chunk]) for i in range(0, len(data), chunk)]
+    parts.append(decoder.decode(b'', final=True))
+    return ''.join(parts), decoder
+
+
+def test_sniffs_common_script_encodings():
+    korean = '안녕하세요 카프라 서비스입니다\n' * 10
+    assert sniff_encoding(b'mes "hi";') == 'utf-8'
+    assert sniff_encoding(korean.encode('utf-8')) == 'utf-8'
+    assert sniff_encoding(korean.encode('cp949')) == 'cp949'
+    assert sniff_encoding('café crème'.encode('latin-1')) == 'latin-1'
+    assert sniff_encoding(b'\xef\xbb\xbfmes') == 'utf-8-sig'
+    assert sniff_encoding(b'\xc3', final=False) is None
+
+
+def test_chunked_decode_matches_the_text():
+    text = 'prontera,150,150,4\tscript\tKafra\t4_F_KAFRA1,{\n' * 50 + 'mes "카프라";\n' * 100
+    for encoding in ('utf-8', 'cp949'):
+        decoded, decoder = _decode(text.encode(encoding))
+        assert decoded == text
+        assert decoder.encoding == encoding
+        assert decoder.replaced == 0
+
+
+def test_replacement_characters_in_the_file_are_not_counted():
+    text = 'mes "� already here �";\n' * 3
+    decoded, decoder = _decode(text.encode('utf-8'))
+    assert decoded == text
+    assert decoder.replaced == 0
+
+
+def test_undecodable_bytes_are_counted():
+    data = 'mes "ok �";\n'.encode('utf-8') + b'bad \xff\xfe end\n'
+    decoded, decoder = _decode(data, encoding='utf-8')
+    assert decoded == 'mes "ok �";\nbad �� end\n'
+    assert decoder.replaced == 2
+
+
+def test_counts_stay_with_their_decoder_across_threads():
+    counts = []
+
+    def run():
+        counts.append(_decode(b'x\xff' * 500, encoding='utf-8', chunk=3)[1].replaced)
+
+    threads = [threading.Thread(target=run) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert counts == [500] * 4
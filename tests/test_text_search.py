@@ -0,0 +1,79 @@
+import re
+import random
+
+import pytest
+
+from text_search import TextSearch
+
+
+class _Bus:
+    serial = 0
+
+
+class _Text:
+    """Just enough of a Text widget for TextSearch.content."""
+
+    def __init__(self, content):
+        self.content = content
+
+    def get(self, start, end):
+        return self.content
+
+
+def _engine(content, first_chunk):
+    search = TextSearch.__new__(TextSearch)
+    search.text = _Text(content)
+    search.bus = _Bus()
+    search._content = None
+    search._serial = None
+    search.first_chunk = first_chunk
+    search.overlap = 8
+    return search
+
+
+def _last_before(regex, content, start):
+    last = None
+    for m in regex.finditer(content):
+        if m.start() >= start:
+            break
+        last = (m.start(), m.end())
+    return last
+
+
+def test_match_across_chunk_boundary_is_found_whole():
+    content = 'x ' * 119 + 'abcdefgh' + ' tail'
+    search = _engine(content, first_chunk=7)
+    start = content.index(' tail')
+    # the word reaches back past the first chunk boundary
+    assert search.find(re.compile(r'\w+'), start, backwards=True) == (238, 246)
+    assert search.find(re.compile(r'[a-h]+'), start, backwards=True) == (238, 246)
+
+
+@pytest.mark.parametrize('pattern', [r'\w+', r'a+', r'foo', r'\bfoo\b', r'o+b', r'bar$', r'(?m)^baz'])
+@pytest.mark.parametrize('first_chunk', [1, 5, 64])
+def test_backward_matches_scan_from_top(pattern, first_chunk):
+    rnd = random.Random(pattern)
+    words = ['foo', 'bar', 'foobar', 'aaa', 'a', '\n', '  ', 'baz\n', 'fo']
+    content = ''.join(rnd.choice(words) for _ in range(800))
+    search = _engine(content, first_chunk)
+    regex = re.compile(pattern)
+    for start in range(0, len(content) + 1, 7):
+        assert search.find(regex, start, backwards=True) == _last_before(regex, content, start)
+
+
+def test_forward_search_and_empty_match_at_start():
+    search = _engine('one two three', first_chunk=4)
+    assert search.find(re.compile('t'), 0) == (4, 5)
+    assert search.find(re.compile('x*'), 3) == (4, 4)
+    assert search.find(re.compile('nope'), 0) is None
+    assert search.find(re.compile('one'), 5, backwards=True) == (0, 3)
+    assert search.find(re.compile('one'), 0, backwards=True) is None
+
+
+def test_content_is_refetched_only_after_edits():
+    search = _engine('before', first_chunk=4)
+    assert search.content == 'before'
+    search.text.content = 'after'
+    assert search.content == 'before'
+    search.bus.serial += 1
+    assert search.content == 'after'
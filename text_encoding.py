@@ -0,0 +1,171 @@
+"""Guess the encoding of script files and decode them in one streamed pass.
+
+Official and kRO-derived scripts come as UTF-8, CP949/EUC-KR or Latin-1.
+`sniff_encoding` looks at a bounded sample of bytes: a byte order mark,
+else whether the sample is valid UTF-8, else whether its high bytes pair
+up the way Korean (KS X 1001 Hangul) text does, else Latin-1, which
+decodes anything.
+
+Files are mostly ASCII, which reads the same in all of those, so
+`SniffingDecoder` passes ASCII through until it meets the first byte that
+needs an encoding and only then decides, from the bytes at that point.
+A file is decoded once, chunk by chunk, instead of being read, failing
+and read again with another encoding.
+"""
+
+import re
+import codecs
+import threading
+
+
+_BOMS = (
+    (codecs.BOM_UTF8, 'utf-8-sig'),
+    (codecs.BOM_UTF16_LE, 'utf-16'),
+    (codecs.BOM_UTF16_BE, 'utf-16'),
+)
+
+_HIGH = re.compile(b'[\x80-\xff]')
+
+# bytes looked at from the first non-ASCII byte on
+SNIFF_BYTES = 64 * 1024
+# decide only with at least this many bytes after the first non-ASCII byte
+# (unless the data ends earlier)
+MIN_SAMPLE = 1024
+
+
+def sniff_encoding(data, final=True, at_start=True):
+    """Return the encoding of `data`, or None when it cannot tell yet.
+
+    `final` says no more bytes follow; `at_start` that `data` begins the
+    file, so it may start with a byte order mark. None is returned while
+    everything seen is ASCII, or there are too few bytes after the first
+    non-ASCII one, unless `final`.
+    """
+    if at_start:
+        for bom, encoding in _BOMS:
+            if data.startswith(bom):
+                return encoding
+            if not final and bom.startswith(data[:len(bom)]) and len(data) < len(bom):
+                return None
+    high = _HIGH.search(data)
+    if high is None:
+        return 'utf-8' if final else None
+    sample = data[high.start():high.start() + SNIFF_BYTES]
+    complete = final and high.start() + SNIFF_BYTES >= len(data)
+    if not final and len(sample) < MIN_SAMPLE:
+        return None
+    if _valid_utf8(sample, complete):
+        return 'utf-8'
+    if _looks_korean(sample):
+        return 'cp949'
+    return 'latin-1'
+
+
+def _valid_utf8(sample, complete):
+    try:
+        # a character cut off at the end of the sample is fine
+        codecs.getincrementaldecoder('utf-8')().decode(sample, complete)
+    except UnicodeDecodeError:
+        return False
+    return True
+
+
+def _looks_korean(sample):
+    """True if the high bytes of `sample` are CP949 pairs, mostly Hangul."""
+    pairs = hangul = 0
+    i = 0
+    end = len(sample) - 1
+    while i < end:
+        lead = sample[i]
+        if lead < 0x80:
+            i += 1
+            continue
+        trail = sample[i + 1]
+        pairs += 1
+        if 0xB0 <= lead <= 0xC8 and 0xA1 <= trail <= 0xFE:
+            hangul += 1
+        elif not (0x81 <= lead <= 0xFE and (0x41 <= trail <= 0x5A or 0x61 <= trail <= 0x7A
+                                            or 0x81 <= trail <= 0xFE)):
+            return False
+        i += 2
+    return pairs > 0 and hangul * 2 >= pairs
+
+
+def sniff_buffer(data):
+    """Return the encoding of a whole buffer (bytes or mmap), from a bounded sample."""
+    for bom, encoding in _BOMS:
+        if data[:len(bom)] == bom:
+            return encoding
+    high = _HIGH.search(data)
+    if high is None:
+        return 'utf-8'
+    start = high.start()
+    return sniff_encoding(data[start:start + SNIFF_BYTES],
+                          final=start + SNIFF_BYTES >= len(data), at_start=False) or 'utf-8'
+
+
+# the SniffingDecoder decoding on this thread, for _count_replaced
+_decoding = threading.local()
+
+
+def _count_replaced(exc):
+    """Error handler that works like 'replace' and counts the substitutions."""
+    decoder = getattr(_decoding, 'decoder', None)
+    if decoder is not None:
+        decoder.replaced += 1
+    return '\ufffd', exc.end
+
+
+codecs.register_error('balrognpc.count-replaced', _count_replaced)
+
+
+class SniffingDecoder(codecs.IncrementalDecoder):
+    """Incremental decoder that picks its encoding from the data.
+
+    With `encoding` given it just decodes with that. Otherwise `encoding`
+    is None until the first non-ASCII bytes have been seen; the ASCII
+    before them is passed through meanwhile. Undecodable bytes become
+    U+FFFD (counted in `replaced`) rather than failing half way; a U+FFFD
+    that is in the file itself is not counted.
+    """
+
+    def __init__(self, encoding=None, errors='replace'):
+        super().__init__(errors)
+        self._given = encoding
+        self.encoding = None
+        self.replaced = 0
+        self._decoder = None
+        self._held = b''
+        self._at_start = True
+        if encoding:
+            self._use(encoding)
+
+    def _use(self, encoding):
+        self.encoding = encoding
+        errors = 'balrognpc.count-replaced' if self.errors == 'replace' else self.errors
+        self._decoder = codecs.getincrementaldecoder(encoding)(errors)
+
+    def decode(self, data, final=False):
+        if self._decoder is None:
+            data = self._held + data
+            self._held = b''
+            encoding = sniff_encoding(data, final, self._at_start)
+            if encoding is None:
+                # hold back from the first byte that needs an encoding
+                high = _HIGH.search(data)
+                cut = high.start() if high else len(data)
+                self._held = data[cut:]
+                if cut:
+                    self._at_start = False
+                return data[:cut].decode('ascii')
+            self._at_start = False
+            self._use(encoding)
+        outer = getattr(_decoding, 'decoder', None)
+        _decoding.decoder = self
+        try:
+            return self._decoder.decode(data, final)
+        finally:
+            _decoding.decoder = outer
+
+    def reset(self):
+        self.__init__(self._given, self.errors)
@@ -0,0 +1,125 @@
+"""Find regex matches in a Tk Text widget without re-reading it per search.
+
+Find Next used to fetch the whole buffer and scan it from the top on every
+click. `TextSearch` keeps a copy of the text, taken on the first search
+after an edit (the widget's `EditBus.serial` says when it is stale), and
+turns offsets into `line.col` through the widget's `LineIndex`. A forward
+search then runs from the cursor to the next match. A backward search
+scans from anchors going back from the cursor, each twice as far as the
+one before, until two anchors agree on the last match before the cursor
+(a match reaching back past an anchor would otherwise be found cut
+short), so it too costs about the distance to the match, not the file.
+
+Use `text_search_for(text)` to get the engine shared by everything that
+searches a given widget.
+"""
+
+from edit_hooks import edit_bus_for
+from line_index import line_index_for
+
+
+class TextSearch:
+    """Regex search over a cached copy of the text of `text`."""
+
+    first_chunk = 64 * 1024
+    # how far past the cursor a backward scan reads before the matches it
+    # found are checked against the whole text
+    overlap = 4096
+
+    def __init__(self, text):
+        self.text = text
+        self.bus = edit_bus_for(text)
+        self._content = None
+        self._serial = None
+
+    @property
+    def content(self):
+        """The text of the widget (fetched again only after an edit)."""
+        if self._content is None or self._serial != self.bus.serial:
+            self._content = self.text.get('1.0', 'end-1c')
+            self._serial = self.bus.serial
+        return self._content
+
+    def release(self):
+        """Drop the cached text (e.g. when the search dialog closes)."""
+        self._content = None
+
+    def offset(self, index):
+        """Character offset of widget `index`."""
+        line, col = map(int, str(self.text.index(index)).split('.'))
+        return line_index_for(self.text).offset(line, col)
+
+    def index(self, offset):
+        """Widget index (`line.col`) of character `offset`."""
+        return line_index_for(self.text).index(offset)
+
+    def find(self, regex, start, backwards=False):
+        """Return (start, end) offsets of the match nearest to offset `start`.
+
+        Forwards, the first match starting at or after `start` (an empty
+        match right at `start` is skipped); backwards, the last one
+        starting before it.
+        """
+        content = self.content
+        if not backwards:
+            m = regex.search(content, start)
+            if m is not None and m.end() == m.start() == start:
+                m = regex.search(content, start + 1) if start < len(content) else None
+            return (m.start(), m.end()) if m is not None else None
+        return find_backwards(regex, content, start, self.first_chunk, self.overlap)
+
+    def find_all(self, regex):
+        """Yield the (start, end) offsets of every match."""
+        for m in regex.finditer(self.content):
+            yield m.start(), m.end()
+
+
+def find_backwards(regex, content, start, first_chunk, overlap, endpos=None):
+    """Return (start, end) of the last match of `regex` starting before `start`.
+
+    `content` is a str, bytes or mmap and `endpos` where matches must end
+    by (default: its end). The text is scanned from anchors going back from
+    `start`, each twice as far as the one before, until two anchors agree;
+    each scan reads `overlap` past `start`.
+    """
+    if endpos is None:
+        endpos = len(content)
+    start = min(start, endpos)
+    size = first_chunk
+    found = None
+    while True:
+        lo = max(0, start - size)
+        result = _last_before(regex, content, lo, start, overlap, endpos)
+        if lo == 0:
+            return result
+        # a match running across `lo` is cut short there; accept only
+        # what scanning from an earlier anchor agrees on
+        if result is not None and result == found:
+            return result
+        found = result
+        size *= 2
+
+
+def _last_before(regex, content, lo, hi, overlap, endpos):
+    """The last match starting in [lo, hi), or None."""
+    starts = []
+    for m in regex.finditer(content, lo, min(endpos, hi + overlap)):
+        if m.start() >= hi:
+            break
+        starts.append(m.start())
+    # the scan stops short of the text (`$`, `\b` and lookaheads see an end
+    # that is not there); confirm against the whole text
+    for s in reversed(starts):
+        m = regex.match(content, s, endpos)
+        if m is not None:
+            return m.start(), m.end()
+    return None
+
+
+def text_search_for(text):
+    """Return the `TextSearch` shared by everything searching `text`."""
+    search = getattr(text, '_text_search', None)
+    if search is None:
+        search = TextSearch(text)
+        text._text_search = search
+    return search